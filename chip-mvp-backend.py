@@ -1,149 +1,256 @@
 # CHIP MVP Backend - Flask API Server
 # Climate-Resilient Healthcare Infrastructure Protection
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import os
+import io
+import csv
 import json
+import queue
+import random
+import threading
+import time
+import base64
 import uuid
-import requests
 from datetime import datetime, timedelta
-import sqlite3
-import threading
 import tempfile
 import zipfile
+from urllib.parse import urlencode
+
+import numpy as np
+
+from chip_climate_grid import climate_zone, climate_zones
+from chip_blobs import make_blob_store
+from chip_db import BatchWriter, make_database
+from chip_events import EventBus
+from chip_geometry import parse_dxf_geometry
+from chip_incremental import InputIndex, content_hash, input_keys
+from chip_jobs import make_job_queue
+from chip_http import IMMUTABLE, cache_headers, compress_response, make_etag, not_modified
+from chip_metrics import MetricsRegistry, StackSampler, write_profile, PROFILE_SLOW_REQUESTS_MS, PROFILE_SAMPLE_RATE
+from chip_recommendations import RecommendationEngine
+from chip_retrofit import RetrofitOptimizer, RETROFIT_TIME_BUDGET, parse_measures
+from chip_results import ResultsStore, hourly_matrix
+from chip_scheduler import SimulationScheduler, QueueFullError, SimulationCancelled
+from chip_spatial import SpatialIndex, SPATIAL_MAX_RESULTS, bbox_boxes
+from chip_simulation import (
+    simulate_building_performance, simulate_locations, select_buildings, building_results,
+    portfolio_summary, parse_scenarios, simulate_scenarios, parse_parameters, hvac_loads,
+    summarize_hourly, with_leading_axis
+)
+from chip_uploads import UploadStore, GeometryPipeline, UploadConflict
+from chip_weather import get_climate_data, get_weather_year, get_weather_fingerprint, weather_cells, weather_cache
 
 app = Flask(__name__)
 CORS(app)
 
-# Configuration
-OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY', 'your_api_key_here')
+# Configuration (weather provider settings are read by chip_weather_providers)
+# Job queue and blob store backends are chosen by JOB_QUEUE_URL and BLOB_STORE_URL
 UPLOAD_FOLDER = 'uploads'
 RESULTS_FOLDER = 'results'
-DATABASE = 'chip_mvp.db'
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///chip_mvp.db')
+
+# Simulation scheduler: worker threads claim jobs from the shared queue and
+# hand the CPU-bound model to a process pool (0 processes runs it inline)
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', 4))
+SIMULATION_PROCESSES = int(os.environ.get('SIMULATION_PROCESSES', os.cpu_count() or 1))
+SIMULATION_QUEUE_SIZE = int(os.environ.get('SIMULATION_QUEUE_SIZE', 200))
+BATCH_MAX_BUILDINGS = int(os.environ.get('BATCH_MAX_BUILDINGS', 50000))
+SSE_KEEPALIVE_SECONDS = int(os.environ.get('SSE_KEEPALIVE_SECONDS', 15))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+RETROFIT_SYNC_BUILDINGS = int(os.environ.get('RETROFIT_SYNC_BUILDINGS', 5))  # more runs as background jobs
+HTTP_WEATHER_MAX_AGE = int(os.environ.get('HTTP_WEATHER_MAX_AGE', 300))  # seconds browsers may reuse conditions
+
+# Bump whenever init_db (or an init_schema it calls) gains a table, column or index;
+# databases already at this version skip the migration entirely
+SCHEMA_VERSION = 5
+
+# Database access: pooled WAL-mode connections shared by every route and worker
+db = make_database(DATABASE_URL)
+
+# Drawings and result files: local folders, or an S3 bucket shared by every node
+blob_store = make_blob_store()
+
+# Simulation jobs: the metadata database on one node, Redis across several
+job_queue = make_job_queue(db=db)
+
+# Scalar metrics in SQLite columns, hourly series as memory-mapped float32 files
+results_store = ResultsStore(db, RESULTS_FOLDER, blobs=blob_store)
+
+# Drawings are stored once per content hash; chunked upload sessions are resumable
+upload_store = UploadStore(db, UPLOAD_FOLDER, blobs=blob_store)
 
-# Ensure directories exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(RESULTS_FOLDER, exist_ok=True)
+# Building locations in an R-tree for radius, bounding box, polygon and nearest queries
+spatial_index = SpatialIndex(db)
+
+# Input hashes of each simulation, so repeated and partly changed runs reuse earlier work
+input_index = InputIndex(db)
 
 # Database setup
-def init_db():
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    # Buildings table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS buildings (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            latitude REAL,
-            longitude REAL,
-            building_type TEXT,
-            file_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+def init_db(database=db):
+    """Create or migrate the schema; a no-op once the database is at SCHEMA_VERSION"""
+    with database.transaction() as cursor:
+        # The write lock is held from here, so concurrent workers migrate one at a time
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] >= SCHEMA_VERSION:
+            return
+        
+        # Buildings table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS buildings (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                latitude REAL,
+                longitude REAL,
+                building_type TEXT,
+                file_path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
     
-    # Simulations table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS simulations (
-            id TEXT PRIMARY KEY,
-            building_id TEXT,
-            simulation_type TEXT,
-            status TEXT DEFAULT 'pending',
-            results_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            FOREIGN KEY (building_id) REFERENCES buildings (id)
-        )
-    ''')
+        # Simulations table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS simulations (
+                id TEXT PRIMARY KEY,
+                building_id TEXT,
+                simulation_type TEXT,
+                status TEXT DEFAULT 'pending',
+                results_path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP,
+                priority INTEGER DEFAULT 0,
+                FOREIGN KEY (building_id) REFERENCES buildings (id)
+            )
+        ''')
     
-    conn.commit()
-    conn.close()
+        # Columns added after the first release
+        cursor.execute('PRAGMA table_info(simulations)')
+        simulation_columns = [column[1] for column in cursor.fetchall()]
+        if 'priority' not in simulation_columns:
+            cursor.execute('ALTER TABLE simulations ADD COLUMN priority INTEGER DEFAULT 0')
+        if 'options' not in simulation_columns:
+            cursor.execute('ALTER TABLE simulations ADD COLUMN options TEXT')
+        
+        cursor.execute('PRAGMA table_info(buildings)')
+        building_columns = [column[1] for column in cursor.fetchall()]
+        if 'content_hash' not in building_columns:
+            cursor.execute('ALTER TABLE buildings ADD COLUMN content_hash TEXT')
+    
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_simulations_status
+            ON simulations (status, created_at)
+        ''')
+        
+        # Building listing: keyset pagination, type filter and bounding box
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_buildings_created
+            ON buildings (created_at, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_buildings_type_created
+            ON buildings (building_type, created_at, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_buildings_location
+            ON buildings (latitude, longitude)
+        ''')
+        
+        results_store.init_schema(cursor)
+        upload_store.init_schema(cursor)
+        job_queue.init_schema(cursor)
+        spatial_index.init_schema(cursor)
+        input_index.init_schema(cursor)
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+def migrate_database():
+    """Run migrations on a private connection (gunicorn master, before forking workers)"""
+    database = make_database(DATABASE_URL)
+    try:
+        init_db(database)
+    finally:
+        database.close()
+
+# Request and simulation-stage metrics, scraped from /api/metrics
+metrics = MetricsRegistry()
+request_duration = metrics.histogram(
+    'chip_http_request_duration_seconds', 'Time to build an API response',
+    ('method', 'route', 'status')
+)
+simulation_stage_duration = metrics.histogram(
+    'chip_simulation_stage_seconds', 'Time spent in each simulation stage',
+    ('simulation_type', 'stage')
+)
+simulations_finished = metrics.counter(
+    'chip_simulations_total', 'Simulations reaching a terminal status', ('status',)
+)
+simulation_reuse = metrics.counter(
+    'chip_simulation_reuse_total', 'Simulation requests and runs by how much earlier work they reused',
+    ('outcome',)
+)
 
-# Initialize database
-init_db()
+# Sampling profiler for slow requests (PROFILE_SLOW_REQUESTS_MS=0 disables it)
+request_profiler = StackSampler() if PROFILE_SLOW_REQUESTS_MS > 0 else None
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request_profiler and (request.headers.get('X-Profile') or random.random() < PROFILE_SAMPLE_RATE):
+        request_profiler.start()
+        g.profiling = True
+        g.force_profile = bool(request.headers.get('X-Profile'))
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Routes are labelled by rule, not path, so ids do not explode the series count
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_duration.observe(time.perf_counter() - started, method=request.method,
+                                 route=route, status=response.status_code)
+    return response
+
+# Brotli/gzip for large JSON, NDJSON and binary bodies
+app.after_request(compress_response)
+
+@app.teardown_request
+def finish_request_profile(exc):
+    if not g.get('profiling'):
+        return
+    stacks = request_profiler.stop()
+    elapsed_ms = (time.perf_counter() - g.request_started) * 1000
+    if stacks and (elapsed_ms >= PROFILE_SLOW_REQUESTS_MS or g.force_profile):
+        name = f"{request.method}-{request.path.strip('/').replace('/', '_')}"
+        path = write_profile(stacks, name)
+        app.logger.warning('Slow request %s %s took %.0f ms; profile written to %s',
+                           request.method, request.path, elapsed_ms, path)
 
 # Weather data integration
 @app.route('/api/weather/<float:lat>/<float:lon>', methods=['GET'])
 def get_weather_data(lat, lon):
     """Fetch weather data from OpenWeatherMap API"""
     try:
-        # Current weather
-        current_url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-        current_response = requests.get(current_url)
-        current_data = current_response.json()
-        
-        # Climate data for building simulation
-        climate_data = {
-            "location": {
-                "latitude": lat,
-                "longitude": lon,
-                "city": current_data.get("name", "Unknown"),
-                "country": current_data.get("sys", {}).get("country", "Unknown")
-            },
-            "current_conditions": {
-                "temperature": current_data.get("main", {}).get("temp", 0),
-                "humidity": current_data.get("main", {}).get("humidity", 0),
-                "pressure": current_data.get("main", {}).get("pressure", 0),
-                "wind_speed": current_data.get("wind", {}).get("speed", 0),
-                "wind_direction": current_data.get("wind", {}).get("deg", 0),
-                "solar_irradiance": calculate_solar_irradiance(lat, lon)
-            },
-            "design_conditions": {
-                "summer_design_temp": current_data.get("main", {}).get("temp_max", 35),
-                "winter_design_temp": current_data.get("main", {}).get("temp_min", 5),
-                "cooling_degree_days": estimate_cooling_dd(lat),
-                "heating_degree_days": estimate_heating_dd(lat)
-            }
-        }
-        
-        return jsonify(climate_data)
+        response = jsonify(get_climate_data(lat, lon))
+        # Conditions change under the cache's feet, so the ETag hashes the body
+        etag = make_etag(response.get_data(as_text=True))
+        cache_control = f'public, max-age={HTTP_WEATHER_MAX_AGE}'
+        return not_modified(etag, cache_control) or cache_headers(response, etag, cache_control)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def calculate_solar_irradiance(lat, lon):
-    """Estimate solar irradiance based on location and time"""
-    # Simplified solar calculation for MVP
-    # In production, this would use NASA POWER API or similar
-    import math
-    
-    day_of_year = datetime.now().timetuple().tm_yday
-    solar_declination = 23.45 * math.sin(math.radians(360 * (284 + day_of_year) / 365))
-    
-    # Simplified direct normal irradiance estimation
-    dni = 900 * math.cos(math.radians(abs(lat - solar_declination)))
-    return max(0, dni)
-
-def estimate_cooling_dd(lat):
-    """Estimate cooling degree days based on latitude"""
-    # Simplified estimation for MVP
-    if abs(lat) < 23.5:  # Tropical
-        return 2000
-    elif abs(lat) < 35:  # Subtropical
-        return 1500
-    elif abs(lat) < 50:  # Temperate
-        return 1000
-    else:  # Cold
-        return 500
-
-def estimate_heating_dd(lat):
-    """Estimate heating degree days based on latitude"""
-    # Simplified estimation for MVP
-    if abs(lat) < 23.5:  # Tropical
-        return 100
-    elif abs(lat) < 35:  # Subtropical
-        return 500
-    elif abs(lat) < 50:  # Temperate
-        return 2000
-    else:  # Cold
-        return 4000
+@app.route('/api/weather/cache', methods=['GET'])
+def get_weather_cache_stats():
+    """Weather cache hit/miss/coalesce counters"""
+    return jsonify(weather_cache.stats())
 
 # File upload endpoint
 @app.route('/api/upload', methods=['POST'])
 def upload_drawing():
-    """Upload architectural drawing and building information"""
+    """Upload architectural drawing and building information
+    
+    Small drawings in one request; large CAD sets should use /api/uploads.
+    """
     try:
         if 'file' not in request.files:
             return jsonify({"error": "No file provided"}), 400
@@ -153,56 +260,274 @@ def upload_drawing():
             return jsonify({"error": "No file selected"}), 400
         
         # Get building information
-        building_data = {
-            'name': request.form.get('name', 'Unnamed Building'),
-            'latitude': float(request.form.get('latitude', 0)),
-            'longitude': float(request.form.get('longitude', 0)),
-            'building_type': request.form.get('building_type', 'healthcare')
-        }
+        building_data = parse_building_data(request.form)
+        
+        # Stream the file to disk, hashing as it goes; identical drawings are stored once
+        content_hash, file_path, is_new = upload_store.save_stream(file.filename, file.stream)
         
-        # Generate unique building ID
-        building_id = str(uuid.uuid4())
+        return jsonify(register_building(building_data, content_hash, file_path, is_new))
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload
+    
+    Body: {"filename", "size", "name", "latitude", "longitude", "building_type"}.
+    Chunks are then sent in order with PUT /api/uploads/<upload_id> and a
+    Content-Range: bytes <start>-<end>/<size> header.
+    """
+    try:
+        data = request.json or {}
+        if not data.get('filename'):
+            return jsonify({"error": "filename is required"}), 400
         
-        # Save uploaded file
-        filename = f"{building_id}_{file.filename}"
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        session = upload_store.create(
+            data['filename'], int(data.get('size', 0)), parse_building_data(data)
+        )
+        return jsonify(session), 201
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append one chunk; the last chunk registers the building"""
+    try:
+        offset = parse_content_range(request.headers.get('Content-Range'))
         
-        # Store building information in database
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO buildings (id, name, latitude, longitude, building_type, file_path)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (building_id, building_data['name'], building_data['latitude'], 
-              building_data['longitude'], building_data['building_type'], file_path))
-        conn.commit()
-        conn.close()
+        session = upload_store.write_chunk(upload_id, offset, request.stream, request.content_length)
+        if session is None:
+            return jsonify({"error": "Upload not found"}), 404
         
-        # Process the building geometry (simplified for MVP)
-        building_geometry = process_building_geometry(file_path)
+        if session["received_bytes"] < session["total_size"]:
+            response = jsonify(session)
+            response.headers['Range'] = f"bytes=0-{session['received_bytes'] - 1}"
+            return response
         
-        response_data = {
+        content_hash, file_path, is_new = upload_store.finalize(upload_id)
+        building = register_building(session["metadata"], content_hash, file_path, is_new)
+        upload_store.attach_building(upload_id, building["building_id"])
+        building["upload_id"] = upload_id
+        return jsonify(building), 201
+    
+    except UploadConflict as e:
+        return jsonify({"error": str(e), "received_bytes": e.received_bytes}), 409
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload_status(upload_id):
+    """Bytes received so far (to resume from) and, once complete, geometry status"""
+    try:
+        session = upload_store.get(upload_id)
+        if session is None:
+            return jsonify({"error": "Upload not found"}), 404
+        
+        if session["content_hash"]:
+            drawing = upload_store.drawing(session["content_hash"])
+            session["geometry_status"] = drawing["geometry_status"]
+        return jsonify(session)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/buildings/<building_id>/geometry', methods=['GET'])
+def get_building_geometry(building_id):
+    """Geometry extraction status, and the geometry once it is ready"""
+    try:
+        building = db.query_one('SELECT content_hash FROM buildings WHERE id = ?', (building_id,))
+        if not building:
+            return jsonify({"error": "Building not found"}), 404
+        
+        if building[0] is None:
+            # Uploaded before drawings were content-addressed: store and parse it once now
+            drawing = building_geometry(building_id)
+            if drawing is None:
+                return jsonify({"error": "Drawing file not found"}), 404
+        else:
+            drawing = upload_store.drawing(building[0])
+        return jsonify({
             "building_id": building_id,
-            "message": "Building uploaded successfully",
-            "geometry": building_geometry,
-            "climate_zone": determine_climate_zone(building_data['latitude'])
-        }
+            "content_hash": drawing["content_hash"],
+            "geometry_status": drawing["geometry_status"],
+            "geometry": drawing["geometry"],
+            "error": drawing["error"]
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/import', methods=['POST'])
+def import_portfolio():
+    """Bulk-import buildings from a CSV manifest and a ZIP of drawings
+    
+    Multipart fields: manifest (CSV with name, latitude, longitude,
+    building_type and drawing columns; drawing names a file in the ZIP)
+    and drawings (ZIP, optional). Returns a report with one entry per row.
+    """
+    try:
+        if 'manifest' not in request.files:
+            return jsonify({"error": "No manifest provided"}), 400
+        
+        archive = None
+        if 'drawings' in request.files and request.files['drawings'].filename:
+            archive = zipfile.ZipFile(request.files['drawings'].stream)
         
-        return jsonify(response_data)
+        manifest = io.TextIOWrapper(request.files['manifest'].stream, encoding='utf-8-sig', newline='')
+        return jsonify(import_buildings(csv.DictReader(manifest), archive))
+    
+    except zipfile.BadZipFile:
+        return jsonify({"error": "drawings must be a ZIP archive"}), 400
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def import_buildings(rows, archive=None):
+    """Store each manifest row's drawing and building; inserts go in batches
+    
+    Drawings are streamed out of the archive one member at a time and
+    deduplicated by content hash like any other upload.
+    """
+    members = {}
+    if archive is not None:
+        for info in archive.infolist():
+            if not info.is_dir():
+                members[info.filename] = info
+                members.setdefault(os.path.basename(info.filename), info)
+    
+    report = []
+    pending = []
+    new_drawings = []
+    
+    for row_number, row in enumerate(rows, start=2):  # line 1 is the header
+        if len(report) >= BATCH_MAX_BUILDINGS:
+            raise ValueError(f"Import limited to {BATCH_MAX_BUILDINGS} buildings")
+        
+        entry = {"row": row_number, "name": row.get('name')}
+        try:
+            building_data = parse_building_data(row)
+            
+            content_hash = file_path = None
+            drawing = (row.get('drawing') or '').strip()
+            if drawing:
+                info = members.get(drawing) or members.get(os.path.basename(drawing))
+                if info is None:
+                    raise ValueError(f"Drawing not found in archive: {drawing}")
+                with archive.open(info) as stream:
+                    content_hash, file_path, is_new = upload_store.save_stream(info.filename, stream)
+                if is_new:
+                    new_drawings.append((content_hash, file_path))
+                entry.update({"drawing": drawing, "content_hash": content_hash,
+                              "deduplicated": not is_new})
+            
+            building_id = str(uuid.uuid4())
+            pending.append((building_id, building_data['name'], building_data['latitude'],
+                            building_data['longitude'], building_data['building_type'],
+                            file_path, content_hash))
+            entry.update({"status": "imported", "building_id": building_id})
+        
+        except ValueError as e:
+            entry.update({"status": "error", "error": str(e)})
+        
+        report.append(entry)
+        if len(pending) >= IMPORT_BATCH_SIZE:
+            insert_buildings(pending)
+            pending = []
+    
+    insert_buildings(pending)
+    geometry_pipeline.submit_many(new_drawings)
+    
+    imported = sum(1 for entry in report if entry["status"] == "imported")
+    return {
+        "imported": imported,
+        "failed": len(report) - imported,
+        "geometry_queued": len(new_drawings),
+        "rows": report
+    }
+
+def insert_buildings(rows):
+    """Insert (id, name, latitude, longitude, building_type, file_path, content_hash) rows in one transaction"""
+    if rows:
+        db.executemany('''
+            INSERT INTO buildings (id, name, latitude, longitude, building_type, file_path, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+def parse_building_data(fields):
+    """Building attributes from form fields, a JSON body or a manifest row"""
+    building_data = {
+        'name': fields.get('name') or 'Unnamed Building',
+        'latitude': float(fields.get('latitude') or 0),
+        'longitude': float(fields.get('longitude') or 0),
+        'building_type': fields.get('building_type') or 'healthcare'
+    }
+    if not -90 <= building_data['latitude'] <= 90 or not -180 <= building_data['longitude'] <= 180:
+        raise ValueError("latitude must be within ±90 and longitude within ±180")
+    return building_data
+
+def parse_content_range(header):
+    """Start offset from a 'bytes <start>-<end>/<size>' Content-Range header"""
+    if not header or not header.startswith('bytes '):
+        raise ValueError("Content-Range: bytes <start>-<end>/<size> header is required")
+    try:
+        return int(header[len('bytes '):].split('-', 1)[0])
+    except ValueError:
+        raise ValueError(f"Invalid Content-Range: {header}")
+
+def register_building(building_data, content_hash, file_path, is_new):
+    """Store a building for an uploaded drawing and queue its geometry extraction"""
+    building_id = str(uuid.uuid4())
+    
+    db.execute('''
+        INSERT INTO buildings (id, name, latitude, longitude, building_type, file_path, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (building_id, building_data['name'], building_data['latitude'],
+          building_data['longitude'], building_data['building_type'], file_path, content_hash))
+    
+    # A re-uploaded drawing reuses its stored geometry unless extraction failed
+    drawing = upload_store.drawing(content_hash)
+    if is_new or drawing["geometry_status"] == 'failed':
+        geometry_pipeline.submit(content_hash, file_path)
+        drawing = upload_store.drawing(content_hash)
+    
+    return {
+        "building_id": building_id,
+        "message": "Building uploaded successfully",
+        "content_hash": content_hash,
+        "deduplicated": not is_new,
+        "geometry_status": drawing["geometry_status"],
+        "geometry": drawing["geometry"],
+        "climate_zone": determine_climate_zone(building_data['latitude'], building_data['longitude'])
+    }
+
 def process_building_geometry(file_path):
     """Process uploaded building file and extract geometry"""
-    # Simplified geometry processing for MVP
-    # In production, this would use CAD file parsers
-    
     file_ext = os.path.splitext(file_path)[1].lower()
     
-    # Mock geometry data based on file type
-    if file_ext in ['.dwg', '.dxf']:
+    if file_ext == '.dxf':
+        local_path = blob_store.local_path(file_path)
+        if local_path is None:
+            raise FileNotFoundError(f"Drawing not found: {file_path}")
+        return parse_dxf_geometry(local_path)
+    
+    # Formats without a parser get a typical envelope for their kind
+    # (DWG is a closed binary format; export to DXF for real geometry)
+    if file_ext == '.dwg':
         return {
             "type": "cad_drawing",
             "floors": 2,
@@ -245,327 +570,909 @@ def process_building_geometry(file_path):
             }
         }
 
-def determine_climate_zone(latitude):
-    """Determine climate zone based on latitude"""
-    abs_lat = abs(latitude)
-    if abs_lat < 23.5:
-        return "Tropical"
-    elif abs_lat < 35:
-        return "Subtropical" 
-    elif abs_lat < 50:
-        return "Temperate"
-    else:
-        return "Cold"
+# Geometry extraction runs off the request path, once per stored drawing
+geometry_pipeline = GeometryPipeline(db, process_building_geometry)
+
+def building_geometry(building_id):
+    """A building's stored drawing record (geometry, status), parsing it now if still pending"""
+    building = db.query_one('SELECT file_path, content_hash FROM buildings WHERE id = ?', (building_id,))
+    if not building:
+        return None
+    
+    file_path, content_hash = building
+    if content_hash is None:
+        if not file_path or not os.path.exists(file_path):
+            return None
+        content_hash = upload_store.adopt_file(file_path)
+        db.execute('UPDATE buildings SET content_hash = ? WHERE id = ?', (content_hash, building_id))
+    
+    drawing = upload_store.drawing(content_hash)
+    if drawing["geometry_status"] in ('queued', 'processing'):
+        geometry_pipeline.extract_now(content_hash, drawing["file_path"])
+        drawing = upload_store.drawing(content_hash)
+    return drawing
+
+def determine_climate_zone(latitude, longitude):
+    """Determine climate zone from the precomputed climate grid"""
+    return climate_zone(latitude, longitude)
 
 # Simulation endpoint
 @app.route('/api/simulate', methods=['POST'])
 def run_simulation():
-    """Execute building simulation"""
+    """Queue a building simulation
+    
+    "scenarios": true (or a list of scenario ids / definitions) runs a
+    climate-scenario sweep: every variant in one pass, compared in the
+    results' scenario_analysis section. "parameters" overrides model
+    parameters (setpoints, U-values, comfort band, ...).
+    
+    A request whose inputs match one of the building's simulations is
+    answered with that simulation ("reused": true); "reuse": false always
+    runs the model afresh.
+    """
     try:
         data = request.json
         building_id = data.get('building_id')
         simulation_type = data.get('simulation_type', 'energy_analysis')
+        priority = int(data.get('priority', 0))
+        options = {}
         
         if not building_id:
             return jsonify({"error": "Building ID required"}), 400
         
+        if data.get('scenarios'):
+            scenarios = parse_scenarios(data['scenarios'])
+            simulation_type = 'scenario_sweep'
+            options["scenarios"] = scenarios
+        parameters = parse_parameters(data.get('parameters'))
+        if parameters:
+            options["parameters"] = parameters
+        
+        keys = None
+        if data.get('reuse', True):
+            keys = request_input_keys(building_id, simulation_type, options)
+        else:
+            options["reuse"] = False
+        
+        if keys is not None:
+            existing = input_index.find_identical(keys["inputs"], building_id)
+            if existing:
+                simulation_reuse.inc(outcome='identical')
+                return jsonify({
+                    "simulation_id": existing[0],
+                    "simulation_type": simulation_type,
+                    "status": existing[1],
+                    "reused": True,
+                    "message": "Identical simulation already exists"
+                })
+        
+        # Shed load before touching the database
+        if simulation_scheduler.is_full():
+            return queue_full_response(simulation_scheduler.retry_after())
+        
         # Generate simulation ID
         simulation_id = str(uuid.uuid4())
         
         # Store simulation record
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO simulations (id, building_id, simulation_type, status)
-            VALUES (?, ?, ?, ?)
-        ''', (simulation_id, building_id, simulation_type, 'running'))
-        conn.commit()
-        conn.close()
-        
-        # Start simulation in background thread
-        thread = threading.Thread(
-            target=perform_simulation,
-            args=(simulation_id, building_id, simulation_type)
-        )
-        thread.start()
+        db.execute('''
+            INSERT INTO simulations (id, building_id, simulation_type, status, priority, options)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (simulation_id, building_id, simulation_type, 'queued', priority,
+              json.dumps(options) if options else None))
+        if keys is not None:
+            # Identical requests arriving while this one runs are answered with it
+            input_index.record(simulation_id, building_id, {"inputs": keys["inputs"]})
+        
+        try:
+            publish_simulation_status(simulation_id, 'queued')
+            simulation_scheduler.submit(simulation_id, building_id, simulation_type, priority)
+        except QueueFullError as e:
+            # Lost the race for the last slot
+            db.execute('DELETE FROM simulations WHERE id = ?', (simulation_id,))
+            return queue_full_response(e.retry_after)
+        
+        return jsonify({
+            "simulation_id": simulation_id,
+            "simulation_type": simulation_type,
+            "status": "queued",
+            "message": "Simulation queued successfully"
+        })
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/simulate/batch', methods=['POST'])
+def run_batch_simulation():
+    """Simulate a whole portfolio in one vectorised pass
+    
+    Body: {"building_ids": [...]} or {"filter": {"building_type": ...,
+    "bbox": [min_lon, min_lat, max_lon, max_lat]}}, plus simulation_type.
+    The filter may instead hold one spatial query as accepted by
+    /api/buildings/search (within, polygon or nearest).
+    """
+    try:
+        data = request.json or {}
+        simulation_type = data.get('simulation_type', 'energy_analysis')
+        building_ids = data.get('building_ids')
+        
+        if building_ids:
+            buildings = load_buildings_by_id(building_ids)
+        elif 'filter' in data:
+            building_filter = dict(data['filter'] or {})
+            if any(building_filter.get(kind) is not None for kind in ('within', 'polygon', 'nearest')):
+                buildings = [building for building, _ in spatial_search(building_filter)]
+            else:
+                if isinstance(building_filter.get('bbox'), (list, tuple)):
+                    building_filter['bbox'] = ','.join(str(value) for value in building_filter['bbox'])
+                filters, params = building_filters(building_filter)
+                where = f"WHERE {' AND '.join(filters)}" if filters else ''
+                buildings = db.query_all(f'''
+                    SELECT id, name, latitude, longitude, building_type FROM buildings {where}
+                    LIMIT ?
+                ''', params + [BATCH_MAX_BUILDINGS + 1])
+        else:
+            return jsonify({"error": "building_ids or filter required"}), 400
+        
+        if len(buildings) > BATCH_MAX_BUILDINGS:
+            return jsonify({"error": f"Batch limited to {BATCH_MAX_BUILDINGS} buildings"}), 400
+        if not buildings:
+            return jsonify({"error": "No buildings matched"}), 404
+        
+        portfolio = simulate_portfolio(buildings, simulation_type)
+        found = {building[0] for building in buildings}
+        portfolio["missing_building_ids"] = [bid for bid in (building_ids or []) if bid not in found]
+        return jsonify(portfolio)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def simulate_portfolio(buildings, simulation_type):
+    """Vectorised simulation of (id, name, latitude, longitude, ...) building rows"""
+    # Buildings with the same envelope in the same weather cell share one model run;
+    # each envelope is simulated across all of its cells in one stacked pass
+    cell_keys, cell_centres = weather_cells(
+        [(building[2], building[3]) for building in buildings]
+    )
+    geometries = portfolio_geometries([building[0] for building in buildings])
+    envelopes = {}
+    building_runs = []
+    for cell_key, geometry in zip(cell_keys, geometries):
+        envelope = content_hash(geometry)
+        cells = envelopes.setdefault(envelope, (geometry, {}))[1]
+        building_runs.append((envelope, cells.setdefault(cell_key, len(cells))))
+    
+    run_metrics = []
+    run_offsets = {}
+    offset = 0
+    for envelope, (geometry, cells) in envelopes.items():
+        run_metrics.append(simulate_locations(
+            [get_weather_year(*cell_centres[key]) for key in cells], geometry
+        ))
+        run_offsets[envelope] = offset
+        offset += len(cells)
+    run_metrics = {
+        section: {name: np.concatenate([runs[section][name] for runs in run_metrics]) for name in fields}
+        for section, fields in run_metrics[0].items()
+    }
+    metrics = select_buildings(run_metrics, [run_offsets[envelope] + index for envelope, index in building_runs])
+    
+    results = building_results(metrics)
+    for building, cell_key, result in zip(buildings, cell_keys, results):
+        result['building_id'] = building[0]
+        result['name'] = building[1]
+        result['weather_cell'] = cell_key
+    
+    return {
+        "simulation_type": simulation_type,
+        "timestamp": datetime.now().isoformat(),
+        "weather_cells": len(cell_centres),
+        "envelopes": len(envelopes),
+        "portfolio": portfolio_summary(metrics),
+        "results": results
+    }
+
+def portfolio_geometries(building_ids):
+    """Stored geometry (None: default envelope) of each building, in order
+    
+    Parsed drawings are read in bulk; buildings whose drawing still has to be
+    adopted or parsed go through building_geometry one at a time.
+    """
+    stored = {}
+    chunk_size = 900
+    for start in range(0, len(building_ids), chunk_size):
+        chunk = building_ids[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        for building_id, file_path, drawing_hash, status, geometry in db.query_all(f'''
+            SELECT b.id, b.file_path, b.content_hash, d.geometry_status, d.geometry FROM buildings b
+            LEFT JOIN drawings d ON d.content_hash = b.content_hash
+            WHERE b.id IN ({placeholders})
+        ''', chunk):
+            if (drawing_hash is None and file_path) or status in ('queued', 'processing'):
+                drawing = building_geometry(building_id)
+                stored[building_id] = drawing["geometry"] if drawing else None
+            else:
+                stored[building_id] = json.loads(geometry) if geometry else None
+    return [stored.get(building_id) for building_id in building_ids]
+
+def load_buildings_by_id(building_ids):
+    """Fetch many buildings in as few queries as SQLite's parameter limit allows"""
+    if len(building_ids) > BATCH_MAX_BUILDINGS:
+        raise ValueError(f"Batch limited to {BATCH_MAX_BUILDINGS} buildings")
+    buildings = []
+    chunk_size = 900
+    for start in range(0, len(building_ids), chunk_size):
+        chunk = building_ids[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        buildings.extend(db.query_all(f'''
+            SELECT id, name, latitude, longitude, building_type FROM buildings
+            WHERE id IN ({placeholders})
+        ''', chunk))
+    return buildings
+
+def queue_full_response(retry_after):
+    """429 response telling the client when to retry"""
+    response = jsonify({
+        "error": "Simulation queue is full",
+        "retry_after": retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.route('/api/simulate/<simulation_id>/cancel', methods=['POST'])
+def cancel_simulation(simulation_id):
+    """Cancel a queued or running simulation"""
+    try:
+        state = simulation_scheduler.cancel(simulation_id)
+        if state is None:
+            return jsonify({"error": "Simulation is not queued or running"}), 409
+        
+        if state == 'queued':
+            # Never reached a worker, so nothing else will record it
+            update_simulation_status(simulation_id, 'cancelled')
         
         return jsonify({
             "simulation_id": simulation_id,
-            "status": "started",
-            "message": "Simulation started successfully"
+            "status": "cancelled" if state == 'queued' else "cancelling"
         })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Status transitions are frequent and tiny, so they are written in batches
+status_writer = BatchWriter(db, '''
+    UPDATE simulations
+    SET status = ?,
+        results_path = COALESCE(?, results_path),
+        completed_at = COALESCE(?, completed_at)
+    WHERE id = ?
+''')
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Status pushes for SSE clients and in-process listeners
+simulation_events = EventBus()
+
+def update_simulation_status(simulation_id, status, results_path=None, building_id=None):
+    """Record a simulation status transition"""
+    completed_at = datetime.now() if status in TERMINAL_STATUSES else None
+    status_writer.add((status, results_path, completed_at, simulation_id))
+    if completed_at is not None:
+        simulations_finished.inc(status=status)
+        # Subscribers fetch results as soon as they hear; the row must be there
+        status_writer.flush()
+    publish_simulation_status(simulation_id, status, building_id=building_id)
+
+def publish_simulation_status(simulation_id, status, progress=None, building_id=None):
+    """Push a status (and optional progress percentage) to subscribers"""
+    if progress is None:
+        progress = 100 if status == 'completed' else 0
+    event = {
+        "simulation_id": simulation_id,
+        "status": status,
+        "progress": progress,
+        "timestamp": datetime.now().isoformat()
+    }
+    if building_id is not None:
+        event["building_id"] = building_id
+    simulation_events.publish(simulation_id, event)
+
+# Recommendations are cached per building until a newer simulation completes
+recommendation_engine = RecommendationEngine()
+
+def invalidate_recommendations(simulation_id, event):
+    if event["status"] == 'completed' and event.get("building_id"):
+        recommendation_engine.invalidate(event["building_id"])
+
+simulation_events.add_listener(invalidate_recommendations)
+
+@app.route('/api/simulate/<simulation_id>/events', methods=['GET'])
+def stream_simulation_events(simulation_id):
+    """Server-Sent Events stream of a simulation's status transitions"""
+    subscriber, latest = simulation_events.subscribe(simulation_id)
+    
+    if latest is None:
+        # Nothing published in this process yet: start from the stored status
+        simulation = db.query_one('SELECT status FROM simulations WHERE id = ?', (simulation_id,))
+        if not simulation:
+            simulation_events.unsubscribe(simulation_id, subscriber)
+            return jsonify({"error": "Simulation not found"}), 404
+        latest = {"simulation_id": simulation_id, "status": simulation[0],
+                  "progress": 100 if simulation[0] == 'completed' else 0}
+    
+    def generate():
+        sent_status = latest["status"]
+        try:
+            event = latest
+            while True:
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: status\ndata: {json.dumps(event)}\n\n"
+                    if event["status"] in TERMINAL_STATUSES:
+                        return
+                try:
+                    event = subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    event = stored_status_change(simulation_id, sent_status)
+                if event is not None:
+                    sent_status = event["status"]
+        finally:
+            simulation_events.unsubscribe(simulation_id, subscriber)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass events straight through
+    return response
+
+def stored_status_change(simulation_id, sent_status):
+    """Status event if the stored status moved on without an in-process publish
+    
+    With several server processes the job may run in another one; its transitions
+    still reach the database, which streams re-check at each keepalive.
+    """
+    status_writer.flush()
+    simulation = db.query_one('SELECT status FROM simulations WHERE id = ?', (simulation_id,))
+    if not simulation or simulation[0] == sent_status:
+        return None
+    return {"simulation_id": simulation_id, "status": simulation[0],
+            "progress": 100 if simulation[0] == 'completed' else 0,
+            "timestamp": datetime.now().isoformat()}
+
 def perform_simulation(simulation_id, building_id, simulation_type):
     """Perform the actual building simulation"""
+    stages = simulation_stage_duration.stages(simulation_type=simulation_type)
     try:
+        update_simulation_status(simulation_id, 'running')
+        
         # Get building data
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM buildings WHERE id = ?', (building_id,))
-        building = cursor.fetchone()
-        conn.close()
+        building = db.query_one('SELECT * FROM buildings WHERE id = ?', (building_id,))
+        stages.lap('db_read')
         
         if not building:
+            update_simulation_status(simulation_id, 'failed')
             return
         
-        # Get weather data
+        # Get the hourly weather year and the building envelope
+        simulation_scheduler.raise_if_cancelled(simulation_id)
         lat, lon = building[2], building[3]
-        weather_response = requests.get(f'http://localhost:5000/api/weather/{lat}/{lon}')
-        weather_data = weather_response.json()
+        weather_year = get_weather_year(lat, lon)
+        stages.lap('weather')
+        drawing = building_geometry(building_id)
+        geometry = drawing["geometry"] if drawing else None  # None: default envelope
+        stages.lap('geometry')
+        publish_simulation_status(simulation_id, 'running', 25)
+        
+        # Simulate building performance over the full year
+        simulation_scheduler.raise_if_cancelled(simulation_id)
+        if simulation_type == 'retrofit_optimization':
+            # A search over many model runs; fanned out to the process pool chunk by chunk
+            options = simulation_options(simulation_id)
+            results = optimize_retrofits(building, weather_year, geometry, options.get('measures'))
+            stages.lap('simulate')
+            results_path = os.path.join(RESULTS_FOLDER, f"{simulation_id}_retrofit.json")
+            with open(results_path, 'w') as f:
+                json.dump(results, f)
+            blob_store.put_file(results_path, results_path)
+            stages.lap('persist')
+            update_simulation_status(simulation_id, 'completed', results_path)
+            return
         
-        # Simulate building performance (simplified for MVP)
-        results = simulate_building_performance(building, weather_data, simulation_type)
+        options = simulation_options(simulation_id)
+        parameters = options.get('parameters')
+        keys = simulation_input_keys(get_weather_fingerprint(lat, lon), geometry, simulation_type, options)
+        base = None
+        if simulation_type == 'scenario_sweep':
+            # Sweep sections compare many variants, so sweeps are only reused whole
+            keys = {"inputs": keys["inputs"]}
+            if options.get('reuse', True):
+                base = input_index.find_completed('inputs', keys["inputs"], building_id)
+        elif options.get('reuse', True):
+            base = input_index.find_completed('free_running', keys["free_running"], building_id,
+                                              keys["sections"])
+        free_running = None
+        if base is not None and simulation_type != 'scenario_sweep' and base[2] != keys["sections"]:
+            # Sections are recomputed from full-precision series; bases from before they were kept run afresh
+            free_running = results_store.load_free_running(keys["free_running"])
+            if free_running is None:
+                base = None
+        
+        header = {"simulation_type": simulation_type, "building_id": building_id,
+                  "timestamp": datetime.now().isoformat()}
+        results = hourly = shared_hourly_path = None
+        if base is None:
+            if simulation_type == 'scenario_sweep':
+                # Geometry and base weather are loaded once; variants are derived in the model
+                results, hourly = simulation_scheduler.run_cpu(
+                    simulate_scenarios, building, weather_year, options["scenarios"], geometry,
+                    parameters, True
+                )
+            else:
+                results, hourly = simulation_scheduler.run_cpu(
+                    simulate_building_performance, building, weather_year, simulation_type, geometry,
+                    parameters, True
+                )
+                # Later runs sharing the free-running model recompute sections from these
+                results_store.save_free_running(keys["free_running"], hourly)
+            hourly = hourly_matrix(hourly)
+            recomputed = [section for section, value in results.items() if isinstance(value, dict)]
+        else:
+            base_id, base_loads, base_sections = base
+            recomputed = [section for section, key in keys.get("sections", {}).items()
+                          if base_sections.get(section) != key]
+            if recomputed:
+                results, hourly = resimulate_sections(base_id, weather_year, geometry, parameters, recomputed,
+                                                      free_running, base_loads != keys["loads"])
+                results.update(header)
+                if hourly is None:
+                    shared_hourly_path = results_store.hourly_path(base_id)
+        simulation_reuse.inc(outcome='none' if base is None else 'partial' if recomputed else 'identical')
+        
+        stages.lap('simulate')
         
         # Save results
-        results_file = os.path.join(RESULTS_FOLDER, f"{simulation_id}_results.json")
-        with open(results_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        simulation_scheduler.raise_if_cancelled(simulation_id)
+        publish_simulation_status(simulation_id, 'running', 75)
+        if results is None:
+            hourly_path = results_store.copy(base[0], simulation_id, **header)
+        else:
+            hourly_path = results_store.save(simulation_id, results, hourly, shared_hourly_path)
+        input_index.record(simulation_id, building_id, keys, base and base[0], recomputed)
+        stages.lap('persist')
         
         # Update simulation status
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE simulations 
-            SET status = ?, results_path = ?, completed_at = ?
-            WHERE id = ?
-        ''', ('completed', results_file, datetime.now(), simulation_id))
-        conn.commit()
-        conn.close()
-        
+        update_simulation_status(simulation_id, 'completed', hourly_path, building_id)
+    
+    except SimulationCancelled:
+        update_simulation_status(simulation_id, 'cancelled')
+    
     except Exception as e:
         # Update simulation status to failed
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE simulations SET status = ? WHERE id = ?
-        ''', ('failed', simulation_id))
-        conn.commit()
-        conn.close()
+        app.logger.exception('Simulation %s failed', simulation_id)
+        update_simulation_status(simulation_id, 'failed')
 
-def simulate_building_performance(building, weather_data, simulation_type):
-    """Simplified building performance simulation"""
-    import random
-    import math
-    
-    # Mock simulation results for MVP demonstration
-    # In production, this would use EnergyPlus API
-    
-    base_temp = weather_data['current_conditions']['temperature']
-    building_area = 500  # m² (from geometry processing)
-    
-    # Energy analysis
-    cooling_load = max(0, (base_temp - 22) * building_area * 0.05)  # kWh
-    heating_load = max(0, (18 - base_temp) * building_area * 0.03)  # kWh
+def simulation_options(simulation_id):
+    """Per-job options stored with the simulation (sweep scenarios, retrofit measures, parameters)"""
+    row = db.query_one('SELECT options FROM simulations WHERE id = ?', (simulation_id,))
+    return json.loads(row[0]) if row and row[0] else {}
+
+def simulation_input_keys(weather_fingerprint, geometry, simulation_type, options):
+    """Input hashes of a simulation (see chip_incremental); the reuse flag is not an input"""
+    options = {name: value for name, value in options.items() if name != 'reuse'}
+    return input_keys(weather_fingerprint, geometry, options.get('parameters'), simulation_type, options)
+
+def request_input_keys(building_id, simulation_type, options):
+    """Input hashes for a new request, or None while its inputs are not yet known"""
+    if simulation_type == 'retrofit_optimization':
+        return None
+    building = db.query_one('SELECT latitude, longitude, file_path, content_hash FROM buildings WHERE id = ?',
+                            (building_id,))
+    if not building:
+        return None
+    latitude, longitude, file_path, content_hash = building
+    geometry = None
+    if content_hash:
+        drawing = upload_store.drawing(content_hash)
+        if drawing["geometry_status"] in ('queued', 'processing'):
+            return None  # the run itself will wait for the geometry
+        geometry = drawing["geometry"]
+    elif file_path:
+        return None  # drawing from before deduplication; adopted when the run starts
+    return simulation_input_keys(get_weather_fingerprint(latitude, longitude), geometry, simulation_type, options)
+
+def resimulate_sections(base_id, weather_year, geometry, parameters, sections, free_running, new_loads):
+    """A run's results rebuilt from base_id's, with sections recomputed
     
-    # Solar analysis
-    solar_gain = weather_data['current_conditions']['solar_irradiance'] * 0.3 * 120  # Window area
+    free_running holds the shared free-running series at full precision, so
+    recomputed sections equal a full run's. With new_loads the HVAC loads
+    differ from the base's and are returned as a new hourly matrix, otherwise
+    the base's series are shared and None is returned.
+    """
+    results = results_store.load(base_id)
+    single = with_leading_axis(weather_year)
+    hourly = {name: series[None] for name, series in free_running.items()}
+    hourly["outdoor_temperature"] = np.broadcast_to(single['dry_bulb'], hourly["indoor_temperature"].shape)
+    hourly.update(hvac_loads(hourly["indoor_temperature"], geometry, parameters))
+    metrics = summarize_hourly(hourly, geometry, parameters, single, sections)
+    results.update(building_results(metrics)[0])
+    return results, hourly_matrix(hourly) if new_loads else None
+
+def abandon_simulation(simulation_id, state):
+    """Record a job the queue gave up on: cancelled, or out of attempts after lost leases"""
+    update_simulation_status(simulation_id, 'cancelled' if state == 'cancelled' else 'failed')
+
+simulation_scheduler = SimulationScheduler(
+    perform_simulation,
+    job_queue,
+    workers=SIMULATION_WORKERS,
+    processes=SIMULATION_PROCESSES,
+    max_queue=SIMULATION_QUEUE_SIZE,
+    on_abandoned=abandon_simulation
+)
+
+def resume_pending_simulations():
+    """Queue unfinished simulations that have no job in the queue
     
-    # Comfort analysis
-    comfort_hours = max(0, 8760 - abs(base_temp - 22) * 200)
+    Jobs outlive restarts in the queue, and interrupted ones are re-leased
+    once their lease lapses; this covers simulations recorded just before a
+    crash and databases from before the shared queue.
+    """
+    pending = db.query_all('''
+        SELECT id, building_id, simulation_type, priority FROM simulations
+        WHERE status IN ('pending', 'queued', 'running')
+        ORDER BY created_at
+    ''')
     
-    results = {
-        "simulation_type": simulation_type,
-        "building_id": building[0],
-        "timestamp": datetime.now().isoformat(),
-        "energy_analysis": {
-            "annual_cooling_load": cooling_load * 365,  # kWh/year
-            "annual_heating_load": heating_load * 365,  # kWh/year
-            "total_energy_consumption": (cooling_load + heating_load) * 365,
-            "peak_cooling_demand": cooling_load * 1.5,  # kW
-            "peak_heating_demand": heating_load * 1.2,  # kW
-            "energy_intensity": ((cooling_load + heating_load) * 365) / building_area  # kWh/m²/year
-        },
-        "solar_analysis": {
-            "annual_solar_gain": solar_gain * 365 * 8,  # kWh/year (8 hours average)
-            "peak_solar_gain": solar_gain * 1.2,  # kW
-            "solar_heat_gain_coefficient": 0.3,
-            "daylight_availability": min(100, (solar_gain / 10) * 100)  # percentage
-        },
-        "thermal_comfort": {
-            "comfortable_hours": comfort_hours,
-            "comfort_percentage": (comfort_hours / 8760) * 100,
-            "overheating_hours": max(0, (base_temp - 26) * 50),
-            "underheating_hours": max(0, (16 - base_temp) * 50)
-        },
-        "climate_resilience": {
-            "heat_stress_risk": "Medium" if base_temp > 30 else "Low",
-            "cooling_system_strain": min(100, (base_temp - 22) * 10),
-            "adaptive_comfort_potential": 75,  # percentage
-            "climate_change_vulnerability": "Moderate"
-        }
-    }
+    for simulation_id, building_id, simulation_type, priority in pending:
+        # Persisted jobs are never dropped, even past the queue bound
+        if simulation_scheduler.submit(simulation_id, building_id, simulation_type,
+                                       priority or 0, force=True):
+            update_simulation_status(simulation_id, 'queued')
+
+# Importing this module has no side effects; create_app() prepares the process
+_app_ready = False
+_app_lock = threading.Lock()
+
+def create_app(migrate=True, resume_jobs=True):
+    """Create folders, migrate the schema and resume interrupted jobs, once per process
     
-    return results
+    Under gunicorn the master migrates before forking (see gunicorn.conf.py) and
+    only the first worker resumes jobs; the dev server does everything here.
+    Every process claims simulation jobs from the shared queue.
+    """
+    global _app_ready
+    with _app_lock:
+        if _app_ready:
+            return app
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        os.makedirs(upload_store.partial_folder, exist_ok=True)
+        if migrate:
+            init_db()
+        if resume_jobs:
+            resume_pending_simulations()
+            geometry_pipeline.resume()
+        # Claim queued jobs from every process and node, not just local submits
+        simulation_scheduler.start()
+        _app_ready = True
+    return app
+
+@app.before_request
+def ensure_app_ready():
+    # Servers that import `app` without calling create_app() initialise on first request
+    if not _app_ready:
+        create_app()
 
 # Results endpoint
 @app.route('/api/results/<simulation_id>', methods=['GET'])
 def get_simulation_results(simulation_id):
-    """Retrieve simulation results"""
+    """Retrieve simulation results
+    
+    ?fields=energy_analysis.energy_intensity,thermal_comfort returns only
+    the selected metrics.
+    """
     try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM simulations WHERE id = ?', (simulation_id,))
-        simulation = cursor.fetchone()
-        conn.close()
+        simulation = db.query_one('SELECT status, results_path, completed_at FROM simulations WHERE id = ?',
+                                  (simulation_id,))
         
         if not simulation:
             return jsonify({"error": "Simulation not found"}), 404
         
-        status = simulation[3]
+        status = simulation[0]
         
         if status == 'completed':
-            results_path = simulation[4]
-            if os.path.exists(results_path):
-                with open(results_path, 'r') as f:
-                    results = json.load(f)
-                return jsonify(results)
-            else:
-                return jsonify({"error": "Results file not found"}), 404
+            # Completed results never change: answer revalidations without loading them
+            fields = [field for field in request.args.get('fields', '').split(',') if field]
+            etag = make_etag('results', simulation_id, simulation[2], ','.join(fields))
+            cached = not_modified(etag, IMMUTABLE)
+            if cached is not None:
+                return cached
+            
+            results = results_store.load(simulation_id, fields)
+            if results is None:
+                results = load_results_document(simulation[1])
+            if results is None:
+                return jsonify({"error": "Results not found"}), 404
+            inputs = input_index.describe(simulation_id)
+            if inputs is not None:
+                results["inputs"] = inputs  # input hash, and the run it reused sections from
+            return cache_headers(jsonify(results), etag, IMMUTABLE)
         else:
-            return jsonify({
+            response = jsonify({
                 "simulation_id": simulation_id,
                 "status": status,
                 "message": f"Simulation is {status}"
             })
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def load_results_document(results_path):
+    """Results kept as JSON documents: retrofit searches, and runs from before the columnar store"""
+    if not results_path or not results_path.endswith('.json'):
+        return None
+    local_path = blob_store.local_path(results_path)
+    if local_path is None:
+        return None
+    with open(local_path, 'r') as f:
+        return json.load(f)
+
+@app.route('/api/results/<simulation_id>/hourly', methods=['GET'])
+def get_hourly_results(simulation_id):
+    """Hourly series for a completed simulation
+    
+    ?series=cooling_load,indoor_temperature&start=0&end=168 selects series
+    and an hour range; format=binary returns raw little-endian float32 rows.
+    """
+    try:
+        series = [name for name in request.args.get('series', '').split(',') if name]
+        start = int(request.args.get('start', 0))
+        end = int(request.args['end']) if 'end' in request.args else None
+        
+        simulation = db.query_one('SELECT completed_at FROM simulations WHERE id = ? AND status = ?',
+                                  (simulation_id, 'completed'))
+        etag = make_etag('hourly', simulation_id, simulation[0], request.query_string.decode()) if simulation else None
+        cached = not_modified(etag, IMMUTABLE) if etag else None
+        if cached is not None:
+            return cached
+        
+        hourly = results_store.load_hourly(simulation_id, series, start, end)
+        if hourly is None:
+            return jsonify({"error": "Hourly results not found"}), 404
+        
+        if request.args.get('format') == 'binary':
+            names = list(hourly)
+            response = Response(
+                (hourly[name].astype('<f4', copy=False).tobytes() for name in names),
+                mimetype='application/octet-stream'
+            )
+            response.headers['X-Series'] = ','.join(names)
+            response.headers['X-Hours'] = str(len(hourly[names[0]]) if names else 0)
+        else:
+            response = jsonify({
+                "simulation_id": simulation_id,
+                "start": start,
+                "series": {name: values.tolist() for name, values in hourly.items()}
+            })
+        return cache_headers(response, etag, IMMUTABLE) if etag else response
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Retrofit optimizer
+@app.route('/api/retrofit/optimize', methods=['POST'])
+def optimize_building_retrofits():
+    """Cost-versus-savings Pareto front of retrofit packages per building
+    
+    Body: {"building_ids": [...]} (or "building_id"), optional "measures".
+    Up to RETROFIT_SYNC_BUILDINGS are optimised within the request; larger
+    requests, or "background": true, are queued as simulation jobs whose
+    results are read from /api/results/<simulation_id>. Background batches
+    share the bounded simulation queue, so they are limited to
+    SIMULATION_QUEUE_SIZE buildings and rejected with 429 when it lacks room.
+    """
+    try:
+        data = request.json or {}
+        building_ids = data.get('building_ids') or ([data['building_id']] if data.get('building_id') else [])
+        if not building_ids:
+            return jsonify({"error": "building_id or building_ids required"}), 400
+        measures = parse_measures(data.get('measures'))
+        
+        buildings = load_buildings_by_id(building_ids)
+        found = {building[0] for building in buildings}
+        missing = [building_id for building_id in building_ids if building_id not in found]
+        if not buildings:
+            return jsonify({"error": "No buildings matched"}), 404
+        
+        if data.get('background') or len(buildings) > RETROFIT_SYNC_BUILDINGS:
+            if len(buildings) > SIMULATION_QUEUE_SIZE:
+                return jsonify({"error": f"Background retrofit batch limited to {SIMULATION_QUEUE_SIZE} buildings"}), 400
+            # Shed load before touching the database
+            if simulation_scheduler.free_slots() < len(buildings):
+                return queue_full_response(simulation_scheduler.retry_after())
+            return queue_retrofit_batch(buildings, measures, missing)
+        
+        # Share the time budget so the whole request stays within it
+        budget = RETROFIT_TIME_BUDGET / len(buildings)
+        results = []
+        for building in buildings:
+            weather_year = get_weather_year(building[2], building[3])
+            drawing = building_geometry(building[0])
+            results.append(optimize_retrofits(
+                building, weather_year, drawing["geometry"] if drawing else None, measures, budget
+            ))
+        
+        return jsonify({"results": results, "missing_building_ids": missing})
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def queue_retrofit_batch(buildings, measures, missing):
+    """Queue one retrofit_optimization job per building (202 response)"""
+    options = json.dumps({"measures": measures})
+    simulation_ids = {building[0]: str(uuid.uuid4()) for building in buildings}
+    db.executemany('''
+        INSERT INTO simulations (id, building_id, simulation_type, status, options)
+        VALUES (?, ?, 'retrofit_optimization', 'queued', ?)
+    ''', [(simulation_id, building_id, options) for building_id, simulation_id in simulation_ids.items()])
+    
+    queued = {}
+    for building_id, simulation_id in simulation_ids.items():
+        try:
+            publish_simulation_status(simulation_id, 'queued')
+            simulation_scheduler.submit(simulation_id, building_id, 'retrofit_optimization')
+        except QueueFullError as e:
+            # Lost the race for the last slots: drop the jobs that did not fit
+            unqueued = [sid for bid, sid in simulation_ids.items() if bid not in queued]
+            db.executemany('DELETE FROM simulations WHERE id = ?', [(sid,) for sid in unqueued])
+            if not queued:
+                return queue_full_response(e.retry_after)
+            response = jsonify({
+                "status": "partially_queued",
+                "simulation_ids": queued,
+                "not_queued_building_ids": [bid for bid in simulation_ids if bid not in queued],
+                "retry_after": e.retry_after,
+                "missing_building_ids": missing
+            })
+            response.status_code = 202
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        queued[building_id] = simulation_id
+    
+    return jsonify({
+        "status": "queued",
+        "simulation_ids": queued,
+        "missing_building_ids": missing
+    }), 202
+
+def optimize_retrofits(building, weather_year, geometry, measures=None, time_budget=RETROFIT_TIME_BUDGET):
+    """Retrofit search for one building, model chunks evaluated in the process pool"""
+    optimizer = RetrofitOptimizer(
+        weather_year, geometry, measures,
+        run_many=simulation_scheduler.map_cpu,
+        time_budget=time_budget
+    )
+    results = {
+        "simulation_type": "retrofit_optimization",
+        "building_id": building[0],
+        "name": building[1],
+        "timestamp": datetime.now().isoformat(),
+        "weather_source": weather_year['source']
+    }
+    results.update(optimizer.optimize())
+    return results
+
 # Recommendations endpoint
 @app.route('/api/recommendations/<building_id>', methods=['GET'])
 def get_retrofitting_recommendations(building_id):
     """Get climate-resilient retrofitting recommendations"""
     try:
-        # Get building and latest simulation data
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM buildings WHERE id = ?', (building_id,))
-        building = cursor.fetchone()
-        
-        cursor.execute('''
-            SELECT * FROM simulations 
-            WHERE building_id = ? AND status = "completed"
-            ORDER BY completed_at DESC LIMIT 1
-        ''', (building_id,))
-        simulation = cursor.fetchone()
-        conn.close()
+        buildings = latest_simulations([building_id])
         
-        if not building:
+        if not buildings:
             return jsonify({"error": "Building not found"}), 404
         
-        lat, lon = building[2], building[3]
-        climate_zone = determine_climate_zone(lat)
+        # Recommendations change only with the building's latest simulation or the rules
+        etag = make_etag('recommendations', *buildings[0], recommendation_engine.table.version)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
         
-        # Generate recommendations based on climate and building type
-        recommendations = generate_climate_recommendations(climate_zone, building, simulation)
+        recommendations = recommendations_for(buildings)
+        return cache_headers(jsonify(recommendations[building_id]), etag)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/recommendations/batch', methods=['POST'])
+def get_batch_recommendations():
+    """Recommendations for many buildings in one call
+    
+    Body: {"building_ids": [...]}
+    """
+    try:
+        building_ids = (request.json or {}).get('building_ids')
+        if not isinstance(building_ids, list) or not building_ids:
+            return jsonify({"error": "building_ids must be a non-empty list"}), 400
+        if len(building_ids) > BATCH_MAX_BUILDINGS:
+            return jsonify({"error": f"Batch limited to {BATCH_MAX_BUILDINGS} buildings"}), 400
+        
+        recommendations = building_recommendations(building_ids)
         
-        return jsonify(recommendations)
+        return jsonify({
+            "recommendations": [recommendations[building_id] for building_id in building_ids
+                                if building_id in recommendations],
+            "missing_building_ids": [building_id for building_id in building_ids
+                                     if building_id not in recommendations]
+        })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def generate_climate_recommendations(climate_zone, building, simulation):
-    """Generate climate-specific retrofitting recommendations"""
+def building_recommendations(building_ids):
+    """{building_id: recommendations}, scoring only buildings with no cached entry
     
-    recommendations = {
-        "building_id": building[0],
-        "climate_zone": climate_zone,
-        "priority_level": "High",
-        "recommendations": []
-    }
+    One query per chunk finds each building's latest simulation; cached
+    entries are keyed on it, so a newer simulation is never served stale.
+    """
+    return recommendations_for(latest_simulations(building_ids))
+
+def latest_simulations(building_ids):
+    """(id, latitude, longitude, building_type, latest simulation id) per existing building"""
+    buildings = []
+    chunk_size = 900
+    for start in range(0, len(building_ids), chunk_size):
+        chunk = building_ids[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        buildings.extend(db.query_all(f'''
+            SELECT b.id, b.latitude, b.longitude, b.building_type, (
+                SELECT r.simulation_id FROM simulation_results r
+                WHERE r.building_id = b.id
+                ORDER BY r.timestamp DESC LIMIT 1
+            )
+            FROM buildings b WHERE b.id IN ({placeholders})
+        ''', chunk))
+    return buildings
+
+def recommendations_for(buildings):
+    """{building_id: recommendations} for rows from latest_simulations()"""
+    recommendations = {}
+    misses = []
+    for building in buildings:
+        cached = recommendation_engine.cached(building[0], building[4])
+        if cached is not None:
+            recommendations[building[0]] = cached
+        else:
+            misses.append(building)
     
-    # Climate-specific recommendations
-    if climate_zone in ["Tropical", "Subtropical"]:
-        recommendations["recommendations"].extend([
-            {
-                "category": "Cooling",
-                "title": "Enhanced Natural Ventilation",
-                "description": "Install cross-ventilation systems and ceiling fans to reduce mechanical cooling loads",
-                "estimated_savings": "20-30% cooling energy",
-                "implementation_cost": "Low",
-                "climate_benefit": "Reduces overheating risk during power outages"
-            },
-            {
-                "category": "Solar Protection",
-                "title": "External Shading Systems",
-                "description": "Install overhangs, louvers, or vegetation for solar heat gain control",
-                "estimated_savings": "15-25% cooling energy",
-                "implementation_cost": "Medium",
-                "climate_benefit": "Maintains indoor comfort during extreme heat events"
-            },
-            {
-                "category": "Building Envelope",
-                "title": "Cool Roof Technology",
-                "description": "Apply reflective roof coatings or install cool roof materials",
-                "estimated_savings": "10-20% cooling energy",
-                "implementation_cost": "Low-Medium",
-                "climate_benefit": "Reduces urban heat island effect and building heat gain"
-            }
-        ])
-    
-    elif climate_zone == "Temperate":
-        recommendations["recommendations"].extend([
-            {
-                "category": "Insulation",
-                "title": "Enhanced Building Insulation",
-                "description": "Upgrade wall and roof insulation to reduce heating and cooling loads",
-                "estimated_savings": "25-40% total energy",
-                "implementation_cost": "Medium",
-                "climate_benefit": "Maintains stable indoor temperatures during extreme weather"
-            },
-            {
-                "category": "Windows",
-                "title": "High-Performance Glazing",
-                "description": "Install double or triple-glazed windows with low-E coatings",
-                "estimated_savings": "15-25% heating/cooling energy",
-                "implementation_cost": "High",
-                "climate_benefit": "Reduces heat loss and solar heat gain"
-            }
-        ])
-    
-    else:  # Cold climate
-        recommendations["recommendations"].extend([
-            {
-                "category": "Heating",
-                "title": "Heat Recovery Ventilation",
-                "description": "Install HRV systems to recover heat from exhaust air",
-                "estimated_savings": "20-30% heating energy",
-                "implementation_cost": "Medium-High",
-                "climate_benefit": "Maintains indoor air quality while conserving heat"
-            },
-            {
-                "category": "Building Envelope",
-                "title": "Air Sealing",
-                "description": "Seal air leaks to prevent heat loss and drafts",
-                "estimated_savings": "10-20% heating energy",
-                "implementation_cost": "Low",
-                "climate_benefit": "Prevents frozen pipes and maintains warmth during outages"
-            }
-        ])
-    
-    # Healthcare-specific recommendations
-    recommendations["recommendations"].extend([
-        {
-            "category": "Backup Systems",
-            "title": "Renewable Energy + Storage",
-            "description": "Install solar panels with battery backup for critical operations",
-            "estimated_savings": "30-50% grid dependency",
-            "implementation_cost": "High",
-            "climate_benefit": "Ensures power during climate-related grid failures"
-        },
-        {
-            "category": "Water Systems",
-            "title": "Rainwater Harvesting",
-            "description": "Install systems to collect and store rainwater for non-potable uses",
-            "estimated_savings": "20-40% water costs",
-            "implementation_cost": "Medium",
-            "climate_benefit": "Provides water security during droughts or supply disruptions"
-        }
-    ])
+    if not misses:
+        return recommendations
     
+    metrics = results_store.load_many(
+        [building[4] for building in misses if building[4]],
+        fields=recommendation_engine.table.metric_fields
+    )
+    zones = climate_zones([building[1] for building in misses], [building[2] for building in misses])
+    for (building_id, lat, lon, building_type, simulation_id), zone in zip(misses, zones):
+        recommendations[building_id] = recommendation_engine.recommend(
+            building_id, building_type, str(zone), simulation_id, metrics.get(simulation_id)
+        )
     return recommendations
 
 # Health check endpoint
@@ -578,42 +1485,275 @@ def health_check():
         "version": "1.0.0"
     })
 
+# Metrics endpoint (Prometheus text format)
+metrics.gauge('chip_simulation_queue_jobs', 'Simulation jobs by scheduler state',
+              lambda: {state: simulation_scheduler.stats()[state] for state in ('queued', 'running')},
+              ('state',))
+metrics.gauge('chip_simulation_avg_duration_seconds', 'Moving average of simulation job duration',
+              lambda: simulation_scheduler.stats()["avg_duration_seconds"])
+metrics.gauge('chip_simulations', 'Simulations by stored status',
+              lambda: dict(db.query_all('SELECT status, COUNT(*) FROM simulations GROUP BY status')),
+              ('status',))
+metrics.gauge('chip_drawings', 'Stored drawings by geometry extraction status',
+              lambda: dict(db.query_all('SELECT geometry_status, COUNT(*) FROM drawings GROUP BY geometry_status')),
+              ('geometry_status',))
+metrics.gauge('chip_weather_cache_entries', 'Entries in the weather cache',
+              lambda: weather_cache.stats()["entries"])
+metrics.gauge('chip_weather_cache_lookups_total', 'Weather cache lookups by outcome',
+              lambda: {outcome: weather_cache.stats()[outcome] for outcome in ('hits', 'misses', 'coalesced')},
+              ('outcome',), kind='counter')
+metrics.gauge('chip_recommendation_cache_entries', 'Entries in the recommendation cache',
+              lambda: recommendation_engine.stats()["entries"])
+metrics.gauge('chip_recommendation_cache_lookups_total', 'Recommendation cache lookups by outcome',
+              lambda: {outcome: recommendation_engine.stats()[outcome] for outcome in ('hits', 'misses')},
+              ('outcome',), kind='counter')
+metrics.gauge('chip_sse_subscribers', 'Open simulation event streams',
+              simulation_events.subscriber_count)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request latency, simulation stage timings, queue depth and cache statistics"""
+    try:
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # List buildings endpoint
+BUILDINGS_PAGE_SIZE = 100
+BUILDINGS_MAX_PAGE_SIZE = 1000
+
 @app.route('/api/buildings', methods=['GET'])
 def list_buildings():
-    """List all buildings"""
+    """List buildings, newest first, one keyset page at a time
+    
+    Query parameters: limit, cursor (from the X-Next-Cursor header),
+    building_type, bbox=min_lon,min_lat,max_lon,max_lat and format=ndjson
+    to stream every matching building.
+    """
     try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM buildings ORDER BY created_at DESC')
-        buildings = cursor.fetchall()
-        conn.close()
+        filters, params = building_filters(request.args)
         
-        buildings_list = []
-        for building in buildings:
-            buildings_list.append({
-                "id": building[0],
-                "name": building[1],
-                "latitude": building[2],
-                "longitude": building[3],
-                "building_type": building[4],
-                "created_at": building[6]
-            })
+        # Listed fields are never updated in place, so row count and newest building key version the table
+        etag = make_etag('buildings', *buildings_version(), request.query_string.decode())
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
+        if request.args.get('format') == 'ndjson':
+            response = Response(
+                stream_with_context(stream_buildings(filters, params)),
+                mimetype='application/x-ndjson'
+            )
+            return cache_headers(response, etag)
         
-        return jsonify(buildings_list)
+        limit = min(int(request.args.get('limit', BUILDINGS_PAGE_SIZE)), BUILDINGS_MAX_PAGE_SIZE)
+        after = decode_building_cursor(request.args.get('cursor'))
+        buildings = fetch_buildings_page(filters, params, after, limit)
+        
+        response = jsonify([building_to_dict(building) for building in buildings])
+        if len(buildings) == limit:
+            next_cursor = encode_building_cursor(buildings[-1])
+            response.headers['X-Next-Cursor'] = next_cursor
+            next_args = request.args.to_dict()
+            next_args['cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.path}?{urlencode(next_args)}>; rel="next"'
+        return cache_headers(response, etag)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def buildings_version():
+    return spatial_index.version()
+
+def building_filters(args):
+    """SQL conditions for the building listing filters"""
+    filters = []
+    params = []
+    
+    building_type = args.get('building_type')
+    if building_type:
+        filters.append('building_type = ?')
+        params.append(building_type)
+    
+    bbox = args.get('bbox')
+    if bbox:
+        try:
+            boxes = bbox_boxes(bbox.split(','))
+        except ValueError:
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        condition, box_params = spatial_index.box_filter(boxes)
+        filters.append(condition)
+        params.extend(box_params)
+    
+    return filters, params
+
+@app.route('/api/buildings/search', methods=['POST'])
+def search_buildings():
+    """Buildings within a radius, bounding box or GeoJSON polygon, or nearest to a point
+    
+    Body: exactly one of {"within": {"latitude", "longitude", "radius_km"}},
+    {"bbox": [min_lon, min_lat, max_lon, max_lat]}, {"polygon": GeoJSON
+    Polygon/MultiPolygon/Feature} or {"nearest": {"latitude", "longitude",
+    "k"}}; optional building_type and limit. "simulate": true (or
+    {"simulation_type": ...}) also runs a batch simulation of the hits.
+    """
+    try:
+        data = request.json or {}
+        limit = min(int(data.get('limit', SPATIAL_MAX_RESULTS)), SPATIAL_MAX_RESULTS)
+        hits = spatial_search(data)
+        
+        response = {
+            "count": len(hits),
+            "truncated": len(hits) > limit,
+            "buildings": [spatial_hit_to_dict(building, distance) for building, distance in hits[:limit]]
+        }
+        
+        simulate = data.get('simulate')
+        if simulate:
+            if len(hits) > BATCH_MAX_BUILDINGS:
+                return jsonify({"error": f"Batch limited to {BATCH_MAX_BUILDINGS} buildings"}), 400
+            simulation_type = (simulate.get('simulation_type') if isinstance(simulate, dict)
+                               else None) or 'energy_analysis'
+            response["simulation"] = (simulate_portfolio([building for building, _ in hits], simulation_type)
+                                      if hits else None)
+        
+        return jsonify(response)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/buildings/nearby', methods=['GET'])
+def nearby_buildings():
+    """Buildings near a point: ?lat=&lon= with radius_km (all within) or k (nearest k)
+    
+    Also takes building_type and limit; results are nearest first.
+    """
+    try:
+        etag = make_etag('nearby', *buildings_version(), request.query_string.decode())
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
+        point = {"latitude": request.args.get('lat'), "longitude": request.args.get('lon')}
+        query = {"building_type": request.args.get('building_type')}
+        if request.args.get('radius_km'):
+            query["within"] = dict(point, radius_km=request.args['radius_km'])
+        else:
+            query["nearest"] = dict(point, k=request.args.get('k', 10))
+        
+        limit = min(int(request.args.get('limit', SPATIAL_MAX_RESULTS)), SPATIAL_MAX_RESULTS)
+        hits = spatial_search(query)
+        response = jsonify([spatial_hit_to_dict(building, distance) for building, distance in hits[:limit]])
+        response.headers['X-Total-Count'] = str(len(hits))
+        return cache_headers(response, etag)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def spatial_search(query):
+    """[(building row, distance_km or None)] for a within/bbox/polygon/nearest query"""
+    filters, params = [], []
+    if query.get('building_type'):
+        # Unary + keeps the planner on the R-tree rather than the type index
+        filters.append('+b.building_type = ?')
+        params.append(query['building_type'])
+    return spatial_index.search(query, filters, params)
+
+def spatial_hit_to_dict(building, distance_km):
+    hit = building_to_dict(building)
+    if distance_km is not None:
+        hit["distance_km"] = round(distance_km, 3)
+    return hit
+
+def fetch_buildings_page(filters, params, after, limit):
+    """One page of buildings ordered by (created_at, id) descending"""
+    conditions = list(filters)
+    page_params = list(params)
+    if after:
+        conditions.append('(created_at, id) < (?, ?)')
+        page_params.extend(after)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return db.query_all(f'''
+        SELECT id, name, latitude, longitude, building_type, created_at
+        FROM buildings {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', page_params + [limit])
+
+def stream_buildings(filters, params):
+    """Yield every matching building as NDJSON, a page at a time"""
+    after = None
+    while True:
+        buildings = fetch_buildings_page(filters, params, after, BUILDINGS_MAX_PAGE_SIZE)
+        for building in buildings:
+            yield json.dumps(building_to_dict(building)) + '\n'
+        if len(buildings) < BUILDINGS_MAX_PAGE_SIZE:
+            return
+        after = (buildings[-1][5], buildings[-1][0])
+
+def building_to_dict(building):
+    return {
+        "id": building[0],
+        "name": building[1],
+        "latitude": building[2],
+        "longitude": building[3],
+        "building_type": building[4],
+        "created_at": building[5]
+    }
+
+def encode_building_cursor(building):
+    raw = f"{building[5]}|{building[0]}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_building_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        created_at, building_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, building_id
+
 if __name__ == '__main__':
     print("Starting CHIP MVP Backend Server...")
     print("Available endpoints:")
     print("- POST /api/upload - Upload building drawings")
+    print("- POST /api/uploads - Start a resumable chunked upload")
+    print("- POST /api/import - Bulk import buildings (CSV manifest + ZIP of drawings)")
+    print("- PUT /api/uploads/<upload_id> - Upload a chunk (Content-Range)")
+    print("- GET /api/uploads/<upload_id> - Upload progress and geometry status")
+    print("- GET /api/buildings/<building_id>/geometry - Building geometry and extraction status")
     print("- GET /api/weather/<lat>/<lon> - Get weather data")
-    print("- POST /api/simulate - Run building simulation")
+    print("- GET /api/weather/cache - Weather cache statistics")
+    print("- POST /api/simulate - Run building simulation (\"scenarios\" for a climate-scenario sweep)")
+    print("- POST /api/simulate/<simulation_id>/cancel - Cancel a simulation")
+    print("- GET /api/simulate/<simulation_id>/events - Stream simulation status (SSE)")
+    print("- POST /api/simulate/batch - Simulate a building portfolio")
     print("- GET /api/results/<simulation_id> - Get simulation results")
+    print("- GET /api/results/<simulation_id>/hourly - Get hourly result series")
+    print("- POST /api/retrofit/optimize - Cost-versus-savings retrofit packages per building")
     print("- GET /api/recommendations/<building_id> - Get retrofitting recommendations")
-    print("- GET /api/buildings - List all buildings")
+    print("- POST /api/recommendations/batch - Recommendations for many buildings")
+    print("- GET /api/buildings - List buildings (paginated, ?format=ndjson to stream)")
+    print("- POST /api/buildings/search - Buildings within a radius, bbox or polygon, or nearest k (optionally simulate them)")
+    print("- GET /api/buildings/nearby - Buildings within radius_km of, or nearest k to, a point")
     print("- GET /api/health - Health check")
+    print("- GET /api/metrics - Prometheus metrics (latency, stage timings, queue depth, caches)")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server; production runs `gunicorn -c gunicorn.conf.py wsgi:app`.
+    # With the reloader only the serving child (WERKZEUG_RUN_MAIN) sets up the app.
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN'):
+        create_app()
+    app.run(debug=debug, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -139,17 +139,11 @@ function UploadView({ onBuildingUploaded }) {
     setUploadStatus('Uploading building data...');
 
     try {
-      const uploadData = new FormData();
-      uploadData.append('file', formData.file);
-      uploadData.append('name', formData.name);
-      uploadData.append('latitude', formData.latitude);
-      uploadData.append('longitude', formData.longitude);
-      uploadData.append('building_type', formData.building_type);
-
-      const response = await axios.post('http://localhost:5000/api/upload', uploadData, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
+      await uploadInChunks(formData.file, {
+        name: formData.name,
+        latitude: formData.latitude,
+        longitude: formData.longitude,
+        building_type: formData.building_type
       });
 
       setUploadStatus('Building uploaded successfully!');
@@ -171,6 +165,47 @@ function UploadView({ onBuildingUploaded }) {
     }
   };
 
+  // Large CAD sets go up in resumable chunks; a failed chunk resumes where the server left off
+  const uploadInChunks = async (file, building) => {
+    const session = await axios.post('http://localhost:5000/api/uploads', {
+      filename: file.name,
+      size: file.size,
+      ...building
+    });
+    const { upload_id, chunk_size } = session.data;
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+      const end = Math.min(offset + chunk_size, file.size);
+      try {
+        const response = await axios.put(
+          `http://localhost:5000/api/uploads/${upload_id}`,
+          file.slice(offset, end),
+          {
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`
+            }
+          }
+        );
+        offset = end;
+        retries = 0;
+        setUploadStatus(`Uploading building data... ${Math.round(offset / file.size * 100)}%`);
+        if (response.status === 201) {
+          return response.data;
+        }
+      } catch (error) {
+        if (retries >= 3) {
+          throw error;
+        }
+        retries += 1;
+        const status = await axios.get(`http://localhost:5000/api/uploads/${upload_id}`);
+        offset = status.data.received_bytes;
+      }
+    }
+  };
+
   const getLocationFromBrowser = () => {
     if (navigator.geolocation) {
       navigator.geolocation.getCurrentPosition(
@@ -365,8 +400,8 @@ function SimulationView({ building, onSimulationComplete }) {
       setSimulationId(simId);
       setSimulationStatus('running');
 
-      // Poll for results
-      pollForResults(simId);
+      // Follow status pushes from the server
+      watchSimulation(simId);
 
     } catch (error) {
       console.error('Error starting simulation:', error);
@@ -374,6 +409,35 @@ function SimulationView({ building, onSimulationComplete }) {
     }
   };
 
+  const watchSimulation = (simId) => {
+    if (!window.EventSource) {
+      pollForResults(simId);
+      return;
+    }
+
+    const source = new EventSource(`http://localhost:5000/api/simulate/${simId}/events`);
+
+    source.addEventListener('status', async (event) => {
+      const update = JSON.parse(event.data);
+
+      if (update.status === 'completed') {
+        source.close();
+        const response = await axios.get(`http://localhost:5000/api/results/${simId}`);
+        setSimulationStatus('completed');
+        onSimulationComplete(response.data);
+      } else if (update.status === 'failed' || update.status === 'cancelled') {
+        source.close();
+        setSimulationStatus('failed');
+      }
+    });
+
+    source.onerror = () => {
+      // Stream unavailable (e.g. behind a buffering proxy): fall back to polling
+      source.close();
+      pollForResults(simId);
+    };
+  };
+
   const pollForResults = async (simId) => {
     const maxAttempts = 30; // 5 minutes with 10-second intervals
     let attempts = 0;
@@ -382,7 +446,7 @@ function SimulationView({ building, onSimulationComplete }) {
       try {
         const response = await axios.get(`http://localhost:5000/api/results/${simId}`);
         
-        if (response.data.status === 'completed') {
+        if (response.data.energy_analysis) {
           setSimulationStatus('completed');
           onSimulationComplete(response.data);
           return;
@@ -0,0 +1,311 @@
+# CHIP MVP Benchmark
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Benchmarks the backend's hot paths in-process. A synthetic portfolio is
+# imported into a throwaway working directory (database, uploads, results),
+# weather comes from a static provider so no network is touched, and each
+# endpoint is driven through the Flask test client by a pool of concurrent
+# workers. Latency percentiles, throughput and peak RSS per endpoint are
+# written as JSON so runs can be compared across releases.
+#
+# Run with:  python chip_benchmark.py --buildings 2000 --requests 200 --concurrency 8
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+BACKEND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chip-mvp-backend.py')
+
+BUILDING_TYPES = ('hospital', 'clinic', 'emergency', 'healthcare')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children (MB)"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    usage = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+             + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(usage * unit / 1024 / 1024, 1)
+
+
+def latency_summary(latencies, wall_seconds):
+    latencies = np.asarray(latencies) * 1000
+    if not latencies.size:
+        return {"requests": 0}
+    summary = {
+        "requests": int(latencies.size),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "mean_ms": round(float(latencies.mean()), 2),
+        "max_ms": round(float(latencies.max()), 2)
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = round(latencies.size / wall_seconds, 1)
+    return summary
+
+
+def synthetic_dxf(width, depth, floors=2):
+    """A small rectangular plan drawing, distinct for each size"""
+    lines = ['0', 'SECTION', '2', 'HEADER', '9', '$INSUNITS', '70', '6', '0', 'ENDSEC',
+             '0', 'SECTION', '2', 'ENTITIES']
+    for floor in range(floors):
+        lines += ['0', 'LWPOLYLINE', '8', 'A-FLOR', '38', str(floor * 3.5), '70', '1']
+        for x, y in ((0, 0), (width, 0), (width, depth), (0, depth)):
+            lines += ['10', str(x), '20', str(y)]
+    lines += ['0', 'LINE', '8', 'A-GLAZ', '39', '1.5', '10', '1', '20', '0', '11', str(width / 3), '21', '0']
+    lines += ['0', 'ENDSEC', '0', 'EOF']
+    return ('\n'.join(lines) + '\n').encode('ascii')
+
+
+class Benchmark:
+    """Seeds a portfolio and drives endpoints concurrently through the test client"""
+
+    def __init__(self, backend, concurrency=8, seed=42):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.random = random.Random(seed)
+        self.results = {}
+        self.building_ids = []
+        self.simulation_ids = []
+        self._local = threading.local()
+
+    def client(self):
+        # One test client per worker thread
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.backend.app.test_client()
+        return self._local.client
+
+    def run(self, name, count, make_request):
+        """Issue count requests, make_request(client, index) -> response, and record them"""
+        rss_before = peak_rss_mb()
+        responses, latencies, status_codes, wall_seconds = self.drive(count, make_request)
+        self.record(name, latencies, status_codes, wall_seconds, rss_before)
+        return responses
+
+    def drive(self, count, make_request):
+        """Run requests across the worker pool; returns (responses, latencies, status codes, wall time)"""
+        latencies = []
+        status_codes = {}
+        lock = threading.Lock()
+
+        def one(index):
+            started = time.perf_counter()
+            response = make_request(self.client(), index)
+            response.get_data()  # streamed bodies count towards latency
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+            return response
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            responses = list(pool.map(one, range(count)))
+        return responses, latencies, status_codes, time.perf_counter() - started
+
+    def record(self, name, latencies, status_codes, wall_seconds, rss_before):
+        summary = latency_summary(latencies, wall_seconds)
+        summary["errors"] = sum(n for code, n in status_codes.items() if code >= 400)
+        summary["status_codes"] = {str(code): n for code, n in sorted(status_codes.items())}
+        summary["peak_rss_mb"] = peak_rss_mb()
+        if rss_before is not None:
+            summary["rss_growth_mb"] = round(summary["peak_rss_mb"] - rss_before, 1)
+        self.results[name] = summary
+
+    def seed(self, buildings):
+        """Import a synthetic portfolio through /api/import"""
+        manifest = io.StringIO()
+        manifest.write('name,latitude,longitude,building_type\n')
+        for index in range(buildings):
+            manifest.write(f"Facility {index},{self.random.uniform(-50, 60):.4f},"
+                           f"{self.random.uniform(-120, 150):.4f},{self.random.choice(BUILDING_TYPES)}\n")
+        started = time.perf_counter()
+        response = self.client().post('/api/import', data={
+            'manifest': (io.BytesIO(manifest.getvalue().encode()), 'manifest.csv')
+        }, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - started
+        report = response.get_json()
+        self.building_ids = [row["building_id"] for row in report["rows"] if row["status"] == "imported"]
+        self.results["import"] = {
+            "buildings": len(self.building_ids),
+            "seconds": round(elapsed, 3),
+            "buildings_per_second": round(len(self.building_ids) / elapsed, 1),
+            "peak_rss_mb": peak_rss_mb()
+        }
+
+    def upload(self, count):
+        def request(client, index):
+            drawing = synthetic_dxf(20 + index * 0.01, 15 + (index % 7))
+            return client.post('/api/upload', data={
+                'file': (io.BytesIO(drawing), f"bench-{index}.dxf"),
+                'name': f"Upload {index}", 'latitude': '28.6', 'longitude': '77.2',
+                'building_type': 'hospital'
+            }, content_type='multipart/form-data')
+        self.run('upload', count, request)
+
+    def simulate(self, count, timeout=300):
+        """Queue simulations, then poll results until they finish"""
+        building_ids = [self.random.choice(self.building_ids) for _ in range(count)]
+        submitted = {}
+
+        def request(client, index):
+            # Always run the model: repeats would otherwise be answered from earlier results
+            response = client.post('/api/simulate', json={'building_id': building_ids[index], 'reuse': False})
+            if response.status_code == 200:
+                submitted[response.get_json()["simulation_id"]] = time.perf_counter()
+            return response
+        self.run('simulate', count, request)
+
+        # Poll like a client would; every poll is a measured request
+        pending = set(submitted)
+        turnaround = []
+        poll_latencies = []
+        poll_codes = {}
+        poll_seconds = 0.0
+        rss_before = peak_rss_mb()
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            batch = sorted(pending)
+            responses, latencies, status_codes, wall_seconds = self.drive(
+                len(batch), lambda client, index: client.get(f"/api/results/{batch[index]}"))
+            poll_latencies += latencies
+            poll_seconds += wall_seconds
+            for code, n in status_codes.items():
+                poll_codes[code] = poll_codes.get(code, 0) + n
+            for simulation_id, response in zip(batch, responses):
+                body = response.get_json() or {}
+                if "energy_analysis" in body or body.get("status") in ('failed', 'cancelled'):
+                    pending.discard(simulation_id)
+                    turnaround.append(time.perf_counter() - submitted[simulation_id])
+            time.sleep(0.05)
+        self.record('results_poll', poll_latencies, poll_codes, poll_seconds, rss_before)
+
+        self.results["simulation_turnaround"] = latency_summary(turnaround, None)
+        self.results["simulation_turnaround"]["unfinished"] = len(pending)
+        self.simulation_ids = sorted(set(submitted) - pending)
+
+    def results_reads(self, count):
+        if not self.simulation_ids:
+            return
+        ids = self.simulation_ids
+        self.run('results', count, lambda client, index: client.get(f"/api/results/{ids[index % len(ids)]}"))
+        self.run('results_hourly', count, lambda client, index: client.get(
+            f"/api/results/{ids[index % len(ids)]}/hourly?series=cooling_load,indoor_temperature&end=168"))
+
+    def recommendations(self, count):
+        ids = self.building_ids
+        self.run('recommendations', count, lambda client, index: client.get(
+            f"/api/recommendations/{ids[index % len(ids)]}"))
+        self.run('recommendations_batch', max(1, count // 10), lambda client, index: client.post(
+            '/api/recommendations/batch', json={'building_ids': self.random.sample(ids, min(100, len(ids)))}))
+
+    def listing(self, count):
+        self.run('buildings_list', count, lambda client, index: client.get('/api/buildings?limit=100'))
+        self.run('buildings_filtered', count, lambda client, index: client.get(
+            f"/api/buildings?limit=100&building_type={BUILDING_TYPES[index % len(BUILDING_TYPES)]}"
+            "&bbox=-60,-30,60,40"))
+
+    def weather(self, count):
+        # The route's float converters do not accept negative coordinates
+        self.run('weather', count, lambda client, index: client.get(
+            f"/api/weather/{self.random.uniform(0, 60):.2f}/{self.random.uniform(0, 150):.2f}"))
+
+    def batch_simulate(self, count, size=500):
+        self.run('simulate_batch', count, lambda client, index: client.post('/api/simulate/batch', json={
+            'building_ids': self.random.sample(self.building_ids, min(size, len(self.building_ids)))
+        }))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(BACKEND_PATH), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_backend(workdir):
+    """Import the backend with its database and folders inside workdir"""
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(BACKEND_PATH))
+    from wsgi import load_backend as import_backend
+    backend = import_backend()
+    backend.create_app()
+    return backend
+
+
+def run_benchmark(buildings=2000, requests=200, concurrency=8, seed=42):
+    workdir = tempfile.mkdtemp(prefix='chip-bench-')
+    backend = load_backend(workdir)
+
+    import chip_weather
+    from chip_weather_providers import StaticWeatherProvider
+    chip_weather.set_weather_provider(StaticWeatherProvider())
+
+    bench = Benchmark(backend, concurrency, seed)
+    started = time.perf_counter()
+    bench.seed(buildings)
+    bench.upload(max(1, requests // 4))
+    bench.simulate(requests)
+    bench.results_reads(requests)
+    bench.recommendations(requests)
+    bench.listing(requests)
+    bench.weather(requests)
+    bench.batch_simulate(max(1, requests // 50))
+    backend.simulation_scheduler.shutdown()
+    backend.geometry_pipeline.shutdown(wait=False)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "buildings": buildings,
+            "requests_per_endpoint": requests,
+            "concurrency": concurrency,
+            "simulation_processes": backend.SIMULATION_PROCESSES,
+            "workdir": workdir,
+            "seconds": round(time.perf_counter() - started, 2)
+        },
+        "endpoints": bench.results
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the CHIP backend hot paths")
+    parser.add_argument('--buildings', type=int, default=2000, help="synthetic portfolio size")
+    parser.add_argument('--requests', type=int, default=200, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent clients")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None  # the run changes directory
+
+    report = run_benchmark(args.buildings, args.requests, args.concurrency, args.seed)
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
@@ -0,0 +1,123 @@
+# CHIP MVP Blob Storage
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Where uploaded drawings and result files live. Keys are the relative
+# paths the database already stores (uploads/<hash>.dxf,
+# results/<id>_hourly.npy), so the local filesystem store is the folders
+# as they always were. The S3 store (AWS, MinIO or any S3-compatible
+# endpoint) publishes every file to a bucket and keeps a local copy under
+# the same path, fetched on first use on other nodes. Blobs are written
+# once (content-addressed drawings, per-simulation results), so local
+# copies never go stale.
+
+import os
+import threading
+from urllib.parse import urlparse
+
+try:
+    import boto3
+except ImportError:  # only needed for s3:// stores
+    boto3 = None
+
+BLOB_STORE_URL = os.environ.get('BLOB_STORE_URL', '')  # empty: local disk; s3://bucket/prefix
+BLOB_CACHE_DIR = os.environ.get('BLOB_CACHE_DIR', '.')  # local copies of S3 blobs, under their keys
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '') or None  # MinIO or another S3-compatible server
+
+
+class BlobStore:
+    """Write-once files addressed by relative path"""
+
+    name = 'blobs'
+
+    def put_file(self, key, path):
+        """Publish the finished local file at path under key"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """A local file with key's contents, or None if there is no such blob"""
+        raise NotImplementedError
+
+
+class FileBlobStore(BlobStore):
+    """Blobs are files under root; a key is the path relative to it"""
+
+    name = 'file'
+
+    def __init__(self, root='.'):
+        self.root = root
+
+    def put_file(self, key, path):
+        target = os.path.join(self.root, key)
+        if os.path.abspath(path) != os.path.abspath(target):
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            os.replace(path, target)
+
+    def local_path(self, key):
+        path = os.path.join(self.root, key)
+        return path if os.path.exists(path) else None
+
+
+class S3BlobStore(BlobStore):
+    """Blobs in an S3 bucket with a local read-through copy of each one used"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', cache_dir=BLOB_CACHE_DIR, endpoint_url=S3_ENDPOINT_URL, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("BLOB_STORE_URL is an s3:// URL but boto3 is not installed")
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.cache = FileBlobStore(cache_dir)
+        self._fetch_locks = {}
+        self._lock = threading.Lock()
+
+    def object_key(self, key):
+        key = key.replace(os.sep, '/').lstrip('/')
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put_file(self, key, path):
+        self.cache.put_file(key, path)
+        self.client.upload_file(self.cache.local_path(key), self.bucket, self.object_key(key))
+
+    def local_path(self, key):
+        path = self.cache.local_path(key)
+        if path is not None:
+            return path
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        # One download per key, however many requests want it at once
+        with fetch_lock:
+            path = self.cache.local_path(key)
+            if path is None:
+                path = self._download(key)
+        with self._lock:
+            self._fetch_locks.pop(key, None)
+        return path
+
+    def _download(self, key):
+        target = os.path.join(self.cache.root, key)
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        temp_path = f"{target}.{threading.get_ident()}.part"
+        try:
+            self.client.download_file(self.bucket, self.object_key(key), temp_path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                return None
+            raise
+        os.replace(temp_path, target)
+        return target
+
+
+def make_blob_store(url=BLOB_STORE_URL):
+    """Blob store for a BLOB_STORE_URL; empty keeps files on local disk"""
+    parsed = urlparse(url) if url else None
+    if parsed is None or parsed.scheme in ('', 'file'):
+        return FileBlobStore(parsed.path if parsed and parsed.path else '.')
+    if parsed.scheme == 's3':
+        return S3BlobStore(parsed.netloc, parsed.path)
+    raise ValueError(f"Unsupported BLOB_STORE_URL scheme: {parsed.scheme}")
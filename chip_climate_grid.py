@@ -0,0 +1,324 @@
+# CHIP MVP Climate Grid
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Degree days, design temperatures and monthly extremes precomputed offline
+# on a global lat/lon grid, plus a daily clear-sky irradiance climatology by
+# latitude. The arrays are memory-mapped .npy files, so a lookup is a
+# bilinear interpolation over four grid nodes, and batches of coordinates
+# are looked up in one call.
+#
+# Grid nodes near weather stations (EPW/CSV files in CLIMATE_STATION_PATHS,
+# by default the local weather provider's) take inverse-distance-weighted
+# statistics of the measured years. Elsewhere they fall back to the
+# synthetic weather year, whose climatology depends on latitude only:
+# every node in a row gets much the same degree days and design
+# temperatures, differing only by the year's random day-to-day weather.
+#
+# Build the grid with:  python chip_climate_grid.py --resolution 1.0
+
+import argparse
+import json
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from chip_weather_providers import WEATHER_LOCAL_PATHS, LocalFileProvider
+from chip_weather_year import (
+    HOURS_PER_YEAR, MONTH_DAYS, generate_weather_year, monthly_totals, solar_position
+)
+
+CLIMATE_GRID_DIR = os.environ.get('CLIMATE_GRID_DIR', 'climate_grid')
+CLIMATE_GRID_RESOLUTION = float(os.environ.get('CLIMATE_GRID_RESOLUTION', 1.0))  # degrees
+# EPW/CSV station files or directories (os.pathsep separated); empty: synthetic only
+CLIMATE_STATION_PATHS = os.environ.get('CLIMATE_STATION_PATHS', WEATHER_LOCAL_PATHS)
+CLIMATE_STATION_RADIUS_KM = float(os.environ.get('CLIMATE_STATION_RADIUS_KM', 300))  # farther: synthetic
+CLIMATE_STATION_NEIGHBOURS = int(os.environ.get('CLIMATE_STATION_NEIGHBOURS', 4))
+
+DEGREE_DAY_BASE = 18.0  # °C, for both cooling and heating degree days
+SUMMER_DESIGN_PERCENTILE = 99.6
+WINTER_DESIGN_PERCENTILE = 0.4
+
+CLIMATE_FIELDS = (
+    'cooling_degree_days',
+    'heating_degree_days',
+    'summer_design_temp',
+    'winter_design_temp',
+    'mean_temp',
+    'coldest_month_temp',
+    'warmest_month_temp'
+)
+SOLAR_FIELDS = ('daily_mean_ghi', 'daily_peak_ghi')  # clear-sky W/m²
+
+MONTH_HOURS = np.array(MONTH_DAYS) * 24
+
+
+def climate_statistics(dry_bulb):
+    """Annual statistics of hourly temperatures (last axis), one per CLIMATE_FIELDS"""
+    daily_mean = dry_bulb.reshape(dry_bulb.shape[:-1] + (365, 24)).mean(axis=-1)
+    monthly_mean = monthly_totals(dry_bulb) / MONTH_HOURS
+    return np.stack([
+        np.maximum(0, daily_mean - DEGREE_DAY_BASE).sum(axis=-1),
+        np.maximum(0, DEGREE_DAY_BASE - daily_mean).sum(axis=-1),
+        np.percentile(dry_bulb, SUMMER_DESIGN_PERCENTILE, axis=-1),
+        np.percentile(dry_bulb, WINTER_DESIGN_PERCENTILE, axis=-1),
+        dry_bulb.mean(axis=-1),
+        monthly_mean.min(axis=-1),
+        monthly_mean.max(axis=-1)
+    ], axis=-1)
+
+
+def clear_sky_climatology(latitudes):
+    """Daily mean and peak clear-sky GHI (Haurwitz), shape (latitudes, 365, 2)"""
+    sin_altitude, _ = solar_position(np.asarray(latitudes, dtype=np.float64))
+    sun_up = sin_altitude > 0.01
+    safe_sin = np.where(sun_up, sin_altitude, 1)
+    ghi = np.where(sun_up, 1098 * safe_sin * np.exp(-0.057 / safe_sin), 0)
+    daily = ghi.reshape(ghi.shape[:-1] + (365, 24))
+    return np.stack([daily.mean(axis=-1), daily.max(axis=-1)], axis=-1)
+
+
+class StationClimate:
+    """Climate statistics interpolated from weather-station files
+
+    A point takes the inverse-distance-weighted statistics of up to
+    neighbours stations within radius_km; points with none that close are
+    not covered. Each station's statistics are computed once, on first use.
+    """
+
+    def __init__(self, paths, radius_km=CLIMATE_STATION_RADIUS_KM, neighbours=CLIMATE_STATION_NEIGHBOURS):
+        self.provider = LocalFileProvider(paths, cache_size=1)
+        self.radius_km = radius_km
+        self.neighbours = max(1, min(neighbours, len(self.provider.files)))
+        self._statistics = lru_cache(maxsize=None)(self._station_statistics)
+
+    def _station_statistics(self, index):
+        return climate_statistics(np.asarray(self.provider.station_year(index)['dry_bulb'], dtype=np.float64))
+
+    def lookup_many(self, lats, lons):
+        """(values, covered): CLIMATE_FIELDS along a last axis (NaN where not covered)"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.broadcast_to(np.asarray(lons, dtype=np.float64), lats.shape)
+        index, distance = self.provider.nearest_many(lats, lons, self.neighbours)
+        if self.neighbours == 1:
+            index, distance = np.asarray(index)[..., None], np.asarray(distance)[..., None]
+        near = distance <= self.radius_km
+        covered = near.any(axis=-1)
+
+        values = np.full(lats.shape + (len(CLIMATE_FIELDS),), np.nan)
+        if covered.any():
+            # Row len(files) stands in for missing neighbours, which carry no weight
+            table = np.zeros((len(self.provider.files) + 1, len(CLIMATE_FIELDS)))
+            for station in np.unique(index[near]):
+                table[station] = self._statistics(int(station))
+            weights = np.where(near, 1 / np.maximum(distance, 1) ** 2, 0)[covered]
+            values[covered] = ((weights[..., None] * table[index[covered]]).sum(axis=-2)
+                               / weights.sum(axis=-1, keepdims=True))
+        return values, covered
+
+
+@lru_cache(maxsize=1)
+def station_climate(paths=CLIMATE_STATION_PATHS):
+    """StationClimate over the configured station files, or None without any"""
+    paths = [path for path in paths.split(os.pathsep) if path]
+    return StationClimate(paths) if paths else None
+
+
+def grid_axes(resolution):
+    latitudes = np.linspace(-90, 90, int(round(180 / resolution)) + 1)
+    longitudes = -180 + np.arange(int(round(360 / resolution))) * resolution
+    return latitudes, longitudes
+
+
+def build_climate_grid(directory=CLIMATE_GRID_DIR, resolution=CLIMATE_GRID_RESOLUTION,
+                       weather_year=generate_weather_year, progress=None, stations=None):
+    """Compute the grid and write it to directory
+
+    Nodes covered by stations (a StationClimate) use their statistics; the
+    rest use weather_year(lat, lon).
+    """
+    os.makedirs(directory, exist_ok=True)
+    latitudes, longitudes = grid_axes(resolution)
+
+    climate_path = os.path.join(directory, 'climate.npy')
+    temp_path = climate_path + '.tmp.npy'
+    climate = np.lib.format.open_memmap(
+        temp_path, mode='w+', dtype=np.float32,
+        shape=(len(latitudes), len(longitudes), len(CLIMATE_FIELDS))
+    )
+    row = np.empty((len(longitudes), HOURS_PER_YEAR))
+    station_nodes = 0
+    for i, lat in enumerate(latitudes):
+        # One latitude row at a time: weather years are stacked, statistics vectorised
+        if stations is not None:
+            values, covered = stations.lookup_many(np.full(len(longitudes), lat), longitudes)
+        else:
+            values, covered = np.empty((len(longitudes), len(CLIMATE_FIELDS))), np.zeros(len(longitudes), bool)
+        synthetic = np.flatnonzero(~covered)
+        for k, j in enumerate(synthetic):
+            row[k] = weather_year(float(lat), float(longitudes[j]))['dry_bulb']
+        if len(synthetic):
+            values[synthetic] = climate_statistics(row[:len(synthetic)])
+        climate[i] = values
+        station_nodes += int(covered.sum())
+        if progress:
+            progress(i + 1, len(latitudes))
+    climate.flush()
+    del climate
+    os.replace(temp_path, climate_path)
+
+    np.save(os.path.join(directory, 'solar.npy'), clear_sky_climatology(latitudes).astype(np.float32))
+
+    with open(os.path.join(directory, 'grid.json'), 'w') as f:
+        json.dump({
+            "resolution": resolution,
+            "climate_fields": CLIMATE_FIELDS,
+            "solar_fields": SOLAR_FIELDS,
+            "degree_day_base": DEGREE_DAY_BASE,
+            "source": getattr(weather_year, '__name__', 'weather_year'),
+            "stations": len(stations.provider.files) if stations is not None else 0,
+            "station_radius_km": stations.radius_km if stations is not None else None,
+            "station_node_share": round(station_nodes / (len(latitudes) * len(longitudes)), 4),
+            "built_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+        }, f, indent=2)
+
+
+class ClimateGrid:
+    """Memory-mapped climate grid with interpolated, vectorised lookups"""
+
+    def __init__(self, directory=CLIMATE_GRID_DIR):
+        with open(os.path.join(directory, 'grid.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.resolution = self.meta["resolution"]
+        self.fields = tuple(self.meta["climate_fields"])
+        self.climate = np.load(os.path.join(directory, 'climate.npy'), mmap_mode='r')
+        self.solar = np.load(os.path.join(directory, 'solar.npy'), mmap_mode='r')
+
+    def _latitude_index(self, lats):
+        position = np.clip((np.asarray(lats, dtype=np.float64) + 90) / self.resolution,
+                           0, self.climate.shape[0] - 1)
+        lower = np.minimum(np.floor(position).astype(np.intp), self.climate.shape[0] - 2)
+        return lower, position - lower
+
+    def lookup_many(self, lats, lons):
+        """{field: array} bilinearly interpolated at each (lat, lon)"""
+        lat_index, lat_weight = self._latitude_index(lats)
+        position = ((np.asarray(lons, dtype=np.float64) + 180) % 360) / self.resolution
+        n_lon = self.climate.shape[1]
+        lon_index = np.floor(position).astype(np.intp) % n_lon
+        lon_next = (lon_index + 1) % n_lon  # longitude wraps at the antimeridian
+        lon_weight = position - np.floor(position)
+
+        lat_weight = lat_weight[..., None]
+        lon_weight = lon_weight[..., None]
+        values = (
+            self.climate[lat_index, lon_index] * (1 - lat_weight) * (1 - lon_weight)
+            + self.climate[lat_index, lon_next] * (1 - lat_weight) * lon_weight
+            + self.climate[lat_index + 1, lon_index] * lat_weight * (1 - lon_weight)
+            + self.climate[lat_index + 1, lon_next] * lat_weight * lon_weight
+        )
+        return {field: values[..., k] for k, field in enumerate(self.fields)}
+
+    def lookup(self, lat, lon):
+        return {field: float(value) for field, value in self.lookup_many(lat, lon).items()}
+
+    def clear_sky(self, lats, day_of_year):
+        """(daily mean, daily peak) clear-sky GHI for each latitude on a day"""
+        lat_index, lat_weight = self._latitude_index(lats)
+        day = (np.asarray(day_of_year) - 1) % 365
+        values = (self.solar[lat_index, day] * (1 - lat_weight[..., None])
+                  + self.solar[lat_index + 1, day] * lat_weight[..., None])
+        return values[..., 0], values[..., 1]
+
+
+@lru_cache(maxsize=1)
+def climate_grid():
+    """The built grid, or None until build_climate_grid has been run"""
+    if not os.path.exists(os.path.join(CLIMATE_GRID_DIR, 'grid.json')):
+        return None
+    return ClimateGrid(CLIMATE_GRID_DIR)
+
+
+def _point_climate(lat, lon):
+    """Slow path without a grid or nearby stations: statistics of the nearest node's synthetic year"""
+    return _node_climate(round(lat / CLIMATE_GRID_RESOLUTION), round(lon / CLIMATE_GRID_RESOLUTION))
+
+
+@lru_cache(maxsize=4096)
+def _node_climate(row, col):
+    lat = row * CLIMATE_GRID_RESOLUTION
+    lon = ((col * CLIMATE_GRID_RESOLUTION + 180) % 360) - 180
+    statistics = climate_statistics(generate_weather_year(lat, lon)['dry_bulb'])
+    return tuple(float(value) for value in statistics)
+
+
+def climate_lookup_many(lats, lons):
+    """{field: array} for many coordinates"""
+    grid = climate_grid()
+    if grid is not None:
+        return grid.lookup_many(lats, lons)
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.broadcast_to(np.asarray(lons, dtype=np.float64), lats.shape)
+    stations = station_climate()
+    if stations is not None:
+        values, covered = stations.lookup_many(lats.ravel(), lons.ravel())
+    else:
+        values, covered = np.empty((lats.size, len(CLIMATE_FIELDS))), np.zeros(lats.size, bool)
+    for k in np.flatnonzero(~covered):
+        values[k] = _point_climate(float(lats.ravel()[k]), float(lons.ravel()[k]))
+    return {field: values[:, k].reshape(lats.shape) for k, field in enumerate(CLIMATE_FIELDS)}
+
+
+def climate_lookup(lat, lon):
+    return {field: float(np.ravel(value)[0]) for field, value in climate_lookup_many(lat, lon).items()}
+
+
+def clear_sky_irradiance(lat, day_of_year):
+    """(daily mean, daily peak) clear-sky GHI in W/m² at a latitude on a day"""
+    grid = climate_grid()
+    if grid is not None:
+        mean, peak = grid.clear_sky(lat, day_of_year)
+        return float(mean), float(peak)
+    daily = clear_sky_climatology([lat])[0, (day_of_year - 1) % 365]
+    return float(daily[0]), float(daily[1])
+
+
+def climate_zones(lats, lons):
+    """Climate zone per coordinate from coldest-month mean temperature"""
+    coldest = climate_lookup_many(lats, lons)['coldest_month_temp']
+    return np.select(
+        [coldest >= 18, coldest >= 10, coldest >= 0],
+        ["Tropical", "Subtropical", "Temperate"],
+        default="Cold"
+    )
+
+
+def climate_zone(lat, lon):
+    return str(np.ravel(climate_zones(lat, lon))[0])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute the CHIP climate grid")
+    parser.add_argument('--resolution', type=float, default=CLIMATE_GRID_RESOLUTION,
+                        help="grid spacing in degrees")
+    parser.add_argument('--output', default=CLIMATE_GRID_DIR, help="output directory")
+    parser.add_argument('--stations', default=CLIMATE_STATION_PATHS,
+                        help=f"EPW/CSV station files or directories ({os.pathsep} separated); "
+                             "nodes without a station nearby use the synthetic weather year")
+    parser.add_argument('--station-radius', type=float, default=CLIMATE_STATION_RADIUS_KM,
+                        help="km from a station within which its data is used")
+    args = parser.parse_args()
+    station_paths = [path for path in args.stations.split(os.pathsep) if path]
+    stations = StationClimate(station_paths, args.station_radius) if station_paths else None
+    if stations is None:
+        print("No station files: every node uses the synthetic, latitude-only climatology")
+
+    started = time.time()
+
+    def report(done, total):
+        if done % 10 == 0 or done == total:
+            print(f"{done}/{total} latitude rows ({time.time() - started:.0f}s)")
+
+    build_climate_grid(args.output, args.resolution, progress=report, stations=stations)
+    print(f"Climate grid written to {args.output}")
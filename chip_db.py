@@ -0,0 +1,185 @@
+# CHIP MVP Data Access Layer
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Pooled SQLite connections in WAL mode. Each thread keeps one connection
+# for its lifetime (so sqlite3's per-connection statement cache is reused)
+# and hands it back to the pool when the thread exits.
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 10000))  # milliseconds
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 16))
+SQLITE_STATEMENT_CACHE = int(os.environ.get('SQLITE_STATEMENT_CACHE', 256))
+
+
+class _ThreadSlot:
+    """Holds a thread's connection; returns it to the pool when the thread ends"""
+
+    def __init__(self, database, conn):
+        self.database = database
+        self.conn = conn
+
+    def __del__(self):
+        self.database._release(self.conn)
+
+
+class Database:
+    """Per-thread pooled connections to one SQLite file"""
+
+    def __init__(self, path, busy_timeout=SQLITE_BUSY_TIMEOUT, pool_size=SQLITE_POOL_SIZE):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.pool_size = pool_size
+
+        self._local = threading.local()
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def connection(self):
+        """The calling thread's connection"""
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = _ThreadSlot(self, self._acquire())
+            self._local.slot = slot
+        return slot.conn
+
+    def execute(self, sql, params=()):
+        """Run one write statement in its own transaction"""
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def executemany(self, sql, rows):
+        with self.transaction() as cursor:
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def query_all(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; takes the write lock up front to avoid upgrade deadlocks"""
+        conn = self.connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield cursor
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Close idle connections and the calling thread's; others close as their threads end"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        # Released (and, now that the pool is closed, closed) by _ThreadSlot.__del__
+        self._local.__dict__.pop('slot', None)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout / 1000,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE,
+            isolation_level=None  # transactions are explicit
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+class BatchWriter:
+    """Coalesces small writes into one transaction per flush interval"""
+
+    def __init__(self, database, sql, interval=0.05, max_batch=500):
+        self.database = database
+        self.sql = sql
+        self.interval = interval
+        self.max_batch = max_batch
+
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def add(self, row):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_batch
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                self.database.executemany(self.sql, rows)
+            except sqlite3.Error:
+                with self._lock:
+                    self._rows[:0] = rows  # keep order for the retry
+                raise
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                time.sleep(self.interval)
+
+
+def make_database(url):
+    """Metadata database for a DATABASE_URL (sqlite:///relative.db, sqlite:////absolute.db or a path)"""
+    if '://' not in url:
+        return Database(url)
+    scheme, _, path = url.partition('://')
+    if scheme != 'sqlite':
+        # Every query is written for SQLite; other engines need a port of the SQL first
+        raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme}")
+    return Database(path[1:] if path.startswith('/') else path)
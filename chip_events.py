@@ -0,0 +1,78 @@
+# CHIP MVP Event Bus
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# In-process publish/subscribe for simulation status events. Subscribers
+# (Server-Sent Event streams, caches that need invalidating) are pushed
+# each transition as it happens instead of polling the database.
+
+import queue
+import threading
+from collections import OrderedDict
+
+
+class EventBus:
+    """Topic-based pub/sub that also remembers each topic's latest event"""
+
+    def __init__(self, history_size=10000, subscriber_buffer=100):
+        self.history_size = history_size
+        self.subscriber_buffer = subscriber_buffer
+
+        self._subscribers = {}  # topic -> set of queues
+        self._listeners = []
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, topic, event):
+        with self._lock:
+            self._latest[topic] = event
+            self._latest.move_to_end(topic)
+            while len(self._latest) > self.history_size:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers.get(topic, ()))
+            listeners = list(self._listeners)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow consumer: drop its oldest event rather than block the publisher
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(event)
+
+        for listener in listeners:
+            try:
+                listener(topic, event)
+            except Exception:
+                pass  # a broken listener must not stop the simulation
+
+    def subscribe(self, topic):
+        """Returns (queue, latest event or None) for a topic"""
+        subscriber = queue.Queue(maxsize=self.subscriber_buffer)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+            latest = self._latest.get(topic)
+        return subscriber, latest
+
+    def unsubscribe(self, topic, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def add_listener(self, callback):
+        """Call callback(topic, event) synchronously for every published event"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def latest(self, topic):
+        with self._lock:
+            return self._latest.get(topic)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
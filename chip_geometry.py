@@ -0,0 +1,305 @@
+# CHIP MVP Geometry Extraction
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Building envelope geometry from ASCII DXF drawings. The file is read as a
+# stream of group code / value pairs and only one entity is held at a time,
+# so drawing size does not drive memory. Layers are classified by name
+# (AIA-style A-WALL, A-GLAZ, A-ROOF, A-FLOR and common variants).
+
+import math
+import os
+
+DEFAULT_STOREY_HEIGHT = float(os.environ.get('GEOMETRY_STOREY_HEIGHT', 3.0))  # m
+DEFAULT_WINDOW_HEIGHT = float(os.environ.get('GEOMETRY_WINDOW_HEIGHT', 1.5))  # m
+
+# Checked in order; the first keyword found in the upper-cased layer name wins
+LAYER_KEYWORDS = (
+    ("window", ("GLAZ", "WINDOW", "WNDW")),
+    ("roof", ("ROOF",)),
+    ("wall", ("WALL",)),
+    ("floor", ("FLOR", "FLOOR", "SLAB", "AREA", "OUTLINE", "FOOTPRINT"))
+)
+
+# $INSUNITS code -> metres per drawing unit
+INSUNITS_SCALE = {1: 0.0254, 2: 0.3048, 4: 0.001, 5: 0.01, 6: 1.0}
+
+GEOMETRY_ENTITIES = ("LINE", "LWPOLYLINE", "POLYLINE")
+
+BINARY_DXF_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+
+
+def read_dxf_pairs(path):
+    """Yield (group code, value) pairs from an ASCII DXF file"""
+    # Text mode would turn the sentinel's \r\n into \n, so it is compared as bytes
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_DXF_SENTINEL)) == BINARY_DXF_SENTINEL:
+            raise ValueError("Binary DXF is not supported; save the drawing as ASCII DXF")
+    with open(path, 'r', encoding='latin-1') as f:
+        while True:
+            code = f.readline()
+            value = f.readline()
+            if not code or not value:
+                return
+            try:
+                yield int(code), value.strip()
+            except ValueError:
+                raise ValueError(f"Malformed DXF group code: {code.strip()!r}")
+
+
+def read_dxf_entities(path):
+    """Yield the drawing's units header, then one dict per geometric entity
+
+    The first item is {"type": "HEADER", "insunits": code}. Entities carry
+    type, layer, points [(x, y)], closed, elevation and thickness.
+    Old-style POLYLINEs are assembled from their VERTEX records.
+    """
+    section = None
+    insunits = 0
+    header_variable = None
+    header_sent = False
+    entity = None
+    polyline = None
+
+    def finish(current):
+        # A POLYLINE stays open until its SEQEND; its VERTEX records are folded into it
+        if current is None or current["type"] in ("POLYLINE", "VERTEX"):
+            return None
+        return current
+
+    for code, value in read_dxf_pairs(path):
+        if code == 0:
+            done = finish(entity)
+            entity = None
+            if done is not None:
+                yield done
+
+            if value == 'SECTION':
+                section = 'pending'
+            elif value == 'ENDSEC':
+                if section == 'HEADER' or not header_sent:
+                    header_sent = True
+                    yield {"type": "HEADER", "insunits": insunits}
+                section = None
+            elif section == 'ENTITIES':
+                if value == 'VERTEX' and polyline is not None:
+                    entity = {"type": "VERTEX", "points": []}
+                elif value == 'SEQEND' and polyline is not None:
+                    yield polyline
+                    polyline = None
+                elif value in GEOMETRY_ENTITIES:
+                    entity = {"type": value, "layer": "0", "points": [], "closed": False,
+                              "elevation": 0.0, "thickness": 0.0}
+                    if value == 'POLYLINE':
+                        polyline = entity
+            continue
+
+        if section == 'pending' and code == 2:
+            section = value
+        elif section == 'HEADER':
+            if code == 9:
+                header_variable = value
+            elif header_variable == '$INSUNITS' and code == 70:
+                insunits = int(value)
+        elif entity is not None:
+            parse_entity_pair(entity, polyline, code, value)
+
+    if not header_sent:
+        yield {"type": "HEADER", "insunits": insunits}
+    done = finish(entity)
+    if done is not None:
+        yield done
+
+
+def parse_entity_pair(entity, polyline, code, value):
+    kind = entity["type"]
+    if kind == "VERTEX":
+        if code == 10:
+            polyline["points"].append([float(value), 0.0])
+        elif code == 20 and polyline["points"]:
+            polyline["points"][-1][1] = float(value)
+        return
+
+    if code == 8:
+        entity["layer"] = value
+    elif code == 39:
+        entity["thickness"] = abs(float(value))
+    elif kind == "LINE":
+        if code in (10, 11):
+            entity["points"].append([float(value), 0.0])
+        elif code in (20, 21) and entity["points"]:
+            entity["points"][-1][1] = float(value)
+        elif code == 30:
+            entity["elevation"] = float(value)
+    elif kind == "LWPOLYLINE":
+        if code == 10:
+            entity["points"].append([float(value), 0.0])
+        elif code == 20 and entity["points"]:
+            entity["points"][-1][1] = float(value)
+        elif code == 38:
+            entity["elevation"] = float(value)
+        elif code == 70:
+            entity["closed"] = bool(int(value) & 1)
+    elif kind == "POLYLINE":
+        if code == 30:
+            entity["elevation"] = float(value)
+        elif code == 70:
+            entity["closed"] = bool(int(value) & 1)
+
+
+def layer_role(layer):
+    name = layer.upper()
+    for role, keywords in LAYER_KEYWORDS:
+        if any(keyword in name for keyword in keywords):
+            return role
+    return None
+
+
+def polygon_area(points):
+    """Signed shoelace area; positive for counter-clockwise rings"""
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+        area += x1 * y2 - x2 * y1
+    return area / 2
+
+
+def path_segments(points, closed):
+    segments = list(zip(points, points[1:]))
+    if closed and len(points) > 2:
+        segments.append((points[-1], points[0]))
+    return segments
+
+
+def segment_length(segment):
+    (x1, y1), (x2, y2) = segment
+    return math.hypot(x2 - x1, y2 - y1)
+
+
+def point_in_polygon(point, polygon):
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def facade_orientation(polygon):
+    """Bearing (degrees from north) of the outward normal of the longest edge"""
+    winding = 1 if polygon_area(polygon) > 0 else -1
+    (x1, y1), (x2, y2) = max(path_segments(polygon, True), key=segment_length)
+    dx, dy = x2 - x1, y2 - y1
+    # Outward normal of a counter-clockwise ring points to the right of each edge
+    normal_x, normal_y = dy * winding, -dx * winding
+    return round(math.degrees(math.atan2(normal_x, normal_y)) % 360, 1)
+
+
+def parse_dxf_geometry(path):
+    """Envelope geometry (m, m²) from a DXF plan, in one streaming pass"""
+    insunits = 0
+    levels = {}  # elevation -> closed floor outlines at that level
+    outline = None  # largest closed ring on any layer, if no floor layer is drawn
+    roof_area = 0.0
+    wall_length = 0.0
+    wall_heights = []
+    window_width_area = 0.0  # Σ width × height (drawing units² when heights are drawn)
+    window_widths = 0.0  # widths of windows with no drawn height
+    window_count = 0
+    entity_count = 0
+
+    for entity in read_dxf_entities(path):
+        if entity["type"] == "HEADER":
+            insunits = entity["insunits"]
+            continue
+        entity_count += 1
+        points = [tuple(point) for point in entity["points"]]
+        if len(points) < 2:
+            continue
+        role = layer_role(entity["layer"])
+        closed = entity["closed"] and len(points) > 2
+
+        if closed and (outline is None or abs(polygon_area(points)) > abs(polygon_area(outline))):
+            outline = points
+
+        if role == "floor" and closed:
+            levels.setdefault(round(entity["elevation"], 2), []).append(points)
+        elif role == "roof" and closed:
+            roof_area += abs(polygon_area(points))
+        elif role == "wall":
+            wall_length += sum(segment_length(segment) for segment in path_segments(points, closed))
+            if entity["thickness"]:
+                wall_heights.append(entity["thickness"])
+        elif role == "window":
+            # Plan view: a line spans the opening; a rectangle's long side is its width
+            width = max(segment_length(segment) for segment in path_segments(points, closed))
+            if entity["thickness"]:
+                window_width_area += width * entity["thickness"]
+            else:
+                window_widths += width
+            window_count += 1
+
+    if not levels and outline is None and wall_length == 0:
+        raise ValueError("No building outline, floor or wall geometry found in drawing")
+
+    scale = INSUNITS_SCALE.get(insunits)
+    footprint_ring = max(levels[min(levels)], key=lambda ring: abs(polygon_area(ring))) if levels else outline
+    if scale is None:
+        # Unitless drawing: a footprint over 100,000 m² is almost certainly in millimetres
+        footprint_units = abs(polygon_area(footprint_ring)) if footprint_ring else wall_length ** 2 / 16
+        scale = 0.001 if footprint_units > 1e5 else 1.0
+    area_scale = scale * scale
+
+    # Floor area per level counts outer rings only, not rooms drawn inside them
+    floor_area = 0.0
+    for rings in levels.values():
+        rings = sorted(rings, key=lambda ring: abs(polygon_area(ring)), reverse=True)
+        outer = []
+        for ring in rings:
+            if not any(point_in_polygon(ring[0], other) for other in outer):
+                outer.append(ring)
+        floor_area += sum(abs(polygon_area(ring)) for ring in outer)
+    floors = max(len(levels), 1)
+
+    if wall_heights:
+        storey_height = sorted(wall_heights)[len(wall_heights) // 2] * scale
+    elif len(levels) > 1:
+        elevations = sorted(levels)
+        storey_height = min(b - a for a, b in zip(elevations, elevations[1:])) * scale
+    else:
+        storey_height = DEFAULT_STOREY_HEIGHT
+    height = storey_height * floors
+
+    if footprint_ring is not None:
+        footprint = abs(polygon_area(footprint_ring)) * area_scale
+        perimeter = sum(segment_length(segment) for segment in path_segments(footprint_ring, True)) * scale
+        wall_area = perimeter * height
+        orientation = facade_orientation(footprint_ring)
+    else:
+        # Walls only: assume a square plan enclosed by the drawn wall length
+        perimeter = wall_length * scale / floors
+        footprint = (perimeter / 4) ** 2
+        wall_area = wall_length * scale * storey_height
+        orientation = 0
+    if not floor_area:
+        floor_area = footprint * floors
+    else:
+        floor_area *= area_scale
+
+    window_area = window_width_area * area_scale + window_widths * scale * DEFAULT_WINDOW_HEIGHT
+    window_area = min(window_area, wall_area)
+
+    return {
+        "type": "dxf",
+        "floors": floors,
+        "floor_area": round(floor_area, 1),
+        "height": round(height, 2),
+        "orientation": orientation,
+        "window_to_wall_ratio": round(window_area / wall_area, 3) if wall_area else 0.0,
+        "building_envelope": {
+            "wall_area": round(wall_area, 1),
+            "window_area": round(window_area, 1),
+            "roof_area": round(roof_area * area_scale if roof_area else footprint, 1)
+        },
+        "window_count": window_count,
+        "entity_count": entity_count,
+        "units_scale": scale
+    }
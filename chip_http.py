@@ -0,0 +1,123 @@
+# CHIP MVP HTTP Caching
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Conditional GETs and response compression. Routes derive an ETag from
+# what the response depends on (simulation id and completion time, latest
+# simulation per building, table versions) and answer 304 before doing any
+# work when the client already holds it. Large bodies are compressed with
+# Brotli or gzip, whichever the client prefers.
+
+import gzip
+import hashlib
+import os
+import zlib
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+HTTP_COMPRESS_MIN_BYTES = int(os.environ.get('HTTP_COMPRESS_MIN_BYTES', 1024))
+HTTP_GZIP_LEVEL = int(os.environ.get('HTTP_GZIP_LEVEL', 6))
+HTTP_BROTLI_QUALITY = int(os.environ.get('HTTP_BROTLI_QUALITY', 4))  # 11 is far too slow for live responses
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/octet-stream', 'text/plain')
+
+# Completed results never change; everything else revalidates each time
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+def make_etag(*parts):
+    """Strong ETag (unquoted) for the given version parts"""
+    return hashlib.sha1('\x1f'.join(str(part) for part in parts).encode()).hexdigest()[:24]
+
+
+def encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def matching_etag(etag):
+    """The representation of etag the client already holds, if any
+
+    Compressed responses carry the encoding in their ETag ("<tag>-gzip") so
+    each encoding is a distinct strong validator.
+    """
+    client_tags = request.if_none_match
+    if not client_tags:
+        return None
+    for candidate in (etag, *(f"{etag}-{encoding}" for encoding in encodings())):
+        if client_tags.contains_weak(candidate):
+            return candidate
+    return None
+
+
+def not_modified(etag, cache_control=REVALIDATE):
+    """304 response if the client holds etag already, else None"""
+    held = matching_etag(etag)
+    if held is None:
+        return None
+    response = Response(status=304)
+    response.set_etag(held)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def cache_headers(response, etag, cache_control=REVALIDATE):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def compress_response(response):
+    """Compress a response for the client's Accept-Encoding (after_request hook)"""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # NDJSON and binary series are bulk downloads (SSE is never compressed),
+        # so the compressor buffers freely instead of flushing every chunk
+        response.response = compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < HTTP_COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=HTTP_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=HTTP_GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=HTTP_BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(HTTP_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        output = process(chunk)
+        if output:
+            yield output
+    yield finish()
@@ -0,0 +1,138 @@
+# CHIP MVP Incremental Simulation
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Simulations are content-addressed by their inputs: the weather year's
+# fingerprint, the building geometry, the model version and the model
+# parameters each stage and result section reads (SECTION_PARAMETERS in
+# chip_simulation). A request whose inputs match an earlier simulation of
+# the building is answered with that simulation; a run that shares the
+# free-running model with an earlier one reuses its full-precision
+# free-running series (ResultsStore.save_free_running) and recomputes only
+# the sections whose inputs changed, giving the same results as a full run.
+
+import hashlib
+import json
+
+from chip_simulation import (
+    DEFAULT_GEOMETRY, DEFAULT_MODEL_PARAMETERS, FREE_RUNNING_PARAMETERS, LOAD_PARAMETERS,
+    MODEL_VERSION, SECTION_PARAMETERS
+)
+
+
+def content_hash(*parts):
+    """Stable hash of JSON-serialisable parts"""
+    encoded = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def input_keys(weather_fingerprint, geometry=None, parameters=None, simulation_type=None, options=None):
+    """Content hashes of a simulation's inputs
+
+    "inputs" covers the whole request (simulation type and options included);
+    "free_running" and "loads" key the hourly series; "sections" keys each
+    result section by the inputs it reads.
+    """
+    merged = dict(DEFAULT_MODEL_PARAMETERS)
+    merged.update(parameters or {})
+    base = (MODEL_VERSION, weather_fingerprint, geometry or DEFAULT_GEOMETRY)
+
+    def keyed(*names):
+        return {name: merged[name] for name in names}
+
+    free_running = content_hash(*base, keyed(*FREE_RUNNING_PARAMETERS))
+    sections = {
+        section: content_hash(section, *base, keyed(*names))
+        for section, names in SECTION_PARAMETERS.items()
+    }
+    return {
+        "inputs": content_hash(simulation_type, options or {}, sections),
+        "free_running": free_running,
+        "loads": content_hash(free_running, keyed(*LOAD_PARAMETERS)),
+        "sections": sections
+    }
+
+
+class InputIndex:
+    """Input hashes of simulations, for finding earlier work to reuse"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def init_schema(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS simulation_inputs (
+                simulation_id TEXT PRIMARY KEY,
+                building_id TEXT,
+                inputs_hash TEXT,
+                free_running_hash TEXT,
+                loads_hash TEXT,
+                section_hashes TEXT,
+                reused_from TEXT,
+                recomputed TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_simulation_inputs_inputs
+            ON simulation_inputs (inputs_hash, building_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_simulation_inputs_free_running
+            ON simulation_inputs (free_running_hash)
+        ''')
+
+    def record(self, simulation_id, building_id, keys, reused_from=None, recomputed=None):
+        """Store (or replace) a simulation's input hashes and what its run reused"""
+        self.db.execute('''
+            INSERT OR REPLACE INTO simulation_inputs
+            (simulation_id, building_id, inputs_hash, free_running_hash, loads_hash,
+             section_hashes, reused_from, recomputed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (simulation_id, building_id, keys["inputs"], keys.get("free_running"), keys.get("loads"),
+              json.dumps(keys.get("sections") or {}), reused_from,
+              None if recomputed is None else json.dumps(recomputed)))
+
+    def find_identical(self, inputs_hash, building_id):
+        """(simulation_id, status) of the building's latest live or completed simulation with these inputs"""
+        return self.db.query_one('''
+            SELECT s.id, s.status FROM simulation_inputs i
+            JOIN simulations s ON s.id = i.simulation_id
+            WHERE i.inputs_hash = ? AND i.building_id = ?
+              AND s.status IN ('queued', 'running', 'completed')
+            ORDER BY s.status = 'completed' DESC, s.created_at DESC
+            LIMIT 1
+        ''', (inputs_hash, building_id))
+
+    def find_completed(self, key, value, building_id, sections=None, candidates=20):
+        """Completed simulation whose "inputs" or "free_running" hash is value
+
+        Returns (simulation_id, loads_hash, section_hashes) or None. Given
+        section hashes, the one sharing the most sections wins; ties go to
+        the building's own, then the latest, simulations.
+        """
+        column = {"inputs": "inputs_hash", "free_running": "free_running_hash"}[key]
+        rows = self.db.query_all(f'''
+            SELECT s.id, i.loads_hash, i.section_hashes FROM simulation_inputs i
+            JOIN simulations s ON s.id = i.simulation_id
+            WHERE i.{column} = ? AND s.status = 'completed'
+            ORDER BY i.building_id = ? DESC, s.completed_at DESC
+            LIMIT ?
+        ''', (value, building_id, candidates if sections else 1))
+        found = [(row[0], row[1], json.loads(row[2] or '{}')) for row in rows]
+        if not found:
+            return None
+        # max() keeps the first of equals, so the preferred order breaks ties
+        return max(found, key=lambda base: sum(base[2].get(section) == section_hash
+                                               for section, section_hash in (sections or {}).items()))
+
+    def describe(self, simulation_id):
+        """What a completed run reused: {"inputs_hash", "reused_from", "recomputed"} or None"""
+        row = self.db.query_one('''
+            SELECT inputs_hash, reused_from, recomputed FROM simulation_inputs WHERE simulation_id = ?
+        ''', (simulation_id,))
+        if row is None:
+            return None
+        return {
+            "inputs_hash": row[0],
+            "reused_from": row[1],
+            "recomputed": json.loads(row[2]) if row[2] is not None else None
+        }
@@ -0,0 +1,312 @@
+# CHIP MVP Job Queue
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Durable simulation job queue shared by every server process and node.
+# Workers claim a job under a lease and keep extending it with heartbeats;
+# a job whose lease runs out (the node crashed or hung) is handed to the
+# next claimant, up to JOB_MAX_ATTEMPTS times. Backed by the metadata
+# database on a single node, or by Redis for several nodes.
+
+import json
+import os
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+try:
+    import redis
+except ImportError:  # only needed for redis:// queues
+    redis = None
+
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL', '')  # empty: the metadata database; redis://host:6379/0
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # seconds between claims when idle
+
+Job = namedtuple('Job', ['id', 'payload', 'attempts'])
+
+
+class JobQueue:
+    """Leased, prioritised job queue keyed by job id (the simulation id)"""
+
+    name = 'queue'
+
+    def init_schema(self, cursor):
+        """Create tables in the metadata database, for queues that live there"""
+
+    def push(self, job_id, payload, priority=0):
+        """Queue a job; a job id already queued or leased is left alone. Returns True if queued"""
+        raise NotImplementedError
+
+    def claim(self, owner, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        """Lease the highest-priority job (or one whose lease expired); None when empty"""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id, owner, lease_seconds=JOB_LEASE_SECONDS):
+        """Extend a lease; False once the job was cancelled or reclaimed by someone else"""
+        raise NotImplementedError
+
+    def complete(self, job_id, owner):
+        """Drop a finished job (only while owner still holds its lease)"""
+        raise NotImplementedError
+
+    def cancel(self, job_id):
+        """Returns 'queued' (removed), 'running' (the owner stops at its next heartbeat) or None"""
+        raise NotImplementedError
+
+    def reap(self, max_attempts=JOB_MAX_ATTEMPTS):
+        """Remove expired jobs that will not run again; returns [(job_id, 'cancelled' or 'abandoned')]"""
+        raise NotImplementedError
+
+    def depth(self):
+        """{"queued": jobs waiting, "leased": jobs running anywhere}"""
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """Jobs table in the metadata database; shared by every process on the node"""
+
+    name = 'sqlite'
+
+    def __init__(self, db):
+        self.db = db
+
+    def init_schema(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT UNIQUE NOT NULL,
+                payload TEXT,
+                priority INTEGER DEFAULT 0,
+                state TEXT DEFAULT 'queued',
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim
+            ON jobs (state, priority DESC, seq)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_lease
+            ON jobs (state, lease_expires)
+        ''')
+
+    def push(self, job_id, payload, priority=0):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO jobs (id, payload, priority) VALUES (?, ?, ?)
+            ''', (job_id, json.dumps(payload), priority))
+            return cursor.rowcount == 1
+
+    def claim(self, owner, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        now = time.time()
+        claimable = '''
+            state = 'queued' OR (state = 'leased' AND lease_expires < ? AND attempts < ?)
+        '''
+        # Idle pollers only read; the write lock is taken once there is something to claim
+        if self.db.query_one(f'SELECT 1 FROM jobs WHERE {claimable} LIMIT 1', (now, max_attempts)) is None:
+            return None
+        with self.db.transaction() as cursor:
+            cursor.execute(f'''
+                SELECT id, payload, attempts FROM jobs WHERE {claimable}
+                ORDER BY priority DESC, seq LIMIT 1
+            ''', (now, max_attempts))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute('''
+                UPDATE jobs SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (owner, now + lease_seconds, row[0]))
+        return Job(row[0], json.loads(row[1]), row[2] + 1)
+
+    def heartbeat(self, job_id, owner, lease_seconds=JOB_LEASE_SECONDS):
+        return self.db.execute('''
+            UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND state = 'leased'
+        ''', (time.time() + lease_seconds, job_id, owner)) == 1
+
+    def complete(self, job_id, owner):
+        self.db.execute('DELETE FROM jobs WHERE id = ? AND owner = ?', (job_id, owner))
+
+    def cancel(self, job_id):
+        with self.db.transaction() as cursor:
+            cursor.execute('SELECT state FROM jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            if row[0] == 'queued':
+                cursor.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+                return 'queued'
+            cursor.execute("UPDATE jobs SET state = 'cancelled' WHERE id = ?", (job_id,))
+            return 'running'
+
+    def reap(self, max_attempts=JOB_MAX_ATTEMPTS):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                SELECT id, state FROM jobs
+                WHERE state IN ('leased', 'cancelled') AND lease_expires < ?
+                  AND (state = 'cancelled' OR attempts >= ?)
+            ''', (time.time(), max_attempts))
+            dead = cursor.fetchall()
+            cursor.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id, _ in dead])
+        return [(job_id, 'cancelled' if state == 'cancelled' else 'abandoned') for job_id, state in dead]
+
+    def depth(self):
+        counts = dict(self.db.query_all('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+        return {"queued": counts.get('queued', 0),
+                "leased": counts.get('leased', 0) + counts.get('cancelled', 0)}
+
+
+# Redis layout under a key prefix: <prefix>:queue (ZSET, score orders by priority
+# then arrival), <prefix>:leases (ZSET, score = lease expiry) and one
+# <prefix>:job:<id> hash per job. Each operation is one atomic script.
+REDIS_PUSH = '''
+local key = ARGV[1] .. ':job:' .. ARGV[2]
+if redis.call('EXISTS', key) == 1 then return 0 end
+local seq = redis.call('INCR', ARGV[1] .. ':seq')
+redis.call('HSET', key, 'payload', ARGV[3], 'priority', ARGV[4], 'seq', seq, 'attempts', 0, 'state', 'queued')
+redis.call('ZADD', ARGV[1] .. ':queue', -tonumber(ARGV[4]) * 1e12 + seq, ARGV[2])
+return 1
+'''
+
+REDIS_CLAIM = '''
+local prefix, owner = ARGV[1], ARGV[2]
+local now, lease, max_attempts = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local queue, leases = prefix .. ':queue', prefix .. ':leases'
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', leases, '-inf', now, 'LIMIT', 0, 100)) do
+    local key = prefix .. ':job:' .. id
+    if redis.call('HGET', key, 'state') == 'leased'
+            and tonumber(redis.call('HGET', key, 'attempts')) < max_attempts then
+        redis.call('ZREM', leases, id)
+        redis.call('HSET', key, 'state', 'queued')
+        redis.call('ZADD', queue, -tonumber(redis.call('HGET', key, 'priority')) * 1e12
+                   + tonumber(redis.call('HGET', key, 'seq')), id)
+    end
+end
+local head = redis.call('ZRANGE', queue, 0, 0)
+if #head == 0 then return false end
+local id = head[1]
+local key = prefix .. ':job:' .. id
+redis.call('ZREM', queue, id)
+redis.call('HSET', key, 'state', 'leased', 'owner', owner)
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('ZADD', leases, now + lease, id)
+return {id, redis.call('HGET', key, 'payload'), attempts}
+'''
+
+REDIS_HEARTBEAT = '''
+local key = ARGV[1] .. ':job:' .. ARGV[2]
+if redis.call('HGET', key, 'owner') ~= ARGV[3] or redis.call('HGET', key, 'state') ~= 'leased' then
+    return 0
+end
+redis.call('ZADD', ARGV[1] .. ':leases', 'XX', tonumber(ARGV[4]), ARGV[2])
+return 1
+'''
+
+REDIS_COMPLETE = '''
+local key = ARGV[1] .. ':job:' .. ARGV[2]
+if redis.call('HGET', key, 'owner') ~= ARGV[3] then return 0 end
+redis.call('DEL', key)
+redis.call('ZREM', ARGV[1] .. ':leases', ARGV[2])
+return 1
+'''
+
+REDIS_CANCEL = '''
+local key = ARGV[1] .. ':job:' .. ARGV[2]
+local state = redis.call('HGET', key, 'state')
+if state == 'queued' then
+    redis.call('ZREM', ARGV[1] .. ':queue', ARGV[2])
+    redis.call('DEL', key)
+    return 'queued'
+end
+if state == 'leased' or state == 'cancelled' then
+    redis.call('HSET', key, 'state', 'cancelled')
+    return 'running'
+end
+return false
+'''
+
+REDIS_REAP = '''
+local prefix, now, max_attempts = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+local leases = prefix .. ':leases'
+local dead = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', leases, '-inf', now)) do
+    local key = prefix .. ':job:' .. id
+    local state = redis.call('HGET', key, 'state')
+    if state == 'cancelled' or not state
+            or tonumber(redis.call('HGET', key, 'attempts')) >= max_attempts then
+        redis.call('ZREM', leases, id)
+        redis.call('DEL', key)
+        table.insert(dead, id)
+        table.insert(dead, state == 'cancelled' and 'cancelled' or 'abandoned')
+    end
+end
+return dead
+'''
+
+
+class RedisJobQueue(JobQueue):
+    """Jobs in Redis (or anything speaking its protocol), shared by every node"""
+
+    name = 'redis'
+
+    def __init__(self, url=None, prefix='chip:jobs', client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("JOB_QUEUE_URL is a redis:// URL but the redis package is not installed")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._push = client.register_script(REDIS_PUSH)
+        self._claim = client.register_script(REDIS_CLAIM)
+        self._heartbeat = client.register_script(REDIS_HEARTBEAT)
+        self._complete = client.register_script(REDIS_COMPLETE)
+        self._cancel = client.register_script(REDIS_CANCEL)
+        self._reap = client.register_script(REDIS_REAP)
+
+    def push(self, job_id, payload, priority=0):
+        return self._push(args=[self.prefix, job_id, json.dumps(payload), int(priority)]) == 1
+
+    def claim(self, owner, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        claimed = self._claim(args=[self.prefix, owner, time.time(), lease_seconds, max_attempts])
+        if not claimed:
+            return None
+        job_id, payload, attempts = claimed
+        return Job(text(job_id), json.loads(payload), int(attempts))
+
+    def heartbeat(self, job_id, owner, lease_seconds=JOB_LEASE_SECONDS):
+        return self._heartbeat(args=[self.prefix, job_id, owner, time.time() + lease_seconds]) == 1
+
+    def complete(self, job_id, owner):
+        self._complete(args=[self.prefix, job_id, owner])
+
+    def cancel(self, job_id):
+        state = self._cancel(args=[self.prefix, job_id])
+        return text(state) if state else None
+
+    def reap(self, max_attempts=JOB_MAX_ATTEMPTS):
+        dead = self._reap(args=[self.prefix, time.time(), max_attempts])
+        return [(text(dead[index]), text(dead[index + 1])) for index in range(0, len(dead), 2)]
+
+    def depth(self):
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.zcard(f"{self.prefix}:queue")
+            pipe.zcard(f"{self.prefix}:leases")
+            queued, leased = pipe.execute()
+        return {"queued": queued, "leased": leased}
+
+
+def text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def make_job_queue(url=JOB_QUEUE_URL, db=None):
+    """Job queue for a JOB_QUEUE_URL; empty uses the metadata database"""
+    scheme = urlparse(url).scheme if url else ''
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisJobQueue(url)
+    if not scheme:
+        return SQLiteJobQueue(db)
+    raise ValueError(f"Unsupported JOB_QUEUE_URL scheme: {scheme}")
@@ -0,0 +1,256 @@
+# CHIP MVP Metrics
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# In-process counters, gauges and histograms rendered in the Prometheus text
+# exposition format, plus a sampling profiler that can be switched on for
+# individual requests: a background thread snapshots the stacks of the
+# threads being profiled and slow requests are written out as collapsed
+# stacks (the input format of flamegraph tools).
+
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+
+PROFILE_SLOW_REQUESTS_MS = float(os.environ.get('PROFILE_SLOW_REQUESTS_MS', 0))  # 0 disables profiling
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 1.0))  # share of requests sampled
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+# Seconds; spans sub-millisecond reads to multi-minute batch runs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{format_labels(self.labels, key)} {format_value(value)}" for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def stages(self, **labels):
+        return StageTimer(self, labels)
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = self.header()
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), key + (format_value(bound),))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(values[-2])}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {values[-1]}")
+        return lines
+
+
+class StageTimer:
+    """Times consecutive stages of one operation: each lap() closes the current stage"""
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.histogram.observe(now - self._last, stage=stage, **self.labels)
+        self._last = now
+
+
+class Gauge(Metric):
+    """Read at scrape time from a callback returning a number or {label values: number}
+
+    kind='counter' exposes running totals kept by another component (cache hits).
+    """
+
+    def __init__(self, name, help_text, callback, labels=(), kind='gauge'):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        lines = self.header()
+        for key, number in sorted(value.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            if number is not None:
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {format_value(number)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for a Prometheus scrape"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, callback, labels=(), kind='gauge'):
+        return self.register(Gauge(name, help_text, callback, labels, kind))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One failing gauge callback must not take the scrape down
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+class StackSampler:
+    """Samples the stacks of selected threads from one background thread"""
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id=None):
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = StackCounter()
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id=None):
+        """Stacks sampled for the thread since start(), as a Counter"""
+        with self._lock:
+            return self._active.pop(thread_id or threading.get_ident(), StackCounter())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+            if not active:
+                self._wake.wait()  # idle until the next profiled request
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for thread_id in active:
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                collapsed = ';'.join(reversed(stack))
+                with self._lock:
+                    if thread_id in self._active:
+                        self._active[thread_id][collapsed] += 1
+
+
+def write_profile(stacks, name, directory=PROFILE_DIR):
+    """Write sampled stacks in collapsed format (one 'frame;frame count' per line)"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.folded")
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
@@ -0,0 +1,350 @@
+# CHIP MVP Recommendation Engine
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Retrofitting recommendations come from a data-defined rule table, indexed
+# once by climate zone and building type. Rules are ranked against the
+# metrics of a building's latest simulation, and the result is memoised per
+# (building, latest simulation) until a newer simulation completes.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from chip_simulation import CATEGORICAL_METRICS, HEAT_STRESS_LEVELS, VULNERABILITY_LEVELS
+
+RECOMMENDATION_RULES_FILE = os.environ.get('RECOMMENDATION_RULES_FILE', '')
+RECOMMENDATION_CACHE_SIZE = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 10000))
+
+CLIMATE_ZONES = ("Tropical", "Subtropical", "Temperate", "Cold")
+
+RECOMMENDATION_FIELDS = ("category", "title", "description", "estimated_savings",
+                         "implementation_cost", "climate_benefit")
+
+# climate_zones / building_types of None match every zone / type. Each trigger
+# adds its weight to the rule's score when the simulated metric crosses it;
+# "in" triggers on categorical metrics must use the model's labels
+# (CATEGORICAL_METRICS in chip_simulation).
+HIGH_HEAT_STRESS = list(HEAT_STRESS_LEVELS[:2])  # High or Medium
+HIGH_VULNERABILITY = list(VULNERABILITY_LEVELS[:1])  # High
+ELEVATED_VULNERABILITY = list(VULNERABILITY_LEVELS[:2])  # High or Moderate
+
+DEFAULT_RULES = [
+    {
+        "id": "natural-ventilation",
+        "climate_zones": ["Tropical", "Subtropical"],
+        "building_types": None,
+        "category": "Cooling",
+        "title": "Enhanced Natural Ventilation",
+        "description": "Install cross-ventilation systems and ceiling fans to reduce mechanical cooling loads",
+        "estimated_savings": "20-30% cooling energy",
+        "implementation_cost": "Low",
+        "climate_benefit": "Reduces overheating risk during power outages",
+        "base_score": 50,
+        "triggers": [
+            {"metric": "thermal_comfort.overheating_hours", "above": 200, "weight": 25},
+            {"metric": "climate_resilience.adaptive_comfort_potential", "above": 40, "weight": 15}
+        ]
+    },
+    {
+        "id": "external-shading",
+        "climate_zones": ["Tropical", "Subtropical"],
+        "building_types": None,
+        "category": "Solar Protection",
+        "title": "External Shading Systems",
+        "description": "Install overhangs, louvers, or vegetation for solar heat gain control",
+        "estimated_savings": "15-25% cooling energy",
+        "implementation_cost": "Medium",
+        "climate_benefit": "Maintains indoor comfort during extreme heat events",
+        "base_score": 45,
+        "triggers": [
+            {"metric": "solar_analysis.peak_solar_gain", "above": 25, "weight": 25},
+            {"metric": "climate_resilience.heat_stress_risk", "in": HIGH_HEAT_STRESS, "weight": 15}
+        ]
+    },
+    {
+        "id": "cool-roof",
+        "climate_zones": ["Tropical", "Subtropical"],
+        "building_types": None,
+        "category": "Building Envelope",
+        "title": "Cool Roof Technology",
+        "description": "Apply reflective roof coatings or install cool roof materials",
+        "estimated_savings": "10-20% cooling energy",
+        "implementation_cost": "Low-Medium",
+        "climate_benefit": "Reduces urban heat island effect and building heat gain",
+        "base_score": 40,
+        "triggers": [
+            {"metric": "energy_analysis.energy_intensity", "above": 150, "weight": 20},
+            {"metric": "climate_resilience.cooling_system_strain", "above": 70, "weight": 20}
+        ]
+    },
+    {
+        "id": "building-insulation",
+        "climate_zones": ["Temperate"],
+        "building_types": None,
+        "category": "Insulation",
+        "title": "Enhanced Building Insulation",
+        "description": "Upgrade wall and roof insulation to reduce heating and cooling loads",
+        "estimated_savings": "25-40% total energy",
+        "implementation_cost": "Medium",
+        "climate_benefit": "Maintains stable indoor temperatures during extreme weather",
+        "base_score": 50,
+        "triggers": [
+            {"metric": "energy_analysis.energy_intensity", "above": 120, "weight": 25},
+            {"metric": "thermal_comfort.underheating_hours", "above": 200, "weight": 15}
+        ]
+    },
+    {
+        "id": "high-performance-glazing",
+        "climate_zones": ["Temperate"],
+        "building_types": None,
+        "category": "Windows",
+        "title": "High-Performance Glazing",
+        "description": "Install double or triple-glazed windows with low-E coatings",
+        "estimated_savings": "15-25% heating/cooling energy",
+        "implementation_cost": "High",
+        "climate_benefit": "Reduces heat loss and solar heat gain",
+        "base_score": 40,
+        "triggers": [
+            {"metric": "solar_analysis.peak_solar_gain", "above": 25, "weight": 20},
+            {"metric": "thermal_comfort.comfort_percentage", "below": 80, "weight": 20}
+        ]
+    },
+    {
+        "id": "heat-recovery-ventilation",
+        "climate_zones": ["Cold"],
+        "building_types": None,
+        "category": "Heating",
+        "title": "Heat Recovery Ventilation",
+        "description": "Install HRV systems to recover heat from exhaust air",
+        "estimated_savings": "20-30% heating energy",
+        "implementation_cost": "Medium-High",
+        "climate_benefit": "Maintains indoor air quality while conserving heat",
+        "base_score": 50,
+        "triggers": [
+            {"metric": "energy_analysis.annual_heating_load", "above": 50000, "weight": 25},
+            {"metric": "energy_analysis.energy_intensity", "above": 150, "weight": 15}
+        ]
+    },
+    {
+        "id": "air-sealing",
+        "climate_zones": ["Cold"],
+        "building_types": None,
+        "category": "Building Envelope",
+        "title": "Air Sealing",
+        "description": "Seal air leaks to prevent heat loss and drafts",
+        "estimated_savings": "10-20% heating energy",
+        "implementation_cost": "Low",
+        "climate_benefit": "Prevents frozen pipes and maintains warmth during outages",
+        "base_score": 45,
+        "triggers": [
+            {"metric": "thermal_comfort.underheating_hours", "above": 200, "weight": 25}
+        ]
+    },
+    {
+        "id": "critical-care-cooling-redundancy",
+        "climate_zones": ["Tropical", "Subtropical", "Temperate"],
+        "building_types": ["hospital", "emergency"],
+        "category": "Critical Systems",
+        "title": "Redundant Cooling for Critical Care Zones",
+        "description": "Provide N+1 cooling and a separately backed-up supply for operating theatres, ICUs and pharmacy storage",
+        "estimated_savings": "Avoided clinical service interruptions",
+        "implementation_cost": "High",
+        "climate_benefit": "Keeps critical care within safe temperature limits during heatwaves and plant failures",
+        "base_score": 40,
+        "triggers": [
+            {"metric": "climate_resilience.cooling_system_strain", "above": 70, "weight": 30},
+            {"metric": "climate_resilience.climate_change_vulnerability", "in": HIGH_VULNERABILITY, "weight": 20}
+        ]
+    },
+    {
+        "id": "renewables-storage",
+        "climate_zones": None,
+        "building_types": None,
+        "category": "Backup Systems",
+        "title": "Renewable Energy + Storage",
+        "description": "Install solar panels with battery backup for critical operations",
+        "estimated_savings": "30-50% grid dependency",
+        "implementation_cost": "High",
+        "climate_benefit": "Ensures power during climate-related grid failures",
+        "base_score": 45,
+        "triggers": [
+            {"metric": "solar_analysis.daylight_availability", "above": 50, "weight": 15},
+            {"metric": "energy_analysis.total_energy_consumption", "above": 100000, "weight": 15}
+        ]
+    },
+    {
+        "id": "rainwater-harvesting",
+        "climate_zones": None,
+        "building_types": None,
+        "category": "Water Systems",
+        "title": "Rainwater Harvesting",
+        "description": "Install systems to collect and store rainwater for non-potable uses",
+        "estimated_savings": "20-40% water costs",
+        "implementation_cost": "Medium",
+        "climate_benefit": "Provides water security during droughts or supply disruptions",
+        "base_score": 35,
+        "triggers": [
+            {"metric": "climate_resilience.climate_change_vulnerability", "in": ELEVATED_VULNERABILITY, "weight": 15}
+        ]
+    }
+]
+
+
+def load_rules(path=None):
+    """Rule list from a JSON file, or the built-in defaults"""
+    path = path or RECOMMENDATION_RULES_FILE
+    if not path:
+        return DEFAULT_RULES
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def validate_rules(rules):
+    """Raise ValueError for "in" triggers naming labels the model never emits"""
+    for rule in rules:
+        for trigger in rule.get("triggers", ()):
+            labels = CATEGORICAL_METRICS.get(trigger["metric"])
+            unknown = [value for value in trigger.get("in", ()) if labels is not None and value not in labels]
+            if unknown:
+                raise ValueError(f"Rule {rule.get('id')}: {trigger['metric']} is one of {list(labels)}, "
+                                 f"not {unknown}")
+
+
+def metric_value(metrics, metric):
+    """Look up 'section.field' in a results document"""
+    section, _, field = metric.partition('.')
+    return (metrics.get(section) or {}).get(field)
+
+
+def trigger_fires(trigger, value):
+    if value is None:
+        return False
+    if "above" in trigger:
+        return value > trigger["above"]
+    if "below" in trigger:
+        return value < trigger["below"]
+    return value in trigger.get("in", ())
+
+
+class RuleTable:
+    """Rules indexed by (climate zone, building type), built once"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        validate_rules(self.rules)
+        # Changes whenever the rules do; part of the recommendations ETag
+        self.version = hashlib.sha1(json.dumps(self.rules, sort_keys=True).encode()).hexdigest()[:12]
+        self.metric_fields = sorted({
+            trigger["metric"] for rule in self.rules for trigger in rule.get("triggers", ())
+        })
+
+        building_types = sorted({
+            building_type for rule in self.rules for building_type in (rule.get("building_types") or ())
+        })
+        zones = set(CLIMATE_ZONES).union(
+            zone for rule in self.rules for zone in (rule.get("climate_zones") or ())
+        )
+
+        # zone -> {building type or None (any other type): rules in table order}
+        self._index = {}
+        for zone in zones:
+            by_type = {}
+            for building_type in building_types + [None]:
+                by_type[building_type] = tuple(
+                    rule for rule in self.rules
+                    if (not rule.get("climate_zones") or zone in rule["climate_zones"])
+                    and (not rule.get("building_types")
+                         or (building_type is not None and building_type in rule["building_types"]))
+                )
+            self._index[zone] = by_type
+
+    def lookup(self, climate_zone, building_type):
+        by_type = self._index.get(climate_zone)
+        if by_type is None:
+            return ()
+        return by_type.get(building_type, by_type[None])
+
+
+class RecommendationEngine:
+    """Scores rule-table recommendations and memoises them per building"""
+
+    def __init__(self, rules=None, cache_size=None):
+        self.table = RuleTable(load_rules() if rules is None else rules)
+        self.cache_size = RECOMMENDATION_CACHE_SIZE if cache_size is None else cache_size
+
+        self._cache = OrderedDict()  # (building_id, simulation_id) -> recommendations
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def cached(self, building_id, simulation_id):
+        key = (building_id, simulation_id)
+        with self._lock:
+            recommendations = self._cache.get(key)
+            if recommendations is None:
+                self._counters["misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._counters["hits"] += 1
+            return recommendations
+
+    def recommend(self, building_id, building_type, climate_zone, simulation_id=None, metrics=None):
+        """Ranked recommendations for a building, cached under its latest simulation id"""
+        scored = []
+        for rule in self.table.lookup(climate_zone, building_type):
+            score = rule.get("base_score", 0)
+            triggered_by = []
+            if metrics:
+                for trigger in rule.get("triggers", ()):
+                    if trigger_fires(trigger, metric_value(metrics, trigger["metric"])):
+                        score += trigger["weight"]
+                        triggered_by.append(trigger["metric"])
+            recommendation = {field: rule.get(field) for field in RECOMMENDATION_FIELDS}
+            recommendation["id"] = rule.get("id")
+            recommendation["score"] = score
+            recommendation["triggered_by"] = triggered_by
+            scored.append(recommendation)
+
+        # Stable sort: equal scores keep the rule table's order
+        scored.sort(key=lambda recommendation: -recommendation["score"])
+
+        recommendations = {
+            "building_id": building_id,
+            "climate_zone": climate_zone,
+            # Unsimulated buildings are treated as high priority until shown otherwise
+            "priority_level": priority_level(scored[0]["score"]) if metrics and scored else "High",
+            "simulation_id": simulation_id,
+            "recommendations": scored
+        }
+
+        with self._lock:
+            self._cache[(building_id, simulation_id)] = recommendations
+            self._cache.move_to_end((building_id, simulation_id))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return recommendations
+
+    def invalidate(self, building_id):
+        """Drop every cached entry for a building"""
+        with self._lock:
+            stale = [key for key in self._cache if key[0] == building_id]
+            for key in stale:
+                del self._cache[key]
+            self._counters["invalidations"] += len(stale)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._cache)
+        stats["max_entries"] = self.cache_size
+        stats["rules"] = len(self.table.rules)
+        return stats
+
+
+def priority_level(score):
+    if score >= 80:
+        return "High"
+    if score >= 60:
+        return "Medium"
+    return "Low"
@@ -0,0 +1,284 @@
+# CHIP MVP Results Store
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Scalar simulation metrics live in typed, indexed columns of the
+# simulation_results table, so one KPI can be read without touching the
+# rest. Hourly series are stored per simulation as a float32 .npy matrix
+# (one row per series) and read back through a memory map. The
+# free-running series that incremental runs start from are also kept at
+# full precision, once per free-running input hash.
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from chip_blobs import FileBlobStore
+
+HOURLY_SERIES = (
+    'outdoor_temperature',
+    'indoor_temperature',
+    'cooling_load',
+    'heating_load',
+    'solar_gain'
+)
+
+# Model outputs of the free-running stage (outdoor temperature is the weather's)
+FREE_RUNNING_SERIES = ('indoor_temperature', 'solar_gain')
+
+# section -> [(field, storage)]; 'json' fields hold small lists such as monthly totals
+RESULT_FIELDS = {
+    "energy_analysis": [
+        ("annual_cooling_load", "REAL"),
+        ("annual_heating_load", "REAL"),
+        ("total_energy_consumption", "REAL"),
+        ("peak_cooling_demand", "REAL"),
+        ("peak_heating_demand", "REAL"),
+        ("energy_intensity", "REAL"),
+        ("monthly_cooling_load", "json"),
+        ("monthly_heating_load", "json")
+    ],
+    "solar_analysis": [
+        ("annual_solar_gain", "REAL"),
+        ("peak_solar_gain", "REAL"),
+        ("solar_heat_gain_coefficient", "REAL"),
+        ("daylight_availability", "REAL")
+    ],
+    "thermal_comfort": [
+        ("comfortable_hours", "INTEGER"),
+        ("comfort_percentage", "REAL"),
+        ("overheating_hours", "INTEGER"),
+        ("underheating_hours", "INTEGER"),
+        ("monthly_overheating_hours", "json")
+    ],
+    "climate_resilience": [
+        ("heat_stress_risk", "TEXT"),
+        ("cooling_system_strain", "REAL"),
+        ("adaptive_comfort_potential", "REAL"),
+        ("climate_change_vulnerability", "TEXT")
+    ],
+    "scenario_analysis": [
+        ("overheating_sensitivity", "REAL"),
+        ("cooling_sensitivity", "REAL"),
+        ("overheating_hours_spread", "REAL"),
+        ("worst_scenario", "TEXT"),
+        ("scenarios", "json")
+    ]
+}
+
+# Sections only some simulation types produce; left out of results when empty
+OPTIONAL_SECTIONS = ("scenario_analysis",)
+
+HEADER_FIELDS = ("simulation_type", "building_id", "timestamp", "weather_source")
+
+# KPIs that portfolio queries filter and sort on
+INDEXED_FIELDS = (
+    ("energy_analysis", "energy_intensity"),
+    ("thermal_comfort", "overheating_hours")
+)
+
+
+def column_name(section, field):
+    return f"{section}__{field}"
+
+
+class ResultsStore:
+    """Columnar storage for simulation results"""
+
+    def __init__(self, db, folder, blobs=None):
+        self.db = db
+        self.folder = folder
+        self.blobs = blobs or FileBlobStore()
+
+    def init_schema(self, cursor):
+        columns = ',\n'.join(
+            f"{column_name(section, field)} {'TEXT' if storage == 'json' else storage}"
+            for section, fields in RESULT_FIELDS.items()
+            for field, storage in fields
+        )
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS simulation_results (
+                simulation_id TEXT PRIMARY KEY,
+                simulation_type TEXT,
+                building_id TEXT,
+                timestamp TEXT,
+                weather_source TEXT,
+                hourly_path TEXT,
+                {columns}
+            )
+        ''')
+        # Result fields added after the table was first created
+        cursor.execute('PRAGMA table_info(simulation_results)')
+        existing = {column[1] for column in cursor.fetchall()}
+        for section, fields in RESULT_FIELDS.items():
+            for field, storage in fields:
+                if column_name(section, field) not in existing:
+                    cursor.execute(f'''
+                        ALTER TABLE simulation_results ADD COLUMN
+                        {column_name(section, field)} {'TEXT' if storage == 'json' else storage}
+                    ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_simulation_results_building
+            ON simulation_results (building_id, timestamp)
+        ''')
+        for section, field in INDEXED_FIELDS:
+            column = column_name(section, field)
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_simulation_results_{column}
+                ON simulation_results ({column})
+            ''')
+
+    def save(self, simulation_id, results, hourly=None, hourly_path=None):
+        """Store results (and optional HOURLY_SERIES x 8760 matrix); returns the hourly path
+
+        hourly_path instead points the results at another simulation's
+        series, which are written once and never change.
+        """
+        if hourly is not None:
+            hourly_path = os.path.join(self.folder, f"{simulation_id}_hourly.npy")
+            temp_path = hourly_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(hourly, dtype=np.float32))
+            os.replace(temp_path, hourly_path)
+            self.blobs.put_file(hourly_path, hourly_path)
+
+        names = list(HEADER_FIELDS) + ['hourly_path']
+        values = [results.get(name) for name in HEADER_FIELDS] + [hourly_path]
+        for section, fields in RESULT_FIELDS.items():
+            section_values = results.get(section, {})
+            for field, storage in fields:
+                value = section_values.get(field)
+                names.append(column_name(section, field))
+                values.append(json.dumps(value) if storage == 'json' and value is not None else value)
+
+        placeholders = ', '.join('?' * len(names))
+        self.db.execute(f'''
+            INSERT OR REPLACE INTO simulation_results (simulation_id, {', '.join(names)})
+            VALUES (?, {placeholders})
+        ''', [simulation_id] + values)
+        return hourly_path
+
+    def copy(self, source_id, simulation_id, **header):
+        """Store source_id's results (sharing its hourly series) as simulation_id's
+
+        header overrides HEADER_FIELDS such as building_id and timestamp.
+        """
+        columns = ['hourly_path'] + [column_name(section, field)
+                                     for section, fields in RESULT_FIELDS.items() for field, _ in fields]
+        header_values = [header.get(name) for name in HEADER_FIELDS]
+        self.db.execute(f'''
+            INSERT OR REPLACE INTO simulation_results
+            (simulation_id, {', '.join(HEADER_FIELDS)}, {', '.join(columns)})
+            SELECT ?, {', '.join(f'COALESCE(?, {name})' for name in HEADER_FIELDS)}, {', '.join(columns)}
+            FROM simulation_results WHERE simulation_id = ?
+        ''', [simulation_id] + header_values + [source_id])
+        return self.hourly_path(simulation_id)
+
+    def save_free_running(self, key, hourly):
+        """Store the FREE_RUNNING_SERIES of hourly at float64 under a free-running input hash"""
+        path = os.path.join(self.folder, 'free_running', f"{key}.npy")
+        if self.blobs.local_path(path) is not None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.stack([np.asarray(hourly[name], dtype=np.float64).reshape(-1)
+                                 for name in FREE_RUNNING_SERIES]))
+        os.replace(temp_path, path)
+        self.blobs.put_file(path, path)
+
+    def load_free_running(self, key):
+        """{series: float64 array} saved by save_free_running, or None"""
+        path = self.blobs.local_path(os.path.join(self.folder, 'free_running', f"{key}.npy"))
+        if path is None:
+            return None
+        matrix = np.load(path)
+        return {name: matrix[index] for index, name in enumerate(FREE_RUNNING_SERIES)}
+
+    def load(self, simulation_id, fields=None):
+        """Results document, or just the requested 'section' / 'section.field' entries"""
+        selected = self.select_fields(fields)
+        columns = [column_name(section, field) for section, field, _ in selected]
+        row = self.db.query_one(f'''
+            SELECT {', '.join(list(HEADER_FIELDS) + columns)}
+            FROM simulation_results WHERE simulation_id = ?
+        ''', (simulation_id,))
+        if row is None:
+            return None
+        return self._row_results(selected, row)
+
+    def load_many(self, simulation_ids, fields=None, chunk_size=900):
+        """{simulation_id: results} for many simulations, a chunk of ids per query"""
+        selected = self.select_fields(fields)
+        columns = [column_name(section, field) for section, field, _ in selected]
+        results_by_id = {}
+        simulation_ids = list(simulation_ids)
+        for start in range(0, len(simulation_ids), chunk_size):
+            chunk = simulation_ids[start:start + chunk_size]
+            rows = self.db.query_all(f'''
+                SELECT simulation_id, {', '.join(list(HEADER_FIELDS) + columns)}
+                FROM simulation_results WHERE simulation_id IN ({','.join('?' * len(chunk))})
+            ''', chunk)
+            for row in rows:
+                results_by_id[row[0]] = self._row_results(selected, row[1:])
+        return results_by_id
+
+    def hourly_path(self, simulation_id):
+        """Blob key of a simulation's hourly series, or None"""
+        row = self.db.query_one(
+            'SELECT hourly_path FROM simulation_results WHERE simulation_id = ?', (simulation_id,)
+        )
+        return row[0] if row else None
+
+    def load_hourly(self, simulation_id, series=None, start=0, end=None):
+        """Memory-mapped views of hourly series; only the requested rows are paged in"""
+        key = self.hourly_path(simulation_id)
+        path = self.blobs.local_path(key) if key else None
+        if path is None:
+            return None
+
+        names = list(series) if series else list(HOURLY_SERIES)
+        unknown = [name for name in names if name not in HOURLY_SERIES]
+        if unknown:
+            raise ValueError(f"Unknown hourly series: {', '.join(unknown)}")
+
+        matrix = np.load(path, mmap_mode='r')
+        return {name: matrix[HOURLY_SERIES.index(name), start:end] for name in names}
+
+    @staticmethod
+    def _row_results(selected, row):
+        results = dict(zip(HEADER_FIELDS, row[:len(HEADER_FIELDS)]))
+        for (section, field, storage), value in zip(selected, row[len(HEADER_FIELDS):]):
+            if storage == 'json' and value is not None:
+                value = json.loads(value)
+            results.setdefault(section, {})[field] = value
+        for section in OPTIONAL_SECTIONS:
+            if section in results and all(value is None for value in results[section].values()):
+                del results[section]
+        return results
+
+    @staticmethod
+    def select_fields(fields=None):
+        """Resolve field selectors to (section, field, storage) triples"""
+        if not fields:
+            return [(section, field, storage)
+                    for section, section_fields in RESULT_FIELDS.items()
+                    for field, storage in section_fields]
+
+        selected = []
+        for selector in fields:
+            section, _, field = selector.partition('.')
+            if section not in RESULT_FIELDS:
+                raise ValueError(f"Unknown result field: {selector}")
+            matches = [(section, name, storage) for name, storage in RESULT_FIELDS[section]
+                       if not field or name == field]
+            if not matches:
+                raise ValueError(f"Unknown result field: {selector}")
+            selected.extend(match for match in matches if match not in selected)
+        return selected
+
+
+def hourly_matrix(hourly):
+    """Stack simulate_hourly output into a HOURLY_SERIES x 8760 float32 matrix"""
+    return np.stack([np.asarray(hourly[name], dtype=np.float32).reshape(-1) for name in HOURLY_SERIES])
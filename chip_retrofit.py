@@ -0,0 +1,306 @@
+# CHIP MVP Retrofit Optimizer
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# What-if evaluation of retrofit packages. Each measure is a change to the
+# building model's parameters (or, for PV, an offset on delivered energy),
+# so a package is simulated rather than quoted. Packages are grown a
+# measure at a time; ones that cannot beat the current cost/savings front
+# even on an optimistic additive estimate are never simulated, and packages
+# that reduce to the same model parameters share one simulation.
+
+import os
+import time
+
+import numpy as np
+
+from chip_simulation import (
+    DEFAULT_GEOMETRY, DEFAULT_MODEL_PARAMETERS, simulate_hourly, summarize_hourly, with_leading_axis
+)
+
+RETROFIT_ENERGY_PRICE = float(os.environ.get('RETROFIT_ENERGY_PRICE', 0.15))  # per kWh delivered
+RETROFIT_COOLING_COP = float(os.environ.get('RETROFIT_COOLING_COP', 3.0))
+RETROFIT_HEATING_EFFICIENCY = float(os.environ.get('RETROFIT_HEATING_EFFICIENCY', 0.9))
+RETROFIT_TIME_BUDGET = float(os.environ.get('RETROFIT_TIME_BUDGET', 20))  # seconds per building
+RETROFIT_BEAM_WIDTH = int(os.environ.get('RETROFIT_BEAM_WIDTH', 16))  # packages extended per size
+RETROFIT_CHUNK_SIZE = int(os.environ.get('RETROFIT_CHUNK_SIZE', 32))  # packages per model call
+
+PV_ROOF_COVERAGE = 0.5  # share of roof area usable for panels
+PV_EFFICIENCY = 0.2
+PV_PERFORMANCE_RATIO = 0.8
+
+# Measure ids match the recommendation rules they quantify. "set" replaces
+# model parameters, "scale" multiplies them; cost is rate × the named
+# quantity of the building (m², or kWp for pv_capacity).
+RETROFIT_MEASURES = {
+    "natural-ventilation": {
+        "title": "Enhanced Natural Ventilation",
+        "set": {"cooling_setpoint": 26.0, "comfort_max": 28.0},  # elevated air speed from fans
+        "cost": {"quantity": "floor_area", "rate": 15}
+    },
+    "external-shading": {
+        "title": "External Shading Systems",
+        "set": {"shading_factor": 0.5},
+        "cost": {"quantity": "window_area", "rate": 150}
+    },
+    "cool-roof": {
+        "title": "Cool Roof Technology",
+        "set": {"roof_absorptance": 0.3},
+        "cost": {"quantity": "roof_area", "rate": 25}
+    },
+    "building-insulation": {
+        "title": "Enhanced Building Insulation",
+        "set": {"u_wall": 0.3, "u_roof": 0.18},
+        "cost": {"quantity": "opaque_wall_area", "rate": 60}
+    },
+    "high-performance-glazing": {
+        "title": "High-Performance Glazing",
+        "set": {"u_window": 1.4, "shgc": 0.4},
+        "cost": {"quantity": "window_area", "rate": 400}
+    },
+    "heat-recovery-ventilation": {
+        "title": "Heat Recovery Ventilation",
+        "scale": {"air_changes": 0.5},  # ~70% recovery on the ventilation share
+        "cost": {"quantity": "floor_area", "rate": 40}
+    },
+    "air-sealing": {
+        "title": "Air Sealing",
+        "scale": {"air_changes": 0.8},
+        "cost": {"quantity": "floor_area", "rate": 8}
+    },
+    "renewables-storage": {
+        "title": "Renewable Energy + Storage",
+        "pv": True,
+        "cost": {"quantity": "pv_capacity", "rate": 2000}  # per kWp, including batteries
+    }
+}
+
+
+def building_quantities(geometry=None):
+    """Areas (m²) and PV capacity (kWp) that measure costs are priced on"""
+    geometry = geometry or DEFAULT_GEOMETRY
+    envelope = geometry.get("building_envelope") or DEFAULT_GEOMETRY["building_envelope"]
+    roof_area = envelope.get("roof_area", 0)
+    return {
+        "floor_area": geometry.get("floor_area", DEFAULT_GEOMETRY["floor_area"]),
+        "window_area": envelope.get("window_area", 0),
+        "roof_area": roof_area,
+        "opaque_wall_area": max(0, envelope.get("wall_area", 0) - envelope.get("window_area", 0)),
+        "pv_capacity": roof_area * PV_ROOF_COVERAGE * PV_EFFICIENCY
+    }
+
+
+def parse_measures(measures=None):
+    """Validated list of measure ids; every modelled measure when None"""
+    if measures is None:
+        return list(RETROFIT_MEASURES)
+    if not isinstance(measures, list) or not measures:
+        raise ValueError("measures must be a non-empty list of measure ids")
+    unknown = [measure_id for measure_id in measures if measure_id not in RETROFIT_MEASURES]
+    if unknown:
+        raise ValueError(f"Unknown retrofit measures: {', '.join(map(str, unknown))}")
+    return list(dict.fromkeys(measures))
+
+
+def package_parameters(package):
+    """Model parameters with a package's measures applied, as a hashable tuple"""
+    parameters = dict(DEFAULT_MODEL_PARAMETERS)
+    for measure_id in package:
+        parameters.update(RETROFIT_MEASURES[measure_id].get("set", {}))
+    for measure_id in package:
+        for name, factor in RETROFIT_MEASURES[measure_id].get("scale", {}).items():
+            parameters[name] *= factor
+    return tuple(sorted(parameters.items()))
+
+
+def evaluate_parameter_sets(weather_year, geometry, parameter_sets):
+    """Annual loads for many parameter sets in one vectorised model call
+
+    Module-level so worker processes can run it.
+    """
+    rows = [dict(parameter_set) for parameter_set in parameter_sets]
+    parameters = {name: np.array([row[name] for row in rows]) for name in rows[0]}
+    weather = with_leading_axis(weather_year)
+    hourly = simulate_hourly(weather, geometry, parameters)
+    metrics = summarize_hourly(hourly, geometry, parameters, weather)
+    energy = metrics["energy_analysis"]
+    return [
+        {
+            "annual_cooling_load": float(cooling),
+            "annual_heating_load": float(heating),
+            "peak_cooling_demand": float(peak),
+            "overheating_hours": int(overheating)
+        }
+        for cooling, heating, peak, overheating in zip(
+            energy["annual_cooling_load"], energy["annual_heating_load"],
+            energy["peak_cooling_demand"], metrics["thermal_comfort"]["overheating_hours"]
+        )
+    ]
+
+
+def delivered_energy(loads):
+    """kWh/year of electricity and fuel to meet the modelled HVAC loads"""
+    return (loads["annual_cooling_load"] / RETROFIT_COOLING_COP
+            + loads["annual_heating_load"] / RETROFIT_HEATING_EFFICIENCY)
+
+
+def pareto_front(points):
+    """Points not beaten on both cost (lower) and savings (higher), cheapest first"""
+    front = []
+    best_savings = -np.inf
+    for point in sorted(points, key=lambda point: (point["capital_cost"], -point["annual_energy_savings"])):
+        if point["annual_energy_savings"] > best_savings:
+            front.append(point)
+            best_savings = point["annual_energy_savings"]
+    return front
+
+
+def dominated(cost, savings, front):
+    return any(point["capital_cost"] <= cost and point["annual_energy_savings"] >= savings
+               for point in front)
+
+
+class RetrofitOptimizer:
+    """Cost-versus-savings search over combinations of retrofit measures
+
+    run_many(func, args_list) evaluates model chunks, e.g. across a
+    process pool; by default they run inline.
+    """
+
+    def __init__(self, weather_year, geometry=None, measures=None, run_many=None,
+                 time_budget=RETROFIT_TIME_BUDGET, beam_width=RETROFIT_BEAM_WIDTH,
+                 chunk_size=RETROFIT_CHUNK_SIZE):
+        self.measures = measures = parse_measures(measures)
+        self.weather_year = weather_year
+        self.geometry = geometry
+        self.run_many = run_many or (lambda func, args_list: [func(*args) for args in args_list])
+        self.time_budget = time_budget
+        self.beam_width = beam_width
+        self.chunk_size = chunk_size
+
+        self.quantities = building_quantities(geometry)
+        self.measure_costs = {
+            measure_id: RETROFIT_MEASURES[measure_id]["cost"]["rate"]
+            * self.quantities[RETROFIT_MEASURES[measure_id]["cost"]["quantity"]]
+            for measure_id in measures
+        }
+        annual_ghi = float(np.sum(weather_year['ghi'])) / 1000  # kWh/m²
+        self.pv_generation = (annual_ghi * self.quantities["roof_area"] * PV_ROOF_COVERAGE
+                              * PV_EFFICIENCY * PV_PERFORMANCE_RATIO)
+
+        self._loads = {}  # parameter tuple -> annual loads, shared by every package
+        self._results = {}  # frozenset(package) -> evaluated point
+        self.simulations = 0
+
+    def optimize(self):
+        started = time.monotonic()
+        baseline = self._evaluate([frozenset()])[0]
+        singles = self._evaluate([frozenset([measure_id]) for measure_id in self.measures])
+
+        # Measures that save nothing on their own are not combined further
+        effective = [point["measures"][0] for point in singles if point["annual_energy_savings"] > 0]
+        single_savings = {point["measures"][0]: point["annual_energy_savings"] for point in singles}
+
+        truncated = False
+        pruned = 0
+        level = [frozenset([measure_id]) for measure_id in effective]
+        for size in range(2, len(effective) + 1):
+            if time.monotonic() - started > self.time_budget:
+                truncated = True
+                break
+            front = pareto_front(self._results.values())
+            # Extend the best packages of the previous size by one measure each
+            kept = sorted(level, key=lambda package: -self._results[package]["savings_per_cost"])
+            candidates = {package | {measure_id}
+                          for package in kept[:self.beam_width]
+                          for measure_id in effective if measure_id not in package}
+            level = []
+            for package in candidates:
+                # Savings rarely add up fully, so the additive sum is an optimistic bound
+                if dominated(self._package_cost(package),
+                             sum(single_savings[measure_id] for measure_id in package), front):
+                    pruned += 1
+                else:
+                    level.append(package)
+            if not level:
+                break
+            self._evaluate(level)
+
+        total = 2 ** len(self.measures)
+        return {
+            "measures": [
+                {"id": measure_id, "title": RETROFIT_MEASURES[measure_id]["title"],
+                 "capital_cost": round(self.measure_costs[measure_id]),
+                 "annual_energy_savings": round(single_savings[measure_id], 1),
+                 "effective": measure_id in effective}
+                for measure_id in self.measures
+            ],
+            "baseline": {
+                "annual_energy": round(baseline["annual_energy"], 1),
+                "annual_energy_cost": round(baseline["annual_energy"] * RETROFIT_ENERGY_PRICE, 2),
+                "overheating_hours": baseline["overheating_hours"]
+            },
+            "pareto_front": [self._public(point) for point in pareto_front(self._results.values())],
+            "search": {
+                "combinations": total,
+                "evaluated": len(self._results),
+                "simulations": self.simulations,
+                "pruned": pruned,
+                "skipped": total - len(self._results),
+                "truncated": truncated,
+                "seconds": round(time.monotonic() - started, 3)
+            }
+        }
+
+    def _package_cost(self, package):
+        return sum(self.measure_costs[measure_id] for measure_id in package)
+
+    def _evaluate(self, packages):
+        """Evaluated points for packages, simulating only unseen parameter sets"""
+        keys = {package: package_parameters(package) for package in packages}
+        missing = list(dict.fromkeys(key for key in keys.values() if key not in self._loads))
+        chunks = [missing[start:start + self.chunk_size] for start in range(0, len(missing), self.chunk_size)]
+        for chunk, loads in zip(chunks, self.run_many(
+                evaluate_parameter_sets, [(self.weather_year, self.geometry, chunk) for chunk in chunks])):
+            self._loads.update(zip(chunk, loads))
+        self.simulations += len(missing)
+
+        baseline_loads = self._loads.get(package_parameters(()))
+        points = []
+        for package in packages:
+            if package not in self._results:
+                loads = self._loads[keys[package]]
+                energy = delivered_energy(loads)
+                if any(RETROFIT_MEASURES[measure_id].get("pv") for measure_id in package):
+                    # PV offsets at most the modelled HVAC demand
+                    energy = max(0.0, energy - self.pv_generation)
+                baseline_energy = delivered_energy(baseline_loads) if baseline_loads else energy
+                cost = self._package_cost(package)
+                savings = baseline_energy - energy
+                self._results[package] = {
+                    "measures": sorted(package, key=self.measures.index),
+                    "capital_cost": cost,
+                    "annual_energy": energy,
+                    "annual_energy_savings": savings,
+                    "savings_per_cost": savings / cost if cost else 0.0,
+                    "overheating_hours": loads["overheating_hours"],
+                    "peak_cooling_demand": loads["peak_cooling_demand"],
+                    "baseline_energy": baseline_energy
+                }
+            points.append(self._results[package])
+        return points
+
+    @staticmethod
+    def _public(point):
+        annual_cost_savings = point["annual_energy_savings"] * RETROFIT_ENERGY_PRICE
+        return {
+            "measures": point["measures"],
+            "capital_cost": round(point["capital_cost"]),
+            "annual_energy_savings": round(point["annual_energy_savings"], 1),  # kWh/year
+            "savings_percent": round(point["annual_energy_savings"] / point["baseline_energy"] * 100, 1)
+            if point["baseline_energy"] else 0.0,
+            "annual_cost_savings": round(annual_cost_savings, 2),
+            "simple_payback_years": round(point["capital_cost"] / annual_cost_savings, 1)
+            if annual_cost_savings > 0 else None,
+            "overheating_hours": point["overheating_hours"],
+            "peak_cooling_demand": round(point["peak_cooling_demand"], 2)
+        }
@@ -0,0 +1,209 @@
+# CHIP MVP Simulation Scheduler
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Bounded, prioritised job queue that replaces the thread-per-request
+# model behind /api/simulate. A fixed set of worker threads claims jobs
+# from the shared queue (see chip_jobs) under a lease that a heartbeat
+# thread keeps extending; the CPU-bound model itself runs in a shared
+# process pool. Any process on any node can run any queued job.
+
+import math
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from chip_jobs import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL
+
+
+class QueueFullError(Exception):
+    """Raised when the simulation queue has no free slots"""
+
+    def __init__(self, retry_after):
+        super().__init__("Simulation queue is full")
+        self.retry_after = retry_after
+
+
+class SimulationCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+class SimulationScheduler:
+    """Claims simulation jobs from a shared queue and runs them on a bounded worker pool"""
+
+    def __init__(self, handler, queue, workers=4, processes=0, max_queue=200,
+                 lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+                 poll_interval=JOB_POLL_INTERVAL, on_abandoned=None):
+        self.handler = handler
+        self.queue = queue
+        self.workers = max(0, workers)  # 0: only enqueue (API-only nodes)
+        self.processes = max(0, processes)
+        self.max_queue = max(1, max_queue)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.on_abandoned = on_abandoned  # called with (job_id, 'cancelled' or 'abandoned')
+
+        self.owner = None  # lease owner id, set when this process starts its workers
+        self._running = set()
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._pool = None
+        self._avg_duration = 5.0  # seconds, exponentially weighted
+
+    def start(self):
+        """Start the worker and heartbeat threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            # Per process, not per import: forked server workers each get their own
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            targets = [(self._worker_loop, f"simulation-worker-{index}") for index in range(self.workers)]
+            targets.append((self._heartbeat_loop, "simulation-heartbeat"))
+            for target, name in targets:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, simulation_id, building_id, simulation_type, priority=0, force=False):
+        """Queue a simulation; raises QueueFullError when at capacity
+        
+        Returns False if the job was already queued or running.
+        """
+        self.start()
+        if not force and self.is_full():
+            raise QueueFullError(self.retry_after())
+        queued = self.queue.push(simulation_id, {"building_id": building_id, "simulation_type": simulation_type},
+                                 priority)
+        with self._wakeup:
+            self._wakeup.notify()
+        return queued
+
+    def is_full(self):
+        return self.free_slots() <= 0
+
+    def free_slots(self):
+        """Jobs that can still be queued before submissions are rejected"""
+        return self.max_queue - self.queue.depth()["queued"]
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before retrying"""
+        depth = self.queue.depth()
+        backlog = depth["queued"] + depth["leased"]
+        with self._lock:
+            return max(1, math.ceil(backlog / max(1, self.workers) * self._avg_duration))
+
+    def cancel(self, simulation_id):
+        """Cancel a job; returns its previous state ('queued'/'running') or None"""
+        state = self.queue.cancel(simulation_id)
+        if state == 'running':
+            with self._lock:
+                if simulation_id in self._running:
+                    # Running here: stop at the next checkpoint rather than the next heartbeat
+                    self._cancelled.add(simulation_id)
+        return state
+
+    def raise_if_cancelled(self, simulation_id):
+        """Checkpoint for running jobs between simulation stages"""
+        with self._lock:
+            if simulation_id in self._cancelled:
+                raise SimulationCancelled(simulation_id)
+
+    def run_cpu(self, func, *args):
+        """Run a CPU-bound callable in the process pool (inline when disabled)"""
+        if not self.processes:
+            return func(*args)
+        return self._process_pool().submit(func, *args).result()
+
+    def map_cpu(self, func, args_list):
+        """Run func over many argument tuples across the process pool, in order"""
+        if not self.processes:
+            return [func(*args) for args in args_list]
+        pool = self._process_pool()
+        futures = [pool.submit(func, *args) for args in args_list]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        depth = self.queue.depth()
+        with self._lock:
+            return {
+                "queued": depth["queued"],
+                "running": len(self._running),
+                "leased": depth["leased"],  # running anywhere
+                "workers": self.workers,
+                "processes": self.processes,
+                "max_queue": self.max_queue,
+                "avg_duration_seconds": round(self._avg_duration, 3),
+                "backend": self.queue.name,
+                "owner": self.owner
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _process_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _next_job(self):
+        while True:
+            try:
+                job = self.queue.claim(self.owner, self.lease_seconds, self.max_attempts)
+            except Exception:
+                job = None  # queue unreachable: back off and retry
+            if job is not None:
+                with self._lock:
+                    self._running.add(job.id)
+                return job
+            # Local submits wake a worker at once; other processes' jobs are found by polling
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            started = time.monotonic()
+            try:
+                self.handler(job.id, job.payload["building_id"], job.payload["simulation_type"])
+            except Exception:
+                pass  # the handler records its own failures
+            finally:
+                elapsed = time.monotonic() - started
+                try:
+                    self.queue.complete(job.id, self.owner)
+                except Exception:
+                    pass  # the lease lapses and the job is re-run or reaped
+                with self._lock:
+                    self._running.discard(job.id)
+                    self._cancelled.discard(job.id)
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                running = list(self._running)
+            try:
+                for job_id in running:
+                    if not self.queue.heartbeat(job_id, self.owner, self.lease_seconds):
+                        # Cancelled elsewhere, or the lease lapsed and another node took it
+                        with self._lock:
+                            self._cancelled.add(job_id)
+                for job_id, state in self.queue.reap(self.max_attempts):
+                    if self.on_abandoned is not None:
+                        self.on_abandoned(job_id, state)
+            except Exception:
+                pass  # retried on the next beat, well inside the lease
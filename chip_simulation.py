@@ -0,0 +1,611 @@
+# CHIP MVP Simulation Engine
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Hourly heat-balance model run over a full 8760-hour weather year. Every
+# step is a NumPy array operation over the hour axis, and weather series,
+# geometry and model parameters may carry extra leading dimensions, so one
+# call can simulate many buildings or variants at once.
+#
+# Kept in its own importable module so the simulation scheduler can hand
+# the CPU-bound model to worker processes.
+
+from datetime import datetime
+
+import numpy as np
+
+from chip_weather_year import (
+    HOURS_PER_YEAR, MONTH_DAYS, solar_position, monthly_totals, stack_weather_years
+)
+
+# Envelope used when no drawing has been processed (matches the CAD mock)
+DEFAULT_GEOMETRY = {
+    "floors": 2,
+    "floor_area": 500,  # m², all floors
+    "height": 6,  # m
+    "orientation": 0,  # degrees from north
+    "window_to_wall_ratio": 0.3,
+    "building_envelope": {
+        "wall_area": 800,  # m², including windows
+        "window_area": 120,  # m²
+        "roof_area": 250  # m²
+    }
+}
+
+DEFAULT_MODEL_PARAMETERS = {
+    "u_wall": 0.6,  # W/m²K
+    "u_window": 2.8,  # W/m²K
+    "u_roof": 0.35,  # W/m²K
+    "shgc": 0.6,  # window solar heat gain coefficient
+    "shading_factor": 0.0,  # fraction of window gains blocked
+    "roof_absorptance": 0.7,
+    "wall_absorptance": 0.6,
+    "air_changes": 1.5,  # per hour, ventilation plus infiltration
+    "internal_gain_base": 4.0,  # W/m² floor, around the clock
+    "internal_gain_occupied": 8.0,  # W/m² floor, 08:00-18:00
+    "thermal_mass_hours": 12.0,  # building time constant
+    "cooling_setpoint": 24.0,  # °C
+    "heating_setpoint": 20.0,  # °C
+    "comfort_min": 18.0,  # °C, free-running comfort band
+    "comfort_max": 26.0  # °C
+}
+
+# Future-climate variants for scenario sweeps. Each shifts the base year's
+# temperatures by warming (°C), stretches hourly departures from the monthly
+# mean by stretch (morphing), scales irradiance by solar_scale, and can add
+# a heatwave: intensity °C at its peak over days, centred on the hottest
+# stretch of the base year unless start_day (1-365) is given.
+DEFAULT_SCENARIOS = [
+    {"id": "baseline", "label": "Baseline"},
+    {"id": "warming-1.5", "label": "+1.5 °C", "warming": 1.5},
+    {"id": "warming-2", "label": "+2 °C", "warming": 2.0},
+    {"id": "warming-3", "label": "+3 °C", "warming": 3.0, "stretch": 0.1},
+    {"id": "heatwave-2050", "label": "2050 heatwave", "warming": 1.5, "stretch": 0.15,
+     "heatwave": {"days": 10, "intensity": 5.0}}
+]
+SCENARIO_MAX = 32
+
+# Climate-change vulnerability from a sweep's sensitivity to warming
+VULNERABILITY_OVERHEATING_HOURS = (150, 40)  # extra overheating hours per °C: High, Moderate
+VULNERABILITY_COOLING_PERCENT = (15, 5)  # % more cooling energy per °C: High, Moderate
+
+# Labels of the categorical resilience metrics, most severe first
+HEAT_STRESS_LEVELS = ("High", "Medium", "Low")
+VULNERABILITY_LEVELS = ("High", "Moderate", "Low")
+CATEGORICAL_METRICS = {
+    "climate_resilience.heat_stress_risk": HEAT_STRESS_LEVELS,
+    "climate_resilience.climate_change_vulnerability": VULNERABILITY_LEVELS
+}
+
+# Bump whenever the model's equations change: results are content-addressed
+# by their inputs and this version, so older results are then never reused
+MODEL_VERSION = 2
+
+# What each stage and result section reads, besides the weather year and the
+# geometry, so a re-run recomputes only what a changed input reaches.
+# Solar gains are one part of the free-running indoor temperature, which the
+# HVAC loads start from; comfort counts read the free-running temperature.
+LOAD_PARAMETERS = ("cooling_setpoint", "heating_setpoint")
+COMFORT_PARAMETERS = ("comfort_min", "comfort_max")
+FREE_RUNNING_PARAMETERS = tuple(
+    name for name in DEFAULT_MODEL_PARAMETERS if name not in LOAD_PARAMETERS + COMFORT_PARAMETERS
+)
+SOLAR_PARAMETERS = ("u_wall", "u_roof", "shgc", "shading_factor", "roof_absorptance", "wall_absorptance")
+SECTION_PARAMETERS = {
+    "energy_analysis": FREE_RUNNING_PARAMETERS + LOAD_PARAMETERS,
+    "solar_analysis": SOLAR_PARAMETERS,
+    "thermal_comfort": FREE_RUNNING_PARAMETERS + COMFORT_PARAMETERS,
+    "climate_resilience": FREE_RUNNING_PARAMETERS + LOAD_PARAMETERS + ("comfort_max",)
+}
+
+DESIGN_COOLING_CAPACITY = 0.1  # kW per m² floor
+EXTERNAL_SURFACE_RESISTANCE = 0.04  # m²K/W
+HOUR_OF_DAY = np.arange(HOURS_PER_YEAR) % 24
+OCCUPIED = (HOUR_OF_DAY >= 8) & (HOUR_OF_DAY < 18)
+
+
+def simulate_building_performance(building, weather_year, simulation_type, geometry=None,
+                                  parameters=None, include_hourly=False):
+    """Annual hourly simulation of one building
+
+    With include_hourly, returns (results, hourly) where hourly maps each
+    series name to a float64 array of 8760 values.
+    """
+    # Give the weather a leading axis of one so results split like a batch
+    single = with_leading_axis(weather_year)
+    hourly = simulate_hourly(single, geometry, parameters)
+    metrics = summarize_hourly(hourly, geometry, parameters, single)
+
+    results = {
+        "simulation_type": simulation_type,
+        "building_id": building[0],
+        "timestamp": datetime.now().isoformat(),
+        "weather_source": weather_year['source']
+    }
+    results.update(building_results(metrics)[0])
+    if include_hourly:
+        return results, {name: series[0] for name, series in hourly.items()}
+    return results
+
+
+def with_leading_axis(weather_year):
+    return {
+        name: value if name == 'source' else np.asarray(value)[None]
+        for name, value in weather_year.items()
+    }
+
+
+def model_inputs(geometry=None, parameters=None):
+    """Geometry and parameters as arrays with a trailing axis for the hours"""
+    geometry = geometry or DEFAULT_GEOMETRY
+    envelope = geometry.get("building_envelope") or DEFAULT_GEOMETRY["building_envelope"]
+    merged = dict(DEFAULT_MODEL_PARAMETERS)
+    merged.update(parameters or {})
+
+    def expand(value):
+        return np.asarray(value, dtype=np.float64)[..., None]
+
+    inputs = {name: expand(value) for name, value in merged.items()}
+    inputs.update({
+        "floors": expand(geometry.get("floors", 1)),
+        "floor_area": expand(geometry.get("floor_area", DEFAULT_GEOMETRY["floor_area"])),
+        "height": expand(geometry.get("height", DEFAULT_GEOMETRY["height"])),
+        "orientation": expand(geometry.get("orientation", 0)),
+        "wall_area": expand(envelope.get("wall_area", 0)),
+        "window_area": expand(envelope.get("window_area", 0)),
+        "roof_area": expand(envelope.get("roof_area", 0))
+    })
+    return inputs
+
+
+def parse_parameters(spec):
+    """Validated model parameter overrides ({name: number}) from a request"""
+    if spec is None:
+        return {}
+    if not isinstance(spec, dict):
+        raise ValueError("parameters must be an object of model parameter values")
+    unknown = [name for name in spec if name not in DEFAULT_MODEL_PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown model parameters: {', '.join(map(str, unknown))}")
+    try:
+        return {name: float(value) for name, value in spec.items()}
+    except (TypeError, ValueError):
+        raise ValueError("Model parameters must be numbers")
+
+
+def simulate_hourly(weather_year, geometry=None, parameters=None):
+    """Hourly free-running indoor temperature, HVAC loads and solar gains
+
+    Returns kW series (kWh per hour) with the weather's leading dimensions
+    broadcast against any array-valued geometry or parameters.
+    """
+    hourly = free_running_hourly(weather_year, geometry, parameters)
+    hourly.update(hvac_loads(hourly["indoor_temperature"], geometry, parameters))
+    return hourly
+
+
+def conductance(m):
+    """Fabric plus ventilation/infiltration conductance (W/K) from model_inputs"""
+    opaque_wall_area = np.maximum(0, m["wall_area"] - m["window_area"])
+    footprint = m["floor_area"] / np.maximum(m["floors"], 1)
+    volume = footprint * m["height"]
+    return (m["u_wall"] * opaque_wall_area
+            + m["u_window"] * m["window_area"]
+            + m["u_roof"] * m["roof_area"]
+            + 0.33 * m["air_changes"] * volume)
+
+
+def hvac_loads(indoor, geometry=None, parameters=None):
+    """Cooling and heating (kW) holding the free-running temperature to the setpoints"""
+    m = model_inputs(geometry, parameters)
+    ua = conductance(m)
+    return {
+        "cooling_load": ua * np.maximum(0, indoor - m["cooling_setpoint"]) / 1000,
+        "heating_load": ua * np.maximum(0, m["heating_setpoint"] - indoor) / 1000
+    }
+
+
+def free_running_hourly(weather_year, geometry=None, parameters=None):
+    """Outdoor and free-running indoor temperature and solar gains (kW), before any HVAC"""
+    m = model_inputs(geometry, parameters)
+    outdoor = weather_year['dry_bulb']
+    ghi = weather_year['ghi']
+    dni = weather_year['dni']
+    dhi = weather_year['dhi']
+
+    sin_altitude, azimuth = solar_position(weather_year['latitude'])
+    sun_up = sin_altitude > 0
+    cos_altitude = np.sqrt(1 - np.clip(sin_altitude, 0, 1) ** 2)
+
+    # Mean irradiance on the four facades (windows split evenly)
+    beam = 0
+    for offset in (0, 90, 180, 270):
+        incidence = cos_altitude * np.cos(np.radians(azimuth - m["orientation"] - offset))
+        beam = beam + dni * np.maximum(0, incidence) * sun_up
+    facade_irradiance = beam / 4 + 0.5 * dhi + 0.1 * ghi  # sky + ground-reflected diffuse
+
+    opaque_wall_area = np.maximum(0, m["wall_area"] - m["window_area"])
+    ua = conductance(m)
+
+    # Gains (W): transmitted through glazing, absorbed by opaque surfaces, internal
+    window_gain = m["window_area"] * m["shgc"] * (1 - m["shading_factor"]) * facade_irradiance
+    opaque_gain = EXTERNAL_SURFACE_RESISTANCE * (
+        m["roof_absorptance"] * m["u_roof"] * m["roof_area"] * ghi
+        + m["wall_absorptance"] * m["u_wall"] * opaque_wall_area * facade_irradiance
+    )
+    internal_gain = m["floor_area"] * (m["internal_gain_base"] + m["internal_gain_occupied"] * OCCUPIED)
+    solar_gain = window_gain + opaque_gain
+
+    balance_temperature = outdoor + (solar_gain + internal_gain) / ua
+    indoor = thermal_lag(balance_temperature, m["thermal_mass_hours"])
+
+    return {
+        "outdoor_temperature": np.broadcast_to(outdoor, indoor.shape),
+        "indoor_temperature": indoor,
+        "solar_gain": np.broadcast_to(solar_gain / 1000, indoor.shape)
+    }
+
+
+def thermal_lag(series, time_constant):
+    """First-order thermal mass response, as a circular convolution over the year"""
+    lags = np.arange(HOURS_PER_YEAR)
+    kernel = np.exp(-lags / np.maximum(time_constant, 1e-3))
+    kernel = kernel / kernel.sum(axis=-1, keepdims=True)
+    spectrum = np.fft.rfft(series, axis=-1) * np.fft.rfft(kernel, axis=-1)
+    return np.fft.irfft(spectrum, n=HOURS_PER_YEAR, axis=-1)
+
+
+def summarize_hourly(hourly, geometry=None, parameters=None, weather_year=None, sections=None):
+    """Annual metrics (one value per leading index) from simulate_hourly output
+
+    sections limits the result to those sections; each reads only the
+    series it needs (see SECTION_PARAMETERS).
+    """
+    m = model_inputs(geometry, parameters)
+    return {
+        section: summarize(hourly, m, weather_year)
+        for section, summarize in SECTION_SUMMARIES.items()
+        if sections is None or section in sections
+    }
+
+
+def summarize_energy(hourly, m, weather_year=None):
+    cooling = hourly["cooling_load"]
+    heating = hourly["heating_load"]
+    annual_cooling = cooling.sum(axis=-1)
+    annual_heating = heating.sum(axis=-1)
+    annual_total = annual_cooling + annual_heating
+    return {
+        "annual_cooling_load": annual_cooling,  # kWh/year
+        "annual_heating_load": annual_heating,  # kWh/year
+        "total_energy_consumption": annual_total,
+        "peak_cooling_demand": cooling.max(axis=-1),  # kW
+        "peak_heating_demand": heating.max(axis=-1),  # kW
+        "energy_intensity": annual_total / m["floor_area"][..., 0],  # kWh/m²/year
+        "monthly_cooling_load": monthly_totals(cooling),
+        "monthly_heating_load": monthly_totals(heating)
+    }
+
+
+def summarize_solar(hourly, m, weather_year=None):
+    solar = hourly["solar_gain"]
+    shape = hourly["indoor_temperature"].shape[:-1]
+    if weather_year is not None:
+        daylight_hours = ((weather_year['ghi'] > 100) & OCCUPIED).sum(axis=-1)
+        daylight = np.broadcast_to(daylight_hours / OCCUPIED.sum() * 100, shape)
+    else:
+        daylight = np.zeros(shape)
+    return {
+        "annual_solar_gain": solar.sum(axis=-1),  # kWh/year
+        "peak_solar_gain": solar.max(axis=-1),  # kW
+        "solar_heat_gain_coefficient": np.broadcast_to(
+            (m["shgc"] * (1 - m["shading_factor"]))[..., 0], shape),
+        "daylight_availability": daylight  # % of occupied hours
+    }
+
+
+def summarize_comfort(hourly, m, weather_year=None):
+    indoor = hourly["indoor_temperature"]
+    overheating = indoor > m["comfort_max"]
+    overheating_hours = overheating.sum(axis=-1)
+    underheating_hours = (indoor < m["comfort_min"]).sum(axis=-1)
+    comfortable_hours = HOURS_PER_YEAR - overheating_hours - underheating_hours
+    return {
+        "comfortable_hours": comfortable_hours,
+        "comfort_percentage": comfortable_hours / HOURS_PER_YEAR * 100,
+        "overheating_hours": overheating_hours,
+        "underheating_hours": underheating_hours,
+        "monthly_overheating_hours": monthly_totals(overheating.astype(np.int64))
+    }
+
+
+def summarize_resilience(hourly, m, weather_year=None):
+    indoor = hourly["indoor_temperature"]
+    outdoor = hourly["outdoor_temperature"]
+    peak_cooling = hourly["cooling_load"].max(axis=-1)
+    overheating = indoor > m["comfort_max"]
+    overheating_hours = overheating.sum(axis=-1)
+    overheating_share = overheating_hours / HOURS_PER_YEAR
+
+    # Overheating hours in which outdoor air is cool enough to ventilate with
+    ventilative = (overheating & (outdoor < m["comfort_max"] - 2)).sum(axis=-1)
+    hot_outdoor_share = (outdoor > 32).sum(axis=-1) / HOURS_PER_YEAR
+    return {
+        "heat_stress_risk": np.select(
+            [overheating_share > 0.10, overheating_share > 0.03], HEAT_STRESS_LEVELS[:2], HEAT_STRESS_LEVELS[2]),
+        "cooling_system_strain": np.minimum(
+            100, peak_cooling / (m["floor_area"][..., 0] * DESIGN_COOLING_CAPACITY) * 100),
+        "adaptive_comfort_potential": ventilative / np.maximum(overheating_hours, 1) * 100,
+        "climate_change_vulnerability": np.select(
+            [hot_outdoor_share > 0.05, hot_outdoor_share > 0.01], VULNERABILITY_LEVELS[:2], VULNERABILITY_LEVELS[2])
+    }
+
+
+SECTION_SUMMARIES = {
+    "energy_analysis": summarize_energy,
+    "solar_analysis": summarize_solar,
+    "thermal_comfort": summarize_comfort,
+    "climate_resilience": summarize_resilience
+}
+
+
+def simulate_locations(weather_years, geometry=None, parameters=None, chunk_size=256):
+    """Annual metrics for one building model at many locations
+
+    Locations are stacked and simulated a chunk at a time to bound memory.
+    """
+    chunks = []
+    for start in range(0, len(weather_years), chunk_size):
+        stacked = stack_weather_years(weather_years[start:start + chunk_size])
+        hourly = simulate_hourly(stacked, geometry, parameters)
+        chunks.append(summarize_hourly(hourly, geometry, parameters, stacked))
+    return {
+        section: {name: np.concatenate([chunk[section][name] for chunk in chunks])
+                  for name in fields}
+        for section, fields in chunks[0].items()
+    }
+
+
+def building_results(metrics):
+    """Split summarize_hourly output (one leading axis) into one plain dict per building"""
+    columns = [
+        (section, name, np.asarray(values).tolist())
+        for section, fields in metrics.items()
+        for name, values in fields.items()
+    ]
+    count = len(columns[0][2])
+    results = [{section: {} for section in metrics} for _ in range(count)]
+    for section, name, values in columns:
+        for result, value in zip(results, values):
+            result[section][name] = value
+    return results
+
+
+def select_buildings(metrics, index):
+    """Fan per-location metrics out to buildings (index maps building -> location)"""
+    return {
+        section: {name: np.asarray(values)[index] for name, values in fields.items()}
+        for section, fields in metrics.items()
+    }
+
+
+def portfolio_summary(metrics):
+    """Aggregate metrics across every building in a batch"""
+    energy = metrics["energy_analysis"]
+    comfort = metrics["thermal_comfort"]
+    resilience = metrics["climate_resilience"]
+    risk_levels, risk_counts = np.unique(resilience["heat_stress_risk"], return_counts=True)
+
+    return {
+        "building_count": int(energy["total_energy_consumption"].size),
+        "total_energy_consumption": float(energy["total_energy_consumption"].sum()),
+        "total_cooling_load": float(energy["annual_cooling_load"].sum()),
+        "total_heating_load": float(energy["annual_heating_load"].sum()),
+        "peak_cooling_demand": float(energy["peak_cooling_demand"].sum()),
+        "mean_energy_intensity": float(energy["energy_intensity"].mean()),
+        "p95_energy_intensity": float(np.percentile(energy["energy_intensity"], 95)),
+        "mean_comfort_percentage": float(comfort["comfort_percentage"].mean()),
+        "total_overheating_hours": float(comfort["overheating_hours"].sum()),
+        "max_cooling_system_strain": float(resilience["cooling_system_strain"].max()),
+        "heat_stress_risk_counts": {
+            str(level): int(count) for level, count in zip(risk_levels, risk_counts)
+        }
+    }
+
+
+def parse_scenarios(spec):
+    """Validated scenario list from a request: true for the defaults, or a
+    list of default scenario ids and/or scenario dicts"""
+    if spec is True or spec == 'default':
+        return [dict(scenario) for scenario in DEFAULT_SCENARIOS]
+    if not isinstance(spec, list) or not spec:
+        raise ValueError("scenarios must be true or a non-empty list")
+    if len(spec) > SCENARIO_MAX:
+        raise ValueError(f"At most {SCENARIO_MAX} scenarios per sweep")
+
+    defaults = {scenario["id"]: scenario for scenario in DEFAULT_SCENARIOS}
+    scenarios = []
+    for item in spec:
+        if isinstance(item, str):
+            if item not in defaults:
+                raise ValueError(f"Unknown scenario: {item}")
+            item = defaults[item]
+        if not isinstance(item, dict):
+            raise ValueError("Each scenario must be an id or an object")
+        scenario = {
+            "id": str(item.get("id") or f"scenario-{len(scenarios) + 1}"),
+            "warming": float(item.get("warming", 0)),
+            "stretch": float(item.get("stretch", 0)),
+            "solar_scale": float(item.get("solar_scale", 1))
+        }
+        scenario["label"] = str(item.get("label") or scenario["id"])
+        if not -1 < scenario["stretch"] <= 2 or not 0 <= scenario["solar_scale"] <= 2:
+            raise ValueError(f"Scenario {scenario['id']}: stretch or solar_scale out of range")
+        heatwave = item.get("heatwave")
+        if heatwave:
+            days = int(heatwave.get("days", 7))
+            start_day = heatwave.get("start_day")
+            if not 1 <= days <= 60 or (start_day is not None and not 1 <= int(start_day) <= 365):
+                raise ValueError(f"Scenario {scenario['id']}: heatwave days or start_day out of range")
+            scenario["heatwave"] = {
+                "days": days,
+                "intensity": float(heatwave.get("intensity", 4)),
+                "start_day": None if start_day is None else int(start_day)
+            }
+        scenarios.append(scenario)
+
+    ids = [scenario["id"] for scenario in scenarios]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Scenario ids must be unique")
+    return scenarios
+
+
+def hottest_window(dry_bulb, days):
+    """First day (1-365) of the hottest run of days in a year, wrapping at new year"""
+    daily = dry_bulb.reshape(365, 24).mean(axis=-1)
+    window = np.convolve(np.concatenate([daily, daily[:days - 1]]), np.ones(days), 'valid')
+    return int(np.argmax(window)) + 1
+
+
+def scenario_weather(weather_year, scenarios):
+    """Stack scenario variants of one weather year along a leading axis
+
+    The transforms are broadcast over (scenario, hour), so the base series
+    are read once however many variants are requested.
+    """
+    base = np.asarray(weather_year['dry_bulb'])
+    monthly_mean = np.repeat(monthly_totals(base) / (np.array(MONTH_DAYS) * 24), np.array(MONTH_DAYS) * 24)
+
+    warming = np.array([scenario.get("warming", 0) for scenario in scenarios])[:, None]
+    stretch = np.array([scenario.get("stretch", 0) for scenario in scenarios])[:, None]
+    solar_scale = np.array([scenario.get("solar_scale", 1) for scenario in scenarios])[:, None]
+
+    # Heatwaves as a half-sine bump over each scenario's window
+    start = np.zeros((len(scenarios), 1))
+    length = np.ones((len(scenarios), 1))
+    intensity = np.zeros((len(scenarios), 1))
+    for index, scenario in enumerate(scenarios):
+        heatwave = scenario.get("heatwave")
+        if heatwave:
+            length[index] = heatwave["days"]
+            start[index] = (heatwave.get("start_day") or hottest_window(base, heatwave["days"])) - 1
+            intensity[index] = heatwave["intensity"]
+    day = np.arange(HOURS_PER_YEAR) / 24
+    into = (day - start) % 365  # wraps heatwaves that run past new year
+    bump = intensity * np.sin(np.pi * np.minimum(into / length, 1)) * (into < length)
+
+    dry_bulb = base + warming + stretch * (base - monthly_mean) + bump
+    return {
+        'dry_bulb': dry_bulb,
+        'relative_humidity': np.broadcast_to(weather_year['relative_humidity'], dry_bulb.shape),
+        'ghi': weather_year['ghi'] * solar_scale,
+        'dni': weather_year['dni'] * solar_scale,
+        'dhi': weather_year['dhi'] * solar_scale,
+        'latitude': np.asarray(weather_year['latitude']),
+        'longitude': np.asarray(weather_year['longitude']),
+        'source': weather_year['source']
+    }
+
+
+def sensitivity(warming, values):
+    """Least-squares slope of values per °C of warming across scenarios"""
+    spread = warming - warming.mean()
+    variance = (spread ** 2).sum()
+    if variance == 0:
+        return 0.0
+    return float((spread * (values - values.mean())).sum() / variance)
+
+
+def scenario_resilience(metrics, warming):
+    """climate_resilience and scenario_analysis from the spread across scenarios
+
+    warming is each scenario's mean outdoor temperature rise over the base year.
+    """
+    energy = metrics["energy_analysis"]
+    comfort = metrics["thermal_comfort"]
+    resilience = metrics["climate_resilience"]
+    overheating = comfort["overheating_hours"].astype(np.float64)
+    cooling = energy["annual_cooling_load"]
+    baseline_cooling = max(float(cooling[0]), 1e-9)
+
+    overheating_sensitivity = sensitivity(warming, overheating)
+    cooling_sensitivity = sensitivity(warming, cooling / baseline_cooling * 100)
+    # Most overheating hours; equal hours go to the higher annual cooling load
+    worst = int(np.lexsort((cooling, overheating))[-1])
+    worst_share = overheating.max() / HOURS_PER_YEAR
+
+    high_overheating, moderate_overheating = VULNERABILITY_OVERHEATING_HOURS
+    high_cooling, moderate_cooling = VULNERABILITY_COOLING_PERCENT
+    high, moderate, low = VULNERABILITY_LEVELS
+    if overheating_sensitivity > high_overheating or cooling_sensitivity > high_cooling:
+        vulnerability = high
+    elif overheating_sensitivity > moderate_overheating or cooling_sensitivity > moderate_cooling:
+        vulnerability = moderate
+    else:
+        vulnerability = low
+
+    high, medium, low = HEAT_STRESS_LEVELS
+    climate_resilience = {
+        "heat_stress_risk": high if worst_share > 0.10 else medium if worst_share > 0.03 else low,
+        "cooling_system_strain": float(resilience["cooling_system_strain"].max()),
+        "adaptive_comfort_potential": float(resilience["adaptive_comfort_potential"].min()),
+        "climate_change_vulnerability": vulnerability
+    }
+    analysis = {
+        "overheating_sensitivity": round(overheating_sensitivity, 1),  # hours per °C
+        "cooling_sensitivity": round(cooling_sensitivity, 2),  # % of baseline cooling per °C
+        "overheating_hours_spread": float(overheating.max() - overheating.min()),
+        "worst_scenario": worst  # most overheating hours, then highest cooling load
+    }
+    return climate_resilience, analysis
+
+
+def simulate_scenarios(building, weather_year, scenarios, geometry=None, parameters=None,
+                       include_hourly=False):
+    """Simulate every scenario variant of a building in one vectorised pass
+
+    Returns the first scenario's results (the reference the others are
+    compared with), with climate_resilience taken from the spread across
+    scenarios and a scenario_analysis comparison table.
+    """
+    weather = scenario_weather(weather_year, scenarios)
+    hourly = simulate_hourly(weather, geometry, parameters)
+    metrics = summarize_hourly(hourly, geometry, parameters, weather)
+
+    warming = weather['dry_bulb'].mean(axis=-1) - np.asarray(weather_year['dry_bulb']).mean()
+    climate_resilience, analysis = scenario_resilience(metrics, warming)
+
+    per_scenario = building_results(metrics)
+    baseline_cooling = max(per_scenario[0]["energy_analysis"]["annual_cooling_load"], 1e-9)
+    table = []
+    for scenario, result, rise in zip(scenarios, per_scenario, warming):
+        energy = result["energy_analysis"]
+        table.append({
+            "id": scenario["id"],
+            "label": scenario.get("label", scenario["id"]),
+            "mean_warming": round(float(rise), 2),
+            "annual_cooling_load": round(energy["annual_cooling_load"], 1),
+            "annual_heating_load": round(energy["annual_heating_load"], 1),
+            "peak_cooling_demand": round(energy["peak_cooling_demand"], 2),
+            "energy_intensity": round(energy["energy_intensity"], 1),
+            "cooling_change_percent": round((energy["annual_cooling_load"] / baseline_cooling - 1) * 100, 1),
+            "overheating_hours": result["thermal_comfort"]["overheating_hours"],
+            "comfort_percentage": round(result["thermal_comfort"]["comfort_percentage"], 1),
+            "heat_stress_risk": result["climate_resilience"]["heat_stress_risk"],
+            "cooling_system_strain": round(result["climate_resilience"]["cooling_system_strain"], 1)
+        })
+    analysis["worst_scenario"] = scenarios[analysis["worst_scenario"]]["id"]
+    analysis["scenarios"] = table
+
+    results = {
+        "simulation_type": "scenario_sweep",
+        "building_id": building[0],
+        "timestamp": datetime.now().isoformat(),
+        "weather_source": weather_year['source']
+    }
+    results.update(per_scenario[0])
+    results["climate_resilience"] = climate_resilience
+    results["scenario_analysis"] = analysis
+    if include_hourly:
+        return results, {name: np.broadcast_to(series, hourly["indoor_temperature"].shape)[0].astype(np.float32)
+                         for name, series in hourly.items()}
+    return results
@@ -0,0 +1,330 @@
+# CHIP MVP Spatial Index
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Where buildings are. An R-tree (SQLite's rtree module) holds one point
+# box per building, keyed by a stable integer id (buildings_spatial_ids,
+# since VACUUM may renumber the rowids of the buildings table) and kept in
+# step with it by triggers, so radius, bounding box, polygon and
+# nearest-neighbour queries read only the buildings near the query instead
+# of the whole inventory. The R-tree stores 32-bit bounds rounded outwards,
+# so every query is a coarse box search refined with exact coordinates:
+# great-circle distance for radius and nearest queries, point-in-polygon
+# for GeoJSON areas. SQLite builds without rtree fall back to the
+# (latitude, longitude) B-tree index.
+
+import math
+import os
+
+import numpy as np
+
+from chip_weather_providers import EARTH_RADIUS_KM
+
+SPATIAL_MAX_RESULTS = int(os.environ.get('SPATIAL_MAX_RESULTS', 10000))
+SPATIAL_KNN_START_KM = float(os.environ.get('SPATIAL_KNN_START_KM', 5.0))  # first nearest-neighbour search radius
+
+# Half the Earth's circumference: a circle this wide covers every building
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+BUILDING_COLUMNS = 'b.id, b.name, b.latitude, b.longitude, b.building_type, b.created_at'
+
+
+def distances_km(lat, lon, lats, lons):
+    """Great-circle (haversine) distances from one point to many"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def circle_boxes(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) boxes covering a circle, split at the antimeridian"""
+    angle = radius_km / EARTH_RADIUS_KM
+    min_lat = lat - math.degrees(angle)
+    max_lat = lat + math.degrees(angle)
+    if min_lat <= -90 or max_lat >= 90 or angle >= math.pi / 2:
+        # The circle reaches a pole: every longitude
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+    # Widest longitude span of the circle (at the tangent latitude, not the centre)
+    span = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+    return lon_boxes(min_lat, max_lat, lon - span, lon + span)
+
+
+def lon_boxes(min_lat, max_lat, min_lon, max_lon):
+    """Boxes for a longitude range that may run past ±180"""
+    if max_lon - min_lon >= 360:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def bbox_boxes(bbox):
+    """Boxes for [min_lon, min_lat, max_lon, max_lat]; min_lon > max_lon crosses the antimeridian"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(value) for value in bbox]
+    except (TypeError, ValueError):
+        raise ValueError("bbox must be [min_lon, min_lat, max_lon, max_lat]")
+    if min_lat > max_lat:
+        raise ValueError("bbox min_lat must not exceed max_lat")
+    if min_lon > max_lon:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def parse_point(spec, name):
+    try:
+        lat, lon = float(spec['latitude']), float(spec['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{name} needs numeric latitude and longitude")
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("latitude must be within ±90 and longitude within ±180")
+    return lat, lon
+
+
+def polygon_rings(geometry):
+    """[[outer, hole, ...], ...] as float arrays of (lon, lat) from a GeoJSON (Multi)Polygon or Feature"""
+    if not isinstance(geometry, dict):
+        raise ValueError("polygon must be a GeoJSON geometry or feature")
+    if geometry.get('type') == 'Feature':
+        return polygon_rings(geometry.get('geometry'))
+    if geometry.get('type') == 'FeatureCollection':
+        return [rings for feature in geometry.get('features') or [] for rings in polygon_rings(feature)]
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry.get('coordinates')]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry.get('coordinates')
+    else:
+        raise ValueError("polygon must be a GeoJSON Polygon or MultiPolygon")
+    try:
+        parsed = [[np.asarray(ring, dtype=float)[:, :2] for ring in polygon] for polygon in polygons or []]
+    except (TypeError, ValueError, IndexError):
+        raise ValueError("polygon coordinates must be [[lon, lat], ...] rings")
+    if not parsed or any(not polygon or len(ring) < 3 for polygon in parsed for ring in polygon):
+        raise ValueError("polygon rings need at least three positions")
+    return parsed
+
+
+def points_in_ring(ring, lons, lats):
+    """Even-odd ray casting of many points against one ring"""
+    inside = np.zeros(len(lons), dtype=bool)
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        crosses = (y1 > lats) != (y2 > lats)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x1 + (lats - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lons < x_cross)
+        x1, y1 = x2, y2
+    return inside
+
+
+def points_in_polygons(polygons, lons, lats):
+    inside = np.zeros(len(lons), dtype=bool)
+    for outer, *holes in polygons:
+        hit = points_in_ring(outer, lons, lats)
+        for hole in holes:
+            hit &= ~points_in_ring(hole, lons, lats)
+        inside |= hit
+    return inside
+
+
+class SpatialIndex:
+    """Radius, bounding box, polygon and nearest-neighbour search over buildings"""
+
+    def __init__(self, db):
+        self.db = db
+        self.rtree = None  # detected by init_schema, or on first query
+
+    def init_schema(self, cursor):
+        cursor.execute('''
+            SELECT 1 FROM sqlite_master WHERE name = 'buildings_spatial_ids'
+        ''')
+        if cursor.fetchone() is None:
+            # Indexes from before the stable keys were keyed by buildings.rowid,
+            # which VACUUM may renumber: start again from the buildings table
+            for trigger in ('buildings_rtree_insert', 'buildings_rtree_update', 'buildings_rtree_delete'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute('DROP TABLE IF EXISTS buildings_rtree')
+        # Stable integer key per building (buildings has a TEXT primary key and
+        # only an implicit rowid); AUTOINCREMENT never reuses a key
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS buildings_spatial_ids (
+                spatial_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                building_id TEXT NOT NULL UNIQUE
+            )
+        ''')
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS buildings_rtree
+                USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+            ''')
+            self.rtree = True
+        except Exception:
+            self.rtree = False  # no rtree module: the B-tree location index serves instead
+
+        # Box ids are spatial_ids; buildings without coordinates are left out
+        rtree_insert = '''
+                INSERT OR REPLACE INTO buildings_rtree
+                SELECT spatial_id, new.latitude, new.latitude, new.longitude, new.longitude
+                FROM buildings_spatial_ids
+                WHERE building_id = new.id AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        ''' if self.rtree else ''
+        rtree_delete = '''
+                DELETE FROM buildings_rtree
+                WHERE id = (SELECT spatial_id FROM buildings_spatial_ids WHERE building_id = old.id);
+        ''' if self.rtree else ''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS buildings_spatial_insert AFTER INSERT ON buildings
+            BEGIN
+                INSERT OR IGNORE INTO buildings_spatial_ids (building_id) VALUES (new.id);
+                {rtree_insert}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS buildings_spatial_update
+            AFTER UPDATE OF id, latitude, longitude ON buildings
+            BEGIN
+                {rtree_delete}
+                UPDATE buildings_spatial_ids SET building_id = new.id WHERE building_id = old.id;
+                {rtree_insert}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS buildings_spatial_delete AFTER DELETE ON buildings
+            BEGIN
+                {rtree_delete}
+                DELETE FROM buildings_spatial_ids WHERE building_id = old.id;
+            END
+        ''')
+
+        # Buildings stored before the index existed
+        cursor.execute('''
+            INSERT OR IGNORE INTO buildings_spatial_ids (building_id)
+            SELECT id FROM buildings ORDER BY rowid
+        ''')
+        if self.rtree:
+            cursor.execute('''
+                INSERT OR REPLACE INTO buildings_rtree
+                SELECT s.spatial_id, b.latitude, b.latitude, b.longitude, b.longitude
+                FROM buildings b JOIN buildings_spatial_ids s ON s.building_id = b.id
+                WHERE b.latitude IS NOT NULL AND b.longitude IS NOT NULL
+                  AND s.spatial_id NOT IN (SELECT id FROM buildings_rtree)
+            ''')
+
+    def version(self):
+        """(building count, newest spatial_id): changes whenever a building is added or removed"""
+        return self.db.query_one('SELECT COUNT(*), MAX(spatial_id) FROM buildings_spatial_ids')
+
+    def has_rtree(self):
+        if self.rtree is None:
+            self.rtree = self.db.query_one(
+                "SELECT 1 FROM sqlite_master WHERE name = 'buildings_rtree'"
+            ) is not None
+        return self.rtree
+
+    def box_filter(self, boxes, alias='buildings'):
+        """SQL condition (and params) selecting buildings inside any of the boxes"""
+        rtree = self.has_rtree()
+        # With the R-tree finding the rows, unary + keeps the exact test (which
+        # drops rows inside only by float32 rounding) off the B-tree index
+        column = f"+{alias}" if rtree else alias
+        exact = ' OR '.join(
+            [f'({column}.latitude BETWEEN ? AND ? AND {column}.longitude BETWEEN ? AND ?)'] * len(boxes)
+        )
+        exact_params = [value for box in boxes for value in box]
+        if not rtree:
+            return f'({exact})', exact_params
+        condition = ' OR '.join(['(min_lat <= ? AND max_lat >= ? AND min_lon <= ? AND max_lon >= ?)'] * len(boxes))
+        params = [value for min_lat, max_lat, min_lon, max_lon in boxes
+                  for value in (max_lat, min_lat, max_lon, min_lon)]
+        return (f'''{alias}.id IN (
+                    SELECT s.building_id FROM buildings_rtree r
+                    JOIN buildings_spatial_ids s ON s.spatial_id = r.id WHERE {condition}
+                ) AND ({exact})''',
+                params + exact_params)
+
+    def candidates(self, boxes, filters=(), params=()):
+        """Buildings inside any of the boxes"""
+        condition, box_params = self.box_filter(boxes, alias='b')
+        where = ' AND '.join([condition, *filters])
+        return self.db.query_all(f'''
+            SELECT {BUILDING_COLUMNS} FROM buildings b WHERE {where}
+        ''', box_params + list(params))
+
+    def within(self, lat, lon, radius_km, filters=(), params=()):
+        """[(building, distance_km)] within radius_km, nearest first"""
+        if radius_km < 0:
+            raise ValueError("radius_km must not be negative")
+        rows = self.candidates(circle_boxes(lat, lon, min(radius_km, MAX_RADIUS_KM)), filters, params)
+        if not rows:
+            return []
+        distances = distances_km(lat, lon, [row[2] for row in rows], [row[3] for row in rows])
+        order = np.argsort(distances, kind='stable')
+        return [(rows[i], float(distances[i])) for i in order if distances[i] <= radius_km]
+
+    def nearest(self, lat, lon, k, filters=(), params=()):
+        """The k nearest buildings as [(building, distance_km)]
+
+        Searches circles of growing radius until one holds k buildings; every
+        building nearer than the k-th is then inside it, so the answer is exact.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        radius_km = SPATIAL_KNN_START_KM
+        while True:
+            hits = self.within(lat, lon, radius_km, filters, params)
+            if len(hits) >= k or radius_km >= MAX_RADIUS_KM:
+                return hits[:k]
+            # Grow by the shortfall in area, at least fourfold
+            radius_km = min(MAX_RADIUS_KM, radius_km * max(4.0, math.sqrt(k / max(1, len(hits)))))
+
+    def in_bbox(self, bbox, filters=(), params=()):
+        """Buildings inside [min_lon, min_lat, max_lon, max_lat]"""
+        return self.candidates(bbox_boxes(bbox), filters, params)
+
+    def in_polygon(self, geometry, filters=(), params=()):
+        """Buildings inside a GeoJSON Polygon or MultiPolygon (holes excluded)"""
+        polygons = polygon_rings(geometry)
+        boxes = []
+        for polygon in polygons:
+            outer = polygon[0]
+            boxes.append((outer[:, 1].min(), outer[:, 1].max(), outer[:, 0].min(), outer[:, 0].max()))
+        rows = self.candidates(boxes, filters, params)
+        if not rows:
+            return []
+        inside = points_in_polygons(polygons, np.array([row[3] for row in rows]), np.array([row[2] for row in rows]))
+        return [row for row, hit in zip(rows, inside) if hit]
+
+    def search(self, query, filters=(), params=()):
+        """Run one query: {"within": {latitude, longitude, radius_km}}, {"bbox": [...]},
+        {"polygon": GeoJSON} or {"nearest": {latitude, longitude, k}}
+
+        Returns [(building, distance_km or None)], nearest first for point queries.
+        """
+        kinds = [kind for kind in ('within', 'bbox', 'polygon', 'nearest') if query.get(kind) is not None]
+        if len(kinds) != 1:
+            raise ValueError("Give exactly one of within, bbox, polygon or nearest")
+        kind = kinds[0]
+        spec = query[kind]
+        if kind == 'within':
+            lat, lon = parse_point(spec, 'within')
+            try:
+                radius_km = float(spec['radius_km'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("within needs a numeric radius_km")
+            return self.within(lat, lon, radius_km, filters, params)
+        if kind == 'nearest':
+            lat, lon = parse_point(spec, 'nearest')
+            try:
+                k = int(spec.get('k', 10))
+            except (TypeError, ValueError):
+                raise ValueError("nearest k must be an integer")
+            return self.nearest(lat, lon, min(k, SPATIAL_MAX_RESULTS), filters, params)
+        if kind == 'bbox':
+            rows = self.in_bbox(spec, filters, params)
+        else:
+            rows = self.in_polygon(spec, filters, params)
+        rows.sort(key=lambda row: row[0])
+        return [(row, None) for row in rows]
@@ -0,0 +1,372 @@
+# CHIP MVP Upload Pipeline
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Drawings arrive as resumable chunked uploads that are streamed to disk and
+# hashed as the bytes come in. Finished files are stored once per content
+# hash, and geometry extraction runs as a background stage whose status is
+# kept alongside the stored drawing.
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from chip_blobs import FileBlobStore
+
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get('UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+GEOMETRY_WORKERS = int(os.environ.get('GEOMETRY_WORKERS', 2))
+GEOMETRY_WAIT_TIMEOUT = float(os.environ.get('GEOMETRY_WAIT_TIMEOUT', 60))  # seconds extract_now waits for another extraction
+GEOMETRY_WAIT_POLL = 0.05  # seconds between status checks for extractions in other processes
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadConflict(Exception):
+    """A chunk did not start where the stored upload ends"""
+
+    def __init__(self, received_bytes):
+        super().__init__(f"Upload continues at byte {received_bytes}")
+        self.received_bytes = received_bytes
+
+
+class UploadStore:
+    """Chunked upload sessions and content-addressed drawing storage"""
+
+    def __init__(self, db, folder, chunk_size=UPLOAD_CHUNK_SIZE, blobs=None):
+        self.db = db
+        self.folder = folder
+        self.blobs = blobs or FileBlobStore()
+        self.chunk_size = chunk_size
+        self.partial_folder = os.path.join(folder, 'partial')  # created by the app at startup
+
+        self._hashers = {}  # upload_id -> (hasher, bytes hashed)
+        self._upload_locks = {}
+        self._lock = threading.Lock()
+
+    def init_schema(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+                id TEXT PRIMARY KEY,
+                filename TEXT,
+                total_size INTEGER,
+                received_bytes INTEGER DEFAULT 0,
+                metadata TEXT,
+                status TEXT DEFAULT 'receiving',
+                content_hash TEXT,
+                building_id TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS drawings (
+                content_hash TEXT PRIMARY KEY,
+                file_path TEXT,
+                size INTEGER,
+                geometry_status TEXT DEFAULT 'queued',
+                geometry TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                processed_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_drawings_status
+            ON drawings (geometry_status)
+        ''')
+
+    def create(self, filename, total_size, metadata=None):
+        """Open an upload session; chunks are then PUT in order"""
+        if total_size <= 0 or total_size > UPLOAD_MAX_SIZE:
+            raise ValueError(f"Upload size must be between 1 and {UPLOAD_MAX_SIZE} bytes")
+        upload_id = str(uuid.uuid4())
+        # Pre-create the partial file so every chunk can be written in place
+        open(self._partial_path(upload_id), 'wb').close()
+        self.db.execute('''
+            INSERT INTO uploads (id, filename, total_size, metadata)
+            VALUES (?, ?, ?, ?)
+        ''', (upload_id, os.path.basename(filename), total_size, json.dumps(metadata or {})))
+        return self.get(upload_id)
+
+    def get(self, upload_id):
+        row = self.db.query_one('''
+            SELECT id, filename, total_size, received_bytes, metadata, status, content_hash, building_id
+            FROM uploads WHERE id = ?
+        ''', (upload_id,))
+        if row is None:
+            return None
+        return {
+            "upload_id": row[0],
+            "filename": row[1],
+            "total_size": row[2],
+            "received_bytes": row[3],
+            "metadata": json.loads(row[4] or '{}'),
+            "status": row[5],
+            "content_hash": row[6],
+            "building_id": row[7],
+            "chunk_size": self.chunk_size
+        }
+
+    def write_chunk(self, upload_id, offset, stream, length):
+        """Append one chunk read from stream; returns the updated session
+
+        Whatever arrives before a client disconnect is kept, so the upload
+        can resume from received_bytes.
+        """
+        if length is None or length > UPLOAD_MAX_CHUNK_SIZE:
+            raise ValueError(f"Chunks must declare a length of at most {UPLOAD_MAX_CHUNK_SIZE} bytes")
+
+        with self._upload_lock(upload_id):
+            session = self.get(upload_id)
+            if session is None:
+                return None
+            if session["status"] != 'receiving':
+                raise UploadConflict(session["received_bytes"])
+            if offset != session["received_bytes"]:
+                raise UploadConflict(session["received_bytes"])
+            if offset + length > session["total_size"]:
+                raise ValueError("Chunk runs past the declared upload size")
+
+            hasher = self._hasher(upload_id, offset)
+            written = 0
+            try:
+                with open(self._partial_path(upload_id), 'r+b') as f:
+                    f.seek(offset)
+                    while written < length:
+                        data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+                        if not data:
+                            break
+                        f.write(data)
+                        hasher.update(data)
+                        written += len(data)
+            finally:
+                self._hashers[upload_id] = (hasher, offset + written)
+                self.db.execute('''
+                    UPDATE uploads SET received_bytes = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (offset + written, upload_id))
+
+            session["received_bytes"] = offset + written
+            return session
+
+    def finalize(self, upload_id):
+        """Move a fully received upload into drawing storage
+
+        Returns (content_hash, file_path, is_new), or None for an unknown
+        upload; is_new is False when an identical drawing was already stored
+        and the upload was discarded.
+        """
+        with self._upload_lock(upload_id):
+            session = self.get(upload_id)
+            if session is None:
+                return None
+            if session["status"] != 'receiving' or session["received_bytes"] != session["total_size"]:
+                raise UploadConflict(session["received_bytes"])
+            hasher = self._hasher(upload_id, session["received_bytes"])
+            content_hash = hasher.hexdigest()
+            file_path, is_new = self.store_file(
+                self._partial_path(upload_id), content_hash, session["filename"], session["total_size"]
+            )
+            self.db.execute('''
+                UPDATE uploads SET status = 'completed', content_hash = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (content_hash, upload_id))
+            with self._lock:
+                self._hashers.pop(upload_id, None)
+                self._upload_locks.pop(upload_id, None)
+            return content_hash, file_path, is_new
+
+    def attach_building(self, upload_id, building_id):
+        self.db.execute('UPDATE uploads SET building_id = ? WHERE id = ?', (building_id, upload_id))
+
+    def save_stream(self, filename, stream):
+        """One-shot upload: stream to disk while hashing; returns (content_hash, file_path, is_new)"""
+        temp_path = self._partial_path(str(uuid.uuid4()))
+        hasher = hashlib.sha256()
+        size = 0
+        with open(temp_path, 'wb') as f:
+            while True:
+                data = stream.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                f.write(data)
+                hasher.update(data)
+                size += len(data)
+        content_hash = hasher.hexdigest()
+        file_path, is_new = self.store_file(temp_path, content_hash, filename, size)
+        return content_hash, file_path, is_new
+
+    def store_file(self, temp_path, content_hash, filename, size):
+        """Keep one copy per content hash; the first upload of a drawing wins"""
+        file_path = os.path.join(self.folder, content_hash + os.path.splitext(filename)[1].lower())
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO drawings (content_hash, file_path, size)
+                VALUES (?, ?, ?)
+            ''', (content_hash, file_path, size))
+            is_new = cursor.rowcount == 1
+            if not is_new:
+                cursor.execute('SELECT file_path FROM drawings WHERE content_hash = ?', (content_hash,))
+                file_path = cursor.fetchone()[0]
+
+        if is_new:
+            os.replace(temp_path, file_path)
+            self.blobs.put_file(file_path, file_path)
+        else:
+            os.remove(temp_path)
+        return file_path, is_new
+
+    def adopt_file(self, file_path):
+        """Register a file already on disk as a drawing; returns its content hash"""
+        hasher = hashlib.sha256()
+        size = 0
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                hasher.update(data)
+                size += len(data)
+        content_hash = hasher.hexdigest()
+        if self.db.execute('''
+            INSERT OR IGNORE INTO drawings (content_hash, file_path, size)
+            VALUES (?, ?, ?)
+        ''', (content_hash, file_path, size)):
+            self.blobs.put_file(file_path, file_path)
+        return content_hash
+
+    def drawing(self, content_hash):
+        row = self.db.query_one('''
+            SELECT file_path, geometry_status, geometry, error FROM drawings WHERE content_hash = ?
+        ''', (content_hash,))
+        if row is None:
+            return None
+        return {
+            "content_hash": content_hash,
+            "file_path": row[0],
+            "geometry_status": row[1],
+            "geometry": json.loads(row[2]) if row[2] else None,
+            "error": row[3]
+        }
+
+    def _partial_path(self, upload_id):
+        return os.path.join(self.partial_folder, upload_id)
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def _hasher(self, upload_id, received_bytes):
+        """Running hash of the first received_bytes, re-read from disk after a restart"""
+        hasher, hashed = self._hashers.get(upload_id, (None, None))
+        if hasher is not None and hashed == received_bytes:
+            return hasher
+
+        hasher = hashlib.sha256()
+        remaining = received_bytes
+        with open(self._partial_path(upload_id), 'rb') as f:
+            while remaining:
+                data = f.read(min(COPY_BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+        return hasher
+
+
+class GeometryPipeline:
+    """Background geometry extraction, once per stored drawing"""
+
+    def __init__(self, db, extract, workers=GEOMETRY_WORKERS):
+        self.db = db
+        self.extract = extract
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geometry')
+        self._in_flight = {}  # content_hash -> Event set when this process's extraction ends
+        self._lock = threading.Lock()
+
+    def submit(self, content_hash, file_path):
+        self.submit_many([(content_hash, file_path)])
+
+    def submit_many(self, drawings):
+        """Queue (content_hash, file_path) pairs with one status write"""
+        if not drawings:
+            return
+        # A drawing being extracted keeps its claim; its queued task then finds nothing to do
+        self.db.executemany('''
+            UPDATE drawings SET geometry_status = 'queued', error = NULL
+            WHERE content_hash = ? AND geometry_status != 'processing'
+        ''', [(content_hash,) for content_hash, _ in drawings])
+        for content_hash, file_path in drawings:
+            self._executor.submit(self._run, content_hash, file_path)
+
+    def resume(self):
+        """Re-queue drawings whose extraction was interrupted (at startup, before any run here)"""
+        self.db.execute('''
+            UPDATE drawings SET geometry_status = 'queued' WHERE geometry_status = 'processing'
+        ''')
+        pending = self.db.query_all('''
+            SELECT content_hash, file_path FROM drawings WHERE geometry_status = 'queued'
+        ''')
+        for content_hash, file_path in pending:
+            self._executor.submit(self._run, content_hash, file_path)
+        return len(pending)
+
+    def extract_now(self, content_hash, file_path, timeout=GEOMETRY_WAIT_TIMEOUT):
+        """Extract on the calling thread, for callers that cannot wait for the queue
+
+        If the drawing is already being extracted, waits (up to timeout
+        seconds) for that extraction instead of starting a second one.
+        """
+        if self._run(content_hash, file_path):
+            return
+        with self._lock:
+            in_flight = self._in_flight.get(content_hash)
+        if in_flight is not None:
+            in_flight.wait(timeout)
+            return
+        # Claimed by another process: its result arrives through the database
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.db.query_one(
+                'SELECT geometry_status FROM drawings WHERE content_hash = ?', (content_hash,)
+            )
+            if status is None or status[0] != 'processing':
+                return
+            time.sleep(GEOMETRY_WAIT_POLL)
+
+    def _run(self, content_hash, file_path):
+        """Extract if this call claims the drawing; False if it is extracted or being extracted"""
+        claimed = self.db.execute('''
+            UPDATE drawings SET geometry_status = 'processing'
+            WHERE content_hash = ? AND geometry_status IN ('queued', 'failed')
+        ''', (content_hash,))
+        if not claimed:
+            return False
+        done = threading.Event()
+        with self._lock:
+            self._in_flight[content_hash] = done
+        try:
+            geometry = self.extract(file_path)
+            self.db.execute('''
+                UPDATE drawings SET geometry_status = 'completed', geometry = ?, processed_at = ?
+                WHERE content_hash = ?
+            ''', (json.dumps(geometry), datetime.now(), content_hash))
+        except Exception as e:
+            self.db.execute('''
+                UPDATE drawings SET geometry_status = 'failed', error = ?, processed_at = ?
+                WHERE content_hash = ?
+            ''', (str(e), datetime.now(), content_hash))
+        finally:
+            with self._lock:
+                self._in_flight.pop(content_hash, None)
+            done.set()
+        return True
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
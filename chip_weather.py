@@ -0,0 +1,134 @@
+# CHIP MVP Weather Service
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# In-process climate data assembly shared by the /api/weather route and the
+# simulation engine, so simulations no longer call back into their own server.
+
+import os
+from datetime import datetime
+from functools import lru_cache
+
+from chip_climate_grid import climate_lookup, clear_sky_irradiance
+from chip_weather_cache import WeatherCache, grid_cell
+from chip_weather_providers import make_weather_provider
+from chip_weather_year import fingerprint
+
+# Weather cache: buildings in the same grid cell share one upstream fetch
+WEATHER_CACHE_GRID = float(os.environ.get('WEATHER_CACHE_GRID', 0.05))  # degrees
+WEATHER_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', 1800))  # seconds
+WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', 4096))
+WEATHER_CACHE_DB = os.environ.get('WEATHER_CACHE_DB', '')  # empty keeps it in memory only
+
+# Hourly weather years for the simulation engine, per grid cell
+WEATHER_YEAR_CACHE_SIZE = int(os.environ.get('WEATHER_YEAR_CACHE_SIZE', 128))
+
+# Where current conditions and weather years come from (see chip_weather_providers)
+weather_provider = make_weather_provider()
+weather_cache = WeatherCache(
+    ttl=WEATHER_CACHE_TTL,
+    max_entries=WEATHER_CACHE_SIZE,
+    db_path=WEATHER_CACHE_DB or None
+)
+
+
+def set_weather_provider(provider):
+    """Swap the weather provider; cached conditions are keyed by provider name"""
+    global weather_provider
+    weather_provider = provider
+    _weather_year_for_cell.cache_clear()
+    _weather_fingerprint_for_cell.cache_clear()
+
+
+def get_current_weather(lat, lon):
+    """Current conditions for the grid cell containing (lat, lon)"""
+    key, cell_lat, cell_lon = grid_cell(lat, lon, WEATHER_CACHE_GRID)
+    provider = weather_provider
+    return weather_cache.get(
+        f"{provider.name}:{key}",
+        lambda: provider.current(cell_lat, cell_lon),
+        cacheable=provider.cacheable
+    )
+
+
+def get_climate_data(lat, lon):
+    """Assemble the climate data used for building simulation"""
+    current_data = get_current_weather(lat, lon)
+    climate = climate_lookup(lat, lon)
+
+    return {
+        "location": {
+            "latitude": lat,
+            "longitude": lon,
+            "city": current_data.get("name", "Unknown"),
+            "country": current_data.get("sys", {}).get("country", "Unknown")
+        },
+        "current_conditions": {
+            "temperature": current_data.get("main", {}).get("temp", 0),
+            "humidity": current_data.get("main", {}).get("humidity", 0),
+            "pressure": current_data.get("main", {}).get("pressure", 0),
+            "wind_speed": current_data.get("wind", {}).get("speed", 0),
+            "wind_direction": current_data.get("wind", {}).get("deg", 0),
+            "solar_irradiance": calculate_solar_irradiance(lat, lon)
+        },
+        "design_conditions": {
+            "summer_design_temp": round(climate['summer_design_temp'], 1),
+            "winter_design_temp": round(climate['winter_design_temp'], 1),
+            "cooling_degree_days": round(climate['cooling_degree_days']),
+            "heating_degree_days": round(climate['heating_degree_days'])
+        }
+    }
+
+
+def weather_cells(coordinates):
+    """Group (lat, lon) pairs by weather grid cell
+
+    Returns (cell_keys, cell_centres) where cell_keys[i] is the cell of
+    coordinates[i] and cell_centres maps each distinct cell to its centre.
+    """
+    cell_keys = []
+    cell_centres = {}
+    for lat, lon in coordinates:
+        key, cell_lat, cell_lon = grid_cell(lat, lon, WEATHER_CACHE_GRID)
+        cell_keys.append(key)
+        cell_centres.setdefault(key, (cell_lat, cell_lon))
+    return cell_keys, cell_centres
+
+
+def get_weather_year(lat, lon):
+    """8760-hour weather year for the grid cell containing (lat, lon)"""
+    key, cell_lat, cell_lon = grid_cell(lat, lon, WEATHER_CACHE_GRID)
+    return _weather_year_for_cell(key, cell_lat, cell_lon)
+
+
+@lru_cache(maxsize=WEATHER_YEAR_CACHE_SIZE)
+def _weather_year_for_cell(key, lat, lon):
+    return weather_provider.weather_year(lat, lon)
+
+
+def get_weather_fingerprint(lat, lon):
+    """Content hash of the weather year get_weather_year returns for (lat, lon)"""
+    key, cell_lat, cell_lon = grid_cell(lat, lon, WEATHER_CACHE_GRID)
+    return _weather_fingerprint_for_cell(key, cell_lat, cell_lon)
+
+
+# Kept apart from the years so a fingerprint outlives its year's eviction
+@lru_cache(maxsize=WEATHER_YEAR_CACHE_SIZE * 32)
+def _weather_fingerprint_for_cell(key, lat, lon):
+    return fingerprint(_weather_year_for_cell(key, lat, lon))
+
+
+def calculate_solar_irradiance(lat, lon):
+    """Today's peak clear-sky irradiance (W/m²) at the location"""
+    day_of_year = datetime.now().timetuple().tm_yday
+    _, peak = clear_sky_irradiance(lat, day_of_year)
+    return peak
+
+
+def estimate_cooling_dd(lat, lon):
+    """Annual cooling degree days (base 18 °C) from the climate grid"""
+    return climate_lookup(lat, lon)['cooling_degree_days']
+
+
+def estimate_heating_dd(lat, lon):
+    """Annual heating degree days (base 18 °C) from the climate grid"""
+    return climate_lookup(lat, lon)['heating_degree_days']
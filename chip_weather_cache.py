@@ -0,0 +1,170 @@
+# CHIP MVP Weather Cache
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Upstream weather responses cached per lat/lon grid cell, with TTL and LRU
+# eviction, an optional SQLite backing store, and coalescing of concurrent
+# misses so one cell is fetched once no matter how many callers ask.
+
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from chip_db import Database
+
+
+def grid_cell(lat, lon, grid_degrees):
+    """Snap a coordinate to its grid cell; returns (key, centre_lat, centre_lon)"""
+    row = math.floor(lat / grid_degrees)
+    col = math.floor(lon / grid_degrees)
+    centre_lat = round((row + 0.5) * grid_degrees, 6)
+    centre_lon = round((col + 0.5) * grid_degrees, 6)
+    return f"{grid_degrees}:{row}:{col}", centre_lat, centre_lon
+
+
+class _Inflight:
+    """A fetch in progress that other callers for the same cell wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class WeatherCache:
+    """TTL + LRU cache of weather payloads keyed by grid cell"""
+
+    def __init__(self, ttl=1800, max_entries=4096, db_path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = Database(db_path) if db_path else None  # connects on first use
+        self._schema_ready = False
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "upstream_fetches": 0
+        }
+
+    def get(self, key, loader, cacheable=None):
+        """Return the cached value for key, calling loader() once on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._counters["coalesced"] += 1
+                leader = False
+            else:
+                inflight = _Inflight()
+                self._inflight[key] = inflight
+                self._counters["misses"] += 1
+                leader = True
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            value, expires_at = self._load_from_disk(key, now)
+            if value is None:
+                with self._lock:
+                    self._counters["upstream_fetches"] += 1
+                value = loader()
+                expires_at = now + self.ttl
+                if cacheable is None or cacheable(value):
+                    self._store_to_disk(key, value, expires_at)
+                else:
+                    expires_at = None
+
+            if expires_at is not None:
+                with self._lock:
+                    self._entries[key] = (expires_at, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._counters["evictions"] += 1
+
+            inflight.value = value
+            return value
+
+        except Exception as e:
+            inflight.error = e
+            raise
+
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.event.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["ttl_seconds"] = self.ttl
+        stats["max_entries"] = self.max_entries
+        stats["persistent"] = self._db is not None
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            self._disk().execute('DELETE FROM weather_cache')
+
+    def _disk(self):
+        # Created on first use, so importing the app never touches the file
+        if not self._schema_ready:
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS weather_cache (
+                    cell TEXT PRIMARY KEY,
+                    payload TEXT,
+                    expires_at REAL
+                )
+            ''')
+            self._schema_ready = True
+        return self._db
+
+    def _load_from_disk(self, key, now):
+        if self._db is None:
+            return None, None
+        row = self._disk().query_one(
+            'SELECT payload, expires_at FROM weather_cache WHERE cell = ? AND expires_at > ?',
+            (key, now)
+        )
+        if row is None:
+            return None, None
+        with self._lock:
+            self._counters["disk_hits"] += 1
+        return json.loads(row[0]), row[1]
+
+    def _store_to_disk(self, key, value, expires_at):
+        if self._db is None:
+            return
+        with self._disk().transaction() as cursor:
+            cursor.execute(
+                'INSERT OR REPLACE INTO weather_cache (cell, payload, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), expires_at)
+            )
+            # Expired rows are pruned opportunistically on write
+            cursor.execute('DELETE FROM weather_cache WHERE expires_at <= ?', (time.time(),))
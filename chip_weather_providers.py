@@ -0,0 +1,293 @@
+# CHIP MVP Weather Providers
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Where weather comes from, behind one interface: current conditions (in
+# OpenWeatherMap's payload shape) and 8760-hour weather years. Besides the
+# OpenWeatherMap API there is a local provider serving EPW/CSV files from
+# the nearest station, for air-gapped networks, and a record/replay
+# provider so load tests run deterministically with no network.
+
+import glob
+import json
+import os
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from chip_weather_year import (
+    generate_weather_year, load_epw, load_weather_csv, read_csv_location, read_epw_location
+)
+
+OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY', 'your_api_key_here')
+OPENWEATHER_URL = 'http://api.openweathermap.org/data/2.5/weather'
+
+# Upstream HTTP tuning
+WEATHER_CONNECT_TIMEOUT = float(os.environ.get('WEATHER_CONNECT_TIMEOUT', 3.05))
+WEATHER_READ_TIMEOUT = float(os.environ.get('WEATHER_READ_TIMEOUT', 10))
+WEATHER_RETRIES = int(os.environ.get('WEATHER_RETRIES', 3))
+WEATHER_POOL_SIZE = int(os.environ.get('WEATHER_POOL_SIZE', 16))
+
+# EPW/CSV files or directories for the local provider (os.pathsep separated);
+# WEATHER_EPW_FILE is the older single-file setting
+WEATHER_LOCAL_PATHS = os.environ.get('WEATHER_LOCAL_PATHS', os.environ.get('WEATHER_EPW_FILE', ''))
+WEATHER_REPLAY_FILE = os.environ.get('WEATHER_REPLAY_FILE', 'weather_replay.jsonl')
+# openweather, local, record, replay or static; local by default when weather files are configured
+WEATHER_PROVIDER = os.environ.get('WEATHER_PROVIDER', 'local' if WEATHER_LOCAL_PATHS else 'openweather')
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def unit_vectors(lats, lons):
+    """Points on the unit sphere; chord distance orders like great-circle distance"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def station_tree(lats, lons):
+    """KD-tree over station unit vectors for nearest-station lookups"""
+    # scipy.spatial is the slowest import in the app; only file-backed providers need it
+    from scipy.spatial import cKDTree
+    return cKDTree(unit_vectors(lats, lons))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class WeatherProvider:
+    """Current conditions and hourly weather years for a location"""
+
+    name = 'provider'
+
+    def current(self, lat, lon):
+        """OpenWeatherMap-shaped current conditions payload"""
+        raise NotImplementedError
+
+    def weather_year(self, lat, lon):
+        """8760-hour weather year dict (see chip_weather_year)"""
+        return generate_weather_year(lat, lon)
+
+    def cacheable(self, payload):
+        # Error payloads (bad key, rate limited) carry no 'main' block
+        return 'main' in payload
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    """Live conditions from the OpenWeatherMap API; synthetic weather years"""
+
+    name = 'openweather'
+
+    def __init__(self, api_key=OPENWEATHER_API_KEY, url=OPENWEATHER_URL):
+        self.api_key = api_key
+        self.url = url
+        self._session = None
+
+    def session(self):
+        """Shared keep-alive session with retries for the upstream weather API"""
+        if self._session is None:
+            # Imported here: requests is only needed once the API is actually called
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=WEATHER_RETRIES,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET'])
+            )
+            adapter = HTTPAdapter(
+                pool_connections=WEATHER_POOL_SIZE,
+                pool_maxsize=WEATHER_POOL_SIZE,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def current(self, lat, lon):
+        response = self.session().get(
+            self.url,
+            params={
+                'lat': lat,
+                'lon': lon,
+                'appid': self.api_key,
+                'units': 'metric'
+            },
+            timeout=(WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT)
+        )
+        return response.json()
+
+
+class StaticWeatherProvider(WeatherProvider):
+    """Fixed current conditions and synthetic weather years; no I/O, for benchmarks and tests"""
+
+    name = 'static'
+
+    def __init__(self, temperature=25.0, humidity=60, pressure=1013, wind_speed=3.0):
+        self.payload = {
+            "name": "Static",
+            "sys": {"country": "Unknown"},
+            "main": {"temp": temperature, "humidity": humidity, "pressure": pressure,
+                     "temp_max": temperature + 4, "temp_min": temperature - 4},
+            "wind": {"speed": wind_speed, "deg": 180}
+        }
+
+    def current(self, lat, lon):
+        payload = dict(self.payload)
+        payload["coord"] = {"lat": lat, "lon": lon}
+        return payload
+
+
+class LocalFileProvider(WeatherProvider):
+    """Weather years from EPW/CSV files, served from the nearest station
+
+    Station locations are read from file headers up front and indexed in a
+    KD-tree; each file's data is loaded once, on first use.
+    """
+
+    name = 'local'
+
+    def __init__(self, paths, cache_size=64):
+        self.files = []
+        for path in paths:
+            if os.path.isdir(path):
+                self.files.extend(sorted(glob.glob(os.path.join(path, '*.epw'))))
+                self.files.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+            elif path:
+                self.files.append(path)
+        if not self.files:
+            raise ValueError("Local weather provider needs at least one EPW or CSV file")
+
+        self.stations = [
+            read_epw_location(path) if path.lower().endswith('.epw') else read_csv_location(path)
+            for path in self.files
+        ]
+        self._tree = station_tree([s[1] for s in self.stations], [s[2] for s in self.stations])
+        self._load = lru_cache(maxsize=cache_size)(self._load_file)
+
+    def nearest(self, lat, lon):
+        """(station index, distance in km)"""
+        chord, index = self._tree.query(unit_vectors(lat, lon))
+        return int(index), float(chord_to_km(chord))
+
+    def nearest_many(self, lats, lons, k=1):
+        """(station indices, distances in km); with k > 1, the k nearest along a last axis
+
+        Missing neighbours (k above the station count) have index len(files)
+        and an infinite distance.
+        """
+        chord, index = self._tree.query(unit_vectors(lats, lons), k=k)
+        return index, np.where(np.isinf(chord), np.inf, chord_to_km(chord))
+
+    def weather_year(self, lat, lon):
+        index, _ = self.nearest(lat, lon)
+        return self._load(index)
+
+    def station_year(self, index):
+        """Weather year of the station at index (see stations / nearest_many)"""
+        return self._load(index)
+
+    def current(self, lat, lon):
+        index, distance = self.nearest(lat, lon)
+        weather_year = self._load(index)
+        now = datetime.now()
+        hour = min((now.timetuple().tm_yday - 1) * 24 + now.hour, len(weather_year['dry_bulb']) - 1)
+        day = slice(hour - hour % 24, hour - hour % 24 + 24)
+        name, station_lat, station_lon = self.stations[index]
+
+        payload = {
+            "name": name,
+            "sys": {"country": "Unknown"},
+            "coord": {"lat": station_lat, "lon": station_lon},
+            "main": {
+                "temp": round(float(weather_year['dry_bulb'][hour]), 1),
+                "humidity": round(float(weather_year['relative_humidity'][hour])),
+                "temp_max": round(float(weather_year['dry_bulb'][day].max()), 1),
+                "temp_min": round(float(weather_year['dry_bulb'][day].min()), 1)
+            },
+            "wind": {},
+            "source": weather_year['source'],
+            "station_distance_km": round(distance, 1)
+        }
+        if 'pressure' in weather_year:
+            payload["main"]["pressure"] = round(float(weather_year['pressure'][hour]) / 100)  # hPa
+        if 'wind_speed' in weather_year:
+            payload["wind"] = {
+                "speed": float(weather_year['wind_speed'][hour]),
+                "deg": float(weather_year['wind_direction'][hour])
+            }
+        return payload
+
+    def _load_file(self, index):
+        path = self.files[index]
+        return load_epw(path) if path.lower().endswith('.epw') else load_weather_csv(path)
+
+
+class RecordReplayProvider(WeatherProvider):
+    """Records another provider's current conditions to JSON lines, or replays them
+
+    Replay answers from the nearest recorded location, so any coordinate
+    gets a deterministic response without touching the network. Weather
+    years come from the wrapped provider, which is deterministic already.
+    """
+
+    def __init__(self, path, mode, inner=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.name = mode
+        self.inner = inner or WeatherProvider()
+        self._lock = threading.Lock()
+
+        if mode == 'replay':
+            with open(path, 'r') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            if not records:
+                raise ValueError(f"{path}: no recorded weather to replay")
+            self._payloads = [record["payload"] for record in records]
+            self._tree = station_tree([r["lat"] for r in records], [r["lon"] for r in records])
+
+    def current(self, lat, lon):
+        if self.mode == 'replay':
+            _, index = self._tree.query(unit_vectors(lat, lon))
+            return self._payloads[int(index)]
+
+        payload = self.inner.current(lat, lon)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({"lat": lat, "lon": lon, "payload": payload}) + '\n')
+        return payload
+
+    def weather_year(self, lat, lon):
+        return self.inner.weather_year(lat, lon)
+
+    def cacheable(self, payload):
+        return self.inner.cacheable(payload) if self.mode == 'record' else True
+
+
+def make_weather_provider(name=WEATHER_PROVIDER):
+    """Provider selected by name (the WEATHER_PROVIDER setting)"""
+    local_paths = [path for path in WEATHER_LOCAL_PATHS.split(os.pathsep) if path]
+
+    def base_provider():
+        return LocalFileProvider(local_paths) if local_paths else OpenWeatherMapProvider()
+
+    if name == 'openweather':
+        return OpenWeatherMapProvider()
+    if name == 'static':
+        return StaticWeatherProvider()
+    if name == 'local':
+        return LocalFileProvider(local_paths)
+    if name == 'record':
+        return RecordReplayProvider(WEATHER_REPLAY_FILE, 'record', base_provider())
+    if name == 'replay':
+        return RecordReplayProvider(WEATHER_REPLAY_FILE, 'replay',
+                                    LocalFileProvider(local_paths) if local_paths else None)
+    raise ValueError(f"Unknown weather provider: {name}")
@@ -0,0 +1,243 @@
+# CHIP MVP Weather Years
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# 8760-hour weather years for the hourly simulation engine, either read from
+# an EnergyPlus EPW file or generated from a simple climatology. Every series
+# is a float64 NumPy array; leading dimensions are allowed so many locations
+# can be stacked and simulated together.
+
+import csv
+import hashlib
+import math
+
+import numpy as np
+
+HOURS_PER_YEAR = 8760
+MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+MONTH_START_HOURS = np.cumsum((0,) + MONTH_DAYS[:-1]) * 24
+
+WEATHER_FIELDS = ('dry_bulb', 'relative_humidity', 'ghi', 'dni', 'dhi')
+
+# EPW data columns (0-based) after the 8 header lines
+EPW_COLUMNS = {
+    'month': 1,
+    'day': 2,
+    'dry_bulb': 6,
+    'relative_humidity': 8,
+    'pressure': 9,
+    'ghi': 13,
+    'dni': 14,
+    'dhi': 15,
+    'wind_direction': 20,
+    'wind_speed': 21
+}
+
+# Read from EPW files for reporting current conditions; not used by the model
+EPW_EXTRA_FIELDS = ('pressure', 'wind_direction', 'wind_speed')
+
+
+def read_epw_location(path):
+    """(name, latitude, longitude) from an EPW header without reading the data"""
+    with open(path, 'r', encoding='latin-1') as f:
+        header = f.readline().strip().split(',')
+    return header[1] or 'Unknown', float(header[6]), float(header[7])
+
+
+def load_epw(path):
+    """Read an EPW file into a weather year dict"""
+    latitude = longitude = 0.0
+    city = 'Unknown'
+    rows = []
+    with open(path, 'r', encoding='latin-1') as f:
+        for line_number, line in enumerate(f):
+            if line_number == 0:
+                header = line.strip().split(',')
+                city = header[1] or city
+                latitude = float(header[6])
+                longitude = float(header[7])
+            if line_number < 8:
+                continue
+            fields = line.split(',')
+            if len(fields) <= EPW_COLUMNS['wind_speed']:
+                continue
+            rows.append([float(fields[EPW_COLUMNS[name]]) for name in
+                         ('month', 'day', 'dry_bulb', 'relative_humidity', 'ghi', 'dni', 'dhi')
+                         + EPW_EXTRA_FIELDS])
+
+    data = np.asarray(rows, dtype=np.float64)
+    # Leap-year files carry Feb 29; the engine works on a 365-day year
+    data = data[~((data[:, 0] == 2) & (data[:, 1] == 29))]
+    if data.shape[0] != HOURS_PER_YEAR:
+        raise ValueError(f"{path}: expected {HOURS_PER_YEAR} hourly records, found {data.shape[0]}")
+
+    weather_year = {
+        'dry_bulb': data[:, 2],
+        'relative_humidity': np.clip(data[:, 3], 0, 100),
+        # EPW marks missing radiation with 9999
+        'ghi': np.where(data[:, 4] >= 9999, 0, np.maximum(data[:, 4], 0)),
+        'dni': np.where(data[:, 5] >= 9999, 0, np.maximum(data[:, 5], 0)),
+        'dhi': np.where(data[:, 6] >= 9999, 0, np.maximum(data[:, 6], 0)),
+        'pressure': data[:, 7],  # Pa
+        'wind_direction': data[:, 8],
+        'wind_speed': data[:, 9],
+        'latitude': latitude,
+        'longitude': longitude,
+        'source': f"epw:{city}"
+    }
+    return freeze(weather_year)
+
+
+def read_csv_location(path):
+    """(name, latitude, longitude) from the first data row of a weather CSV"""
+    with open(path, 'r', newline='') as f:
+        row = next(csv.DictReader(f))
+    name = row.get('name') or path
+    return name, float(row['latitude']), float(row['longitude'])
+
+
+def load_weather_csv(path):
+    """Read a weather CSV into a weather year dict
+
+    One row per hour with latitude, longitude and WEATHER_FIELDS columns
+    (optionally name, pressure, wind_direction and wind_speed).
+    """
+    with open(path, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in ('latitude', 'longitude') + WEATHER_FIELDS
+                   if name not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+        extra = [name for name in EPW_EXTRA_FIELDS if name in reader.fieldnames]
+        rows = list(reader)
+
+    if len(rows) != HOURS_PER_YEAR:
+        raise ValueError(f"{path}: expected {HOURS_PER_YEAR} hourly records, found {len(rows)}")
+
+    weather_year = {
+        name: np.array([float(row[name]) for row in rows]) for name in WEATHER_FIELDS + tuple(extra)
+    }
+    weather_year.update({
+        'latitude': float(rows[0]['latitude']),
+        'longitude': float(rows[0]['longitude']),
+        'source': f"csv:{rows[0].get('name') or path}"
+    })
+    return freeze(weather_year)
+
+
+def solar_position(latitude):
+    """Hourly sine of solar altitude and azimuth (degrees from north)
+
+    latitude may be an array; results get a trailing 8760-hour axis.
+    Solar time is used throughout, which is accurate enough for loads.
+    """
+    hours = np.arange(HOURS_PER_YEAR)
+    day_of_year = hours // 24 + 1
+    solar_hour = hours % 24 + 0.5
+
+    declination = np.radians(23.45 * np.sin(np.radians(360 * (284 + day_of_year) / 365)))
+    hour_angle = np.radians(15 * (solar_hour - 12))
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))[..., None]
+
+    sin_altitude = (np.sin(lat) * np.sin(declination)
+                    + np.cos(lat) * np.cos(declination) * np.cos(hour_angle))
+    azimuth = np.degrees(np.arctan2(
+        np.sin(hour_angle),
+        np.cos(hour_angle) * np.sin(lat) - np.tan(declination) * np.cos(lat)
+    )) + 180
+    return np.clip(sin_altitude, -1, 1), azimuth
+
+
+def climatology(latitude):
+    """Rough annual mean, seasonal and diurnal temperature swing for a latitude"""
+    abs_lat = abs(latitude)
+    mean_temp = 30 - 0.45 * max(0, abs_lat - 12)
+    seasonal_amplitude = 2 + 0.15 * abs_lat
+    diurnal_amplitude = 5.0
+    return mean_temp, seasonal_amplitude, diurnal_amplitude
+
+
+def generate_weather_year(latitude, longitude, mean_temp=None, seasonal_amplitude=None,
+                          diurnal_amplitude=None, clearness=0.75, seed=None):
+    """Synthetic but repeatable 8760-hour weather year for a location"""
+    default_mean, default_seasonal, default_diurnal = climatology(latitude)
+    mean_temp = default_mean if mean_temp is None else mean_temp
+    seasonal_amplitude = default_seasonal if seasonal_amplitude is None else seasonal_amplitude
+    diurnal_amplitude = default_diurnal if diurnal_amplitude is None else diurnal_amplitude
+
+    if seed is None:
+        seed = int((round(latitude, 2) + 90) * 100) * 100000 + int((round(longitude, 2) + 180) * 100)
+    rng = np.random.default_rng(seed)
+
+    hours = np.arange(HOURS_PER_YEAR)
+    day_of_year = hours // 24 + 1
+    hour_of_day = hours % 24
+
+    # Warmest day ~mid-July in the north, ~mid-January in the south
+    warmest_day = 196 if latitude >= 0 else 15
+    seasonal = seasonal_amplitude * np.cos(2 * math.pi * (day_of_year - warmest_day) / 365)
+    diurnal = diurnal_amplitude * np.cos(2 * math.pi * (hour_of_day - 15) / 24)
+
+    # Day-to-day weather: smoothed random anomalies, a few days long
+    daily_noise = rng.normal(0, 2.0, 365)
+    kernel = np.exp(-np.arange(7) / 2.0)
+    daily_anomaly = np.convolve(np.tile(daily_noise, 3), kernel / kernel.sum(), mode='same')[365:730]
+    anomaly = np.repeat(daily_anomaly, 24)
+
+    dry_bulb = mean_temp + seasonal + diurnal + anomaly
+
+    # Clear-sky irradiance (Haurwitz) scaled by a daily cloudiness factor
+    sin_altitude, _ = solar_position(latitude)
+    sun_up = sin_altitude > 0.01
+    safe_sin = np.where(sun_up, sin_altitude, 1)
+    clear_ghi = np.where(sun_up, 1098 * safe_sin * np.exp(-0.057 / safe_sin), 0)
+    cloudiness = np.repeat(np.clip(rng.normal(clearness, 0.15, 365), 0.2, 1.0), 24)
+    ghi = clear_ghi * cloudiness
+    dhi = ghi * (1.1 - cloudiness * 0.9)  # cloudier days are more diffuse
+    dhi = np.minimum(dhi, ghi)
+    dni = np.where(sun_up, (ghi - dhi) / safe_sin, 0)
+
+    relative_humidity = np.clip(70 - 2.0 * (dry_bulb - mean_temp) + rng.normal(0, 5, HOURS_PER_YEAR), 10, 100)
+
+    weather_year = {
+        'dry_bulb': dry_bulb,
+        'relative_humidity': relative_humidity,
+        'ghi': ghi,
+        'dni': np.minimum(dni, 1100),
+        'dhi': dhi,
+        'latitude': latitude,
+        'longitude': longitude,
+        'source': 'synthetic'
+    }
+    return freeze(weather_year)
+
+
+def fingerprint(weather_year):
+    """Content hash of what the model reads from a weather year: its series and site latitude"""
+    digest = hashlib.sha1(f"{weather_year['source']}:{float(weather_year['latitude'])!r}".encode())
+    for name in WEATHER_FIELDS:
+        digest.update(np.ascontiguousarray(weather_year[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def freeze(weather_year):
+    """Mark series read-only; weather years are cached and shared"""
+    for name in WEATHER_FIELDS:
+        weather_year[name].flags.writeable = False
+    return weather_year
+
+
+def stack_weather_years(weather_years):
+    """Combine weather years into one with a leading location axis"""
+    stacked = {
+        name: np.stack([weather_year[name] for weather_year in weather_years])
+        for name in WEATHER_FIELDS
+    }
+    stacked['latitude'] = np.array([weather_year['latitude'] for weather_year in weather_years])
+    stacked['longitude'] = np.array([weather_year['longitude'] for weather_year in weather_years])
+    stacked['source'] = [weather_year['source'] for weather_year in weather_years]
+    return stacked
+
+
+def monthly_totals(series):
+    """Sum an hourly series (last axis) into 12 calendar months"""
+    return np.add.reduceat(series, MONTH_START_HOURS, axis=-1)
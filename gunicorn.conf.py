@@ -0,0 +1,35 @@
+# CHIP MVP Gunicorn Configuration
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# Multi-worker serving: `gunicorn -c gunicorn.conf.py wsgi:app`. The app is
+# imported once in the master (numpy, Flask and the model are shared
+# copy-on-write by every worker), the schema is migrated there before any
+# worker forks, and each worker then starts its own scheduler and pools.
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threaded workers: SSE streams and weather fetches wait on I/O, not the CPU
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))  # synchronous retrofit searches run ~20 s
+graceful_timeout = 30
+keepalive = 5
+preload_app = True
+accesslog = '-'
+
+# Each worker has its own simulation process pool; split the cores between them
+os.environ.setdefault('SIMULATION_PROCESSES', str(max(1, (os.cpu_count() or 1) // workers)))
+
+
+def on_starting(server):
+    from wsgi import load_backend
+    load_backend().migrate_database()
+
+
+def post_fork(server, worker):
+    from wsgi import load_backend
+    # Simulation jobs persist in the shared queue (re-queueing is idempotent);
+    # geometry jobs are per-process, so only the first worker resumes them
+    load_backend().create_app(migrate=False, resume_jobs=worker.age == 1)
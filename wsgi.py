@@ -0,0 +1,28 @@
+# CHIP MVP WSGI Entry Point
+# Climate-Resilient Healthcare Infrastructure Protection
+#
+# `gunicorn -c gunicorn.conf.py wsgi:app`. The backend file name is not a
+# valid module name, so it is loaded by path. Importing this module only
+# imports code; folders, schema and job recovery happen in create_app(),
+# called from the gunicorn hooks (or lazily on the first request).
+
+import importlib.util
+import os
+import sys
+
+BACKEND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chip-mvp-backend.py')
+
+
+def load_backend():
+    """The backend module, imported once per process as chip_backend"""
+    backend = sys.modules.get('chip_backend')
+    if backend is None:
+        spec = importlib.util.spec_from_file_location('chip_backend', BACKEND_PATH)
+        backend = importlib.util.module_from_spec(spec)
+        sys.modules['chip_backend'] = backend
+        spec.loader.exec_module(backend)
+    return backend
+
+
+backend = load_backend()
+app = backend.app